@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Headless batch rendering of heatmaps and decision maps
+#
+
+# plot_league_heatmap, plot_player_heatmap and pitch_by_pitch in
+# player_analysis are interactive. This script writes the same images to disk
+# for any set of batters, counts and actions using a non-interactive backend.
+# Each worker process builds one heatmap figure and one decision map figure
+# (axes, colorbar, strike zone, labels) and only swaps in new data for every
+# image, and the heatmap arrays are memory-mapped (or attached from shared
+# memory, see shared_heatmaps.py), so memory stays flat no matter how many
+# images are rendered. export_animations does the same for the
+# SWING map's diffusion frames, which are regenerated from the stored zone
+# values by the heatmap solver rather than read from disk.
+
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+from matplotlib.lines import Line2D
+import numpy as np
+import pandas as pd
+from matplotlib.animation import PillowWriter
+import seasons
+import shared_heatmaps
+from heatmap_index import load_index
+from pipeline import run_params
+from seager_data import load_data
+from seager_mod import diffusion_frames
+
+
+counts = ['0-0', '1-0', '2-0', '3-0', '0-1', '1-1', '2-1', '3-1', '0-2', '1-2', '2-2', '3-2']
+
+league_actions = ['SWING', 'TAKE', 'DELTA', 'EXPECTED']
+player_actions = ['SWING', 'TAKE', 'DELTA']
+
+colordict = {'gs': 'cornflowerblue',
+             'gt': 'limegreen',
+             'bs': 'orange',
+             'bt': 'tomato'}
+
+
+def get_X(x):
+    X = x*13.5 + 15
+    return X
+
+def get_Z(z):
+    Z = (z*12 - 14)*35/32
+    return Z
+
+
+###############################################################################
+################################ Worker State #################################
+###############################################################################
+
+
+# per-process figures and heatmap arrays, set up once by init_worker
+canvas = {}
+
+def init_worker(league_file = 'league_heatmaps.npy', player_file = 'player_heatmaps.npy',
+                zone_file = 'player_zone_rv.npy'):
+
+    canvas['league'] = shared_heatmaps.load(league_file)
+    canvas['player'] = shared_heatmaps.load(player_file)
+    canvas['player_zone'] = shared_heatmaps.load(zone_file)
+
+    #
+    # heatmap figure
+    #
+    fig, ax = plt.subplots(constrained_layout=True)
+    mesh = ax.pcolormesh(np.zeros((35, 30)), cmap='bwr', vmin=-0.2, vmax=0.2)
+    cbar = fig.colorbar(mesh, ax=ax, shrink=0.7, extend='both')
+
+    # strike zone outline
+    left, right, bot, top = get_X(-17/24), get_X(17/24), get_Z(1.5), get_Z(3.5)
+    ax.plot([left, right, right, left, left], [bot, bot, top, top, bot], color = 'black', linewidth = 1)
+
+    # ticks and labels
+    xlabels = [-1, 0, 1]
+    ax.set_xticks([get_X(x) for x in xlabels], xlabels)
+    ylabels = [1.5, 2.0, 2.5, 3.0, 3.5]
+    ax.set_yticks([get_Z(z) for z in ylabels], ylabels)
+    ax.set_ylabel('Height (ft)')
+    ax.set_xlabel('Catcher POV Horizontal Axis (ft)')
+    ax.set_aspect(1)
+
+    canvas['heatmap'] = (fig, ax, mesh, cbar)
+
+    #
+    # decision map figure
+    #
+    fig, ax = plt.subplots(constrained_layout=True)
+    ax.set_xlabel('Catcher POV Horizontal Axis (ft)')
+    ax.set_ylabel('Height (ft)')
+    ax.set_xlim([-10/9, 10/9])
+    ax.set_ylim([14/12, 46/12])
+    ax.set_aspect(1)
+
+    left, right, bot, top = -17/24, 17/24, 18/12, 42/12
+    ax.plot([left, right, right, left, left], [bot, bot, top, top, bot], color = 'black', linewidth = 1)
+
+    points = ax.scatter([], [], s=30)
+    legend_elements = [Line2D([0], [0], marker='o', color='w', markersize=10, markerfacecolor='cornflowerblue', label='Good Swings'),
+                       Line2D([0], [0], marker='o', color='w', markersize=10,  markerfacecolor='orange', label='Bad Swings'),
+                       Line2D([0], [0], marker='o', color='w', markersize=10,  markerfacecolor='limegreen', label='Good Takes'),
+                       Line2D([0], [0], marker='o', color='w', markersize=10,  markerfacecolor='tomato', label='Bad Takes')]
+    ax.legend(handles=legend_elements, bbox_to_anchor=(1.04, 0.5), loc="center left")
+
+    canvas['decisions'] = (fig, ax, points)
+
+
+###############################################################################
+################################## Rendering ##################################
+###############################################################################
+
+
+# values and labels for one heatmap image
+def heatmap_values(kind, row, count, action):
+
+    league_heatmaps = canvas['league']
+    player_heatmaps = canvas['player']
+
+    b = int(count[0])
+    s = int(count[2])
+
+    if kind == 'league':
+        if   action == 'SWING':    pvals = league_heatmaps[2][b][s]
+        elif action == 'TAKE':     pvals = league_heatmaps[3][b][s]
+        elif action == 'DELTA':    pvals = league_heatmaps[2][b][s] - league_heatmaps[3][b][s]
+        elif action == 'EXPECTED': pvals = league_heatmaps[0][b][s]
+        else:
+            raise ValueError("Options for 'action' are: SWING, TAKE, DELTA, EXPECTED")
+
+        return pvals, (0, 1), 'League-wide Run Value', [0, 0.5, 1]
+
+    if   action == 'SWING': pvals = player_heatmaps[row][b][s]
+    elif action == 'TAKE':  pvals = league_heatmaps[3][b][s]
+    elif action == 'DELTA': pvals = player_heatmaps[row][b][s] - league_heatmaps[3][b][s]
+    else:
+        raise ValueError("Options for 'action' are: SWING, TAKE, DELTA")
+
+    return pvals, (-0.2, 0.2), 'Expected Player Run Value', [-0.1, 0, 0.1]
+
+def heatmap_title(kind, name, count, action):
+
+    count_str = ' (' + count[0] + '-' + count[2] + ' count)'
+
+    if kind == 'league':
+        if action == 'DELTA':
+            return 'League-wide Swing minus Take\nRun Value' + count_str
+        return 'League-wide ' + action.title() + ' \nRun Value' + count_str
+
+    if action == 'DELTA':
+        return 'Swing minus Take Run Value for\n' + name + count_str
+    return action.title() + ' Run Value for\n' + name + count_str
+
+def render_heatmap(task):
+
+    _, kind, row, name, count, action, path = task
+    fig, ax, mesh, cbar = canvas['heatmap']
+
+    pvals, clim, label, ticks = heatmap_values(kind, row, count, action)
+
+    # only the mesh data, limits and text change between images
+    mesh.set_array(np.asarray(pvals).transpose().ravel())
+    mesh.set_clim(*clim)
+    cbar.set_label(label)
+    cbar.set_ticks(ticks)
+    ax.set_title(heatmap_title(kind, name, count, action))
+
+    fig.savefig(path)
+
+    return path
+
+# animated GIF of the numerical solution behind one player's SWING map
+def render_animation(task):
+
+    _, row, name, count, path, n_iter, fps, hold = task
+    fig, ax, mesh, cbar = canvas['heatmap']
+
+    b = int(count[0])
+    s = int(count[2])
+
+    mesh.set_clim(-0.2, 0.2)
+    cbar.set_label('Expected Player Run Value')
+    cbar.set_ticks([-0.1, 0, 0.1])
+    ax.set_title(heatmap_title('player', name, count, 'SWING'))
+
+    writer = PillowWriter(fps=fps)
+    with writer.saving(fig, path, dpi=fig.dpi):
+
+        # frames come straight from the solver, one at a time
+        for j, frame in enumerate(diffusion_frames(canvas['player_zone'][row][b][s], n_iter)):
+            mesh.set_array(frame.transpose().ravel())
+
+            # hold the first and last frames, like the live plot's pauses
+            n_grabs = max(1, round(hold*fps)) if j in [0, n_iter] else 1
+            for k in range(n_grabs):
+                writer.grab_frame()
+
+    return path
+
+def render_decisions(task):
+
+    _, method, name, year, px, pz, decisions, path = task
+    fig, ax, points = canvas['decisions']
+
+    points.set_offsets(np.column_stack([px, pz]))
+    points.set_facecolor([colordict[d] for d in decisions])
+    ax.set_title(method.title() + ' Decision Map\n' + name + ' ' + str(year))
+
+    fig.savefig(path)
+
+    return path
+
+def render(task):
+
+    if task[0] == 'decisions':
+        return render_decisions(task)
+
+    if task[0] == 'animation':
+        return render_animation(task)
+
+    return render_heatmap(task)
+
+
+###############################################################################
+################################## Task Lists #################################
+###############################################################################
+
+
+def heatmap_tasks(pids, counts, actions, out_dir):
+
+    index = load_data().name_index
+    rows = load_index('player_heatmaps.npy')
+
+    tasks = []
+
+    if 'league' in pids:
+        os.makedirs(os.path.join(out_dir, 'league'), exist_ok=True)
+        for count in counts:
+            for action in [a for a in actions if a in league_actions]:
+                path = os.path.join(out_dir, 'league', 'league_' + count + '_' + action + '.png')
+                tasks.append(('heatmap', 'league', None, None, count, action, path))
+
+    for pid in [p for p in pids if p != 'league']:
+        row = rows.row(pid)
+        name = index.names[index.lookup(pid)]
+        os.makedirs(os.path.join(out_dir, str(pid)), exist_ok=True)
+        for count in counts:
+            for action in [a for a in actions if a in player_actions]:
+                path = os.path.join(out_dir, str(pid), str(pid) + '_' + count + '_' + action + '.png')
+                tasks.append(('heatmap', 'player', row, name, count, action, path))
+
+    return tasks
+
+# one task per batter and method, from the per-pitch decisions of one season
+def decision_tasks(pids, year, out_dir):
+
+    index = load_data().name_index
+
+    decisions = pd.read_pickle('decisions_' + str(year) + '.pkl')
+    decisions = decisions[decisions.batter.isin([int(p) for p in pids])]
+
+    tasks = []
+    for pid, pitches in decisions.groupby('batter'):
+        os.makedirs(os.path.join(out_dir, str(pid)), exist_ok=True)
+        name = index.names[index.lookup(pid)]
+        for method in ['classic', 'player']:
+            category = np.where(pitches.swing, 's', 't')
+            category = np.where(pitches[method + '_good'], 'g', 'b').astype(object) + category
+            path = os.path.join(out_dir, str(pid), str(pid) + '_' + str(year) + '_' + method + '_decisions.png')
+            tasks.append(('decisions', method, name, year, pitches.plate_x.to_numpy(),
+                          pitches.plate_z.to_numpy(), category, path))
+
+    return tasks
+
+# one animation per batter and count
+def animation_tasks(pids, counts, out_dir, n_iter, fps, hold):
+
+    index = load_data().name_index
+    rows = load_index('player_zone_rv.npy')
+
+    tasks = []
+    for pid in pids:
+        row = rows.row(pid)
+        name = index.names[index.lookup(pid)]
+        os.makedirs(os.path.join(out_dir, str(pid)), exist_ok=True)
+        for count in counts:
+            path = os.path.join(out_dir, str(pid), str(pid) + '_' + count + '_SWING.gif')
+            tasks.append(('animation', row, name, count, path, n_iter, fps, hold))
+
+    return tasks
+
+def run_tasks(tasks, n_workers):
+
+    if n_workers is None:
+        n_workers = os.cpu_count()
+
+    with ProcessPoolExecutor(n_workers, initializer=init_worker) as executor:
+        for n, path in enumerate(executor.map(render, tasks, chunksize=16)):
+            if (n + 1) % 500 == 0:
+                print(n + 1, 'of', len(tasks), 'images rendered')
+
+    return len(tasks)
+
+# render every requested image across a process pool
+def render_all(pids = None, counts = counts, actions = league_actions, years = (),
+               out_dir = 'renders', n_workers = None):
+
+    # all batters with a player heatmap, plus the league maps
+    if pids is None:
+        pids = ['league'] + list(load_data().name_index.ids)
+
+    tasks = heatmap_tasks(pids, counts, actions, out_dir)
+    for year in years:
+        tasks = tasks + decision_tasks([p for p in pids if p != 'league'], year, out_dir)
+
+    return run_tasks(tasks, n_workers)
+
+# export SWING map animations across a process pool
+def export_animations(pids = None, counts = counts, out_dir = 'renders', n_iter = None,
+                      fps = 10, hold = 1, n_workers = None):
+
+    if pids is None:
+        pids = list(load_data().name_index.ids)
+
+    # the smoothing the stored maps were built with
+    if n_iter is None:
+        n_iter = run_params()['n_iter']
+
+    tasks = animation_tasks(pids, counts, out_dir, n_iter, fps, hold)
+
+    return run_tasks(tasks, n_workers)
+
+
+if __name__ == '__main__':
+
+    n = render_all(years = seasons.active)
+    print(n, 'images rendered')
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Offline benchmarks for the SEAGER pipeline
+#
+
+# Each benchmark size generates synthetic pitches (synthetic.py) for a given
+# number of pitches and batters, runs every pipeline stage on them from an
+# empty cache in a scratch directory, and then times the lookups that
+# player_analysis and the live scorer make: player ID lookups, name searches,
+# single heatmap cells and whole heatmaps through the memory map, and single
+# pitch scoring. Nothing touches the network or the real data files. Every
+# step's timings are appended to benchmark_results.csv along with the commit
+# they were measured at, and compare() lines up two runs to flag regressions.
+# Before anything is timed, equivalence.check() confirms that seager_mod
+# still gives the same heatmaps, leaderboards and decisions as the frozen
+# reference engine, so a speedup cannot quietly change the results.
+
+
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+import equivalence
+import instrument
+import pipeline
+import shared_heatmaps
+import synthetic
+from heatmap_index import load_index
+from live_scoring import LiveScorer
+from seager_data import load_data
+
+
+# pitches, batters
+sizes = {'10k': (10000, 100),
+         '100k': (100000, 500),
+         '1m': (1000000, 1000),
+         '5m': (5000000, 2500),
+         '20m': (20000000, 5000)}
+
+result_cols = ['RUN', 'COMMIT', 'SIZE', 'N_PITCHES', 'N_BATTERS', 'STEP', 'WALL_S', 'CPU_S',
+               'PEAK_RSS_MB', 'ROWS_PER_S']
+
+
+def git_commit():
+
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+
+###############################################################################
+################################### Lookups ###################################
+###############################################################################
+
+
+# the lookups player_analysis and the live scorer make, n_ops of each
+def time_lookups(n_ops = 10000, seed = 0):
+
+    rng = np.random.default_rng(seed)
+
+    data = load_data()
+    index = data.name_index
+    heatmap_rows = load_index('player_heatmaps.npy')
+    ids = np.array(index.ids)
+    player_heatmaps = shared_heatmaps.load('player_heatmaps.npy')
+    league_heatmaps = shared_heatmaps.load('league_heatmaps.npy')
+
+    pids = rng.choice(ids, n_ops)
+    rows = [heatmap_rows.row(p) for p in pids]
+    b = rng.integers(0, 4, n_ops)
+    s = rng.integers(0, 3, n_ops)
+    ix = rng.integers(0, 30, n_ops)
+    iz = rng.integers(0, 35, n_ops)
+
+    with instrument.step('lookup player id', rows = n_ops):
+        for p in pids:
+            index.lookup(p)
+
+    with instrument.step('lookup heatmap row', rows = n_ops):
+        for p in pids:
+            heatmap_rows.row(p)
+
+    # misspelled names: one character dropped
+    queries = []
+    for row in rng.choice(len(index), min(n_ops, 1000)):
+        name = index.names[row]
+        k = rng.integers(0, len(name))
+        queries.append(name[:k] + name[k + 1:])
+
+    with instrument.step('search player name', rows = len(queries)):
+        for q in queries:
+            index.search(q)
+
+    # random_pitch / pitch_by_pitch style single cells
+    with instrument.step('heatmap cell', rows = n_ops):
+        for k in range(n_ops):
+            player_heatmaps[rows[k]][b[k]][s[k]][ix[k]][iz[k]]
+
+    # plot_player_heatmap style DELTA maps
+    with instrument.step('heatmap delta map', rows = min(n_ops, 1000)):
+        for k in range(min(n_ops, 1000)):
+            np.asarray(player_heatmaps[rows[k]][b[k]][s[k]] - league_heatmaps[3][b[k]][s[k]])
+
+    scorer = LiveScorer()
+    with instrument.step('live score pitch', rows = n_ops):
+        for k in range(n_ops):
+            scorer.score(pids[k], b[k], s[k], rng.normal(0, 0.8), rng.normal(2.5, 0.8), 'foul')
+
+
+###############################################################################
+################################## Benchmarks #################################
+###############################################################################
+
+
+def run_size(size, seed = 0, n_ops = 10000, keep = False):
+
+    n_pitches, n_batters = sizes[size]
+
+    cwd = os.getcwd()
+    scratch = tempfile.mkdtemp(prefix='seager_bench_' + size + '_')
+    os.chdir(scratch)
+
+    try:
+        start = time.perf_counter()
+        cpu = time.process_time()
+        pitch_data, year_pitch_data = synthetic.generate(n_pitches, n_batters, seed=seed)
+        # list batters with at least half their expected pitches per season
+        min_pitches = int(min(100, max(20, n_pitches/(8*n_batters))))
+        synthetic.write_players(year_pitch_data, min_pitches=min_pitches, seed=seed)
+        generate = {'path': 'generate', 'wall_s': round(time.perf_counter() - start, 4),
+                    'cpu_s': round(time.process_time() - cpu, 4), 'peak_rss_mb': round(instrument.peak_rss_mb() or 0, 1),
+                    'rows_per_s': round(len(pitch_data)/(time.perf_counter() - start), 1)}
+
+        # every stage from an empty cache, then the lookups in the same report
+        pipeline.run_seager((pitch_data, year_pitch_data), cache_dir='pipeline_cache', report=None)
+        del pitch_data, year_pitch_data
+        time_lookups(n_ops, seed)
+
+        steps = [generate] + [s for s in instrument.recorder.steps if 'wall_s' in s]
+    finally:
+        os.chdir(cwd)
+        if not keep:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    return pd.DataFrame({'SIZE': size,
+                         'N_PITCHES': n_pitches,
+                         'N_BATTERS': n_batters,
+                         'STEP': [s['path'] for s in steps],
+                         'WALL_S': [s['wall_s'] for s in steps],
+                         'CPU_S': [s['cpu_s'] for s in steps],
+                         'PEAK_RSS_MB': [s['peak_rss_mb'] for s in steps],
+                         'ROWS_PER_S': [s['rows_per_s'] for s in steps]})
+
+# run the given sizes and append the results to results_file
+def run_benchmarks(run_sizes = ('10k', '100k'), results_file = 'benchmark_results.csv', seed = 0,
+                   check_equivalence = True):
+
+    # timings of an engine that gives different answers are meaningless
+    if check_equivalence:
+        report = equivalence.check()
+        if not report.PASS.all():
+            raise ValueError('seager_mod no longer matches seager_reference; see the report above')
+
+    run = time.strftime('%Y-%m-%dT%H:%M:%S')
+    commit = git_commit()
+
+    results = []
+    for size in run_sizes:
+        print('\nBenchmarking', size, 'pitches\n')
+        df = run_size(size, seed)
+        df.insert(0, 'COMMIT', commit)
+        df.insert(0, 'RUN', run)
+        results.append(df)
+
+    results = pd.concat(results, ignore_index=True)[result_cols]
+    results.to_csv(results_file, mode='a', header=not os.path.exists(results_file), index=False)
+
+    return results
+
+# wall time of every step in two runs (default: the last two), with the ratio
+def compare(results_file = 'benchmark_results.csv', baseline = None, current = None, tolerance = 0.1):
+
+    results = pd.read_csv(results_file)
+    runs = list(results.RUN.unique())
+
+    if current is None:
+        current = runs[-1]
+    if baseline is None:
+        baseline = runs[-2] if len(runs) > 1 else runs[-1]
+
+    old = results[results.RUN == baseline].set_index(['SIZE', 'STEP']).WALL_S
+    new = results[results.RUN == current].set_index(['SIZE', 'STEP']).WALL_S
+
+    table = pd.DataFrame({'BASELINE_S': old, 'CURRENT_S': new}).dropna()
+    table['RATIO'] = (table.CURRENT_S/table.BASELINE_S).round(2)
+    table['REGRESSION'] = table.RATIO > 1 + tolerance
+
+    return table
+
+
+if __name__ == '__main__':
+
+    run_benchmarks(['10k', '100k', '1m'])
+    print(compare().to_string())
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Conditioned league heatmaps
+#
+
+# league_heatmaps is indexed only by [kind][balls][strikes][x][z], but swing
+# value depends heavily on batter and pitcher handedness and pitch type.
+# Adding those axes to get_league_data's masking loops would run its 156 zone
+# masks and 1050 grid masks once per condition. build() instead takes any list
+# of conditioning columns and makes a single pass over the pitches: every
+# pitch gets a zone and grid cell index, and np.bincount counts pitches,
+# swings, contact, fouls, xwOBAcon, takes and called strikes for every
+# (condition, count, zone) and (condition, grid cell) at once. Coarser
+# conditions (stand only, stand and p_throws, the whole league) are sums of
+# the finer ones, so the hierarchy costs nothing extra. Any zone or grid cell
+# with fewer than min_pitches pitches (takes, for the called strike grid)
+# takes the value of its parent condition instead, and all the swing maps are
+# smoothed together in one call to make_heatmaps.
+#
+# Only the condition combinations that actually occur are stored, as float32,
+# in one .npz file. ConditionedHeatmaps.heatmap() falls back to the parent
+# map for combinations that were never seen.
+
+
+import numpy as np
+import pandas as pd
+from instrument import step
+from seager_mod import (ball_rv, strike_rv, swing_types, take_types, make_heatmaps,
+                        zone_width, zone_height)
+
+
+default_keys = ('stand', 'p_throws', 'pitch_type')
+
+# grid cell edges, computed exactly as in get_league_data
+x_edges = np.array([X/13.5 for X in range(-15, 16)])
+z_edges = np.array([(Z*32/35 + 14)/12 for Z in range(36)])
+
+
+###############################################################################
+################################# Zone Counts #################################
+###############################################################################
+
+
+# condition combination of every pitch (finest level), and the combinations
+def pitch_combos(pitch_data, keys):
+
+    if len(keys) == 0:
+        return np.zeros(len(pitch_data), dtype=int), pd.DataFrame(index=[0])
+
+    # missing values are a condition of their own
+    conditions = pitch_data[list(keys)].astype(str).where(pitch_data[list(keys)].notna(), 'UNK')
+    combo = conditions.groupby(list(keys), sort=True).ngroup().to_numpy()
+    combos = conditions.drop_duplicates().sort_values(list(keys), ignore_index=True)
+
+    return combo, combos
+
+# raw counts for every finest combination, in one pass over the pitches
+def zone_counts(pitch_data, combo, n_combos):
+
+    balls = pitch_data.balls.to_numpy()
+    strikes = pitch_data.strikes.to_numpy()
+    zone = pitch_data.zone.to_numpy()
+    description = pitch_data.description
+
+    swing = description.isin(swing_types).to_numpy()
+    take = description.isin(take_types).to_numpy()
+    contact = (description == 'hit_into_play').to_numpy()
+    foul = (description == 'foul').to_numpy()
+    xwobacon = pitch_data.estimated_woba_using_speedangle.fillna(0).to_numpy()
+
+    # MLBAM zones 1-9, 11-14 -> 0-12
+    ok = (np.isin(zone, list(range(1, 10)) + list(range(11, 15))) &
+          np.isin(balls, range(4)) & np.isin(strikes, range(3)))
+    j = np.where(zone[ok] < 10, zone[ok] - 1, zone[ok] - 2)
+    cell = (((combo[ok]*4 + balls[ok])*3 + strikes[ok])*13 + j).astype(int)
+
+    def count(weights):
+        out = np.bincount(cell, weights[ok], minlength=n_combos*156)
+        return out.reshape(n_combos, 4, 3, 13)
+
+    counts = {'n': count(np.ones(len(cell))),
+              'swings': count(swing*1.0),
+              'contact': count((swing & contact)*1.0),
+              'foul': count((swing & foul)*1.0),
+              'xwobacon': count(np.where(swing & contact, xwobacon, 0))}
+
+    # called strike grid: same half-open cells as get_league_data
+    ix = np.searchsorted(x_edges, pitch_data.plate_x.to_numpy(), side='right') - 1
+    iz = np.searchsorted(z_edges, pitch_data.plate_z.to_numpy(), side='right') - 1
+    on_grid = (ix >= 0) & (ix < zone_width) & (iz >= 0) & (iz < zone_height) & take
+    grid = ((combo*zone_width + ix)*zone_height + iz)[on_grid]
+
+    counts['takes'] = np.bincount(grid, minlength=n_combos*zone_width*zone_height
+                                  ).reshape(n_combos, zone_width, zone_height)*1.0
+    counts['called'] = np.bincount(grid, (description == 'called_strike').to_numpy()[on_grid]*1.0,
+                                   minlength=n_combos*zone_width*zone_height
+                                   ).reshape(n_combos, zone_width, zone_height)
+
+    return counts
+
+
+###############################################################################
+################################### Builder ###################################
+###############################################################################
+
+
+# swing rate and swing RV by zone from the counts, as in get_league_data
+def zone_values(c, strike_rv = strike_rv):
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        swing_rate = np.where(c['n'] != 0, c['swings']/c['n'], 0)
+        contact = np.where(c['swings'] != 0, c['contact']/c['swings'], 0)
+        foul = np.where(c['swings'] != 0, c['foul']/c['swings'], 0)
+        xwobacon = np.where(c['contact'] != 0, c['xwobacon']/c['contact'], 0)
+        cs = np.where(c['takes'] != 0, c['called']/c['takes'], 0)
+
+    whiff = np.where(c['swings'] != 0, 1 - contact - foul, 0)
+    bip_rv = np.where(contact != 0, 0.6679*xwobacon - 0.192, 0)
+
+    # fouls with two strikes do not change the count
+    two_strikes = (np.arange(3) == 2)[:, None]
+    srv = strike_rv[..., None]
+    swing_rv = contact*bip_rv + np.where(two_strikes, whiff*srv, (whiff + foul)*srv)
+
+    return np.stack([swing_rate, swing_rv], axis=1), cs
+
+def build(pitch_data, keys = default_keys, min_pitches = 50, n_iter = 10,
+          ball_rv = ball_rv, strike_rv = strike_rv):
+
+    keys = tuple(keys)
+
+    with step('conditioned zone counts', rows = len(pitch_data)):
+        combo, finest = pitch_combos(pitch_data, keys)
+        fine_counts = zone_counts(pitch_data, combo, len(finest))
+
+    # every level of the hierarchy: (), (key 1), (key 1, key 2), ...
+    with step('conditioned hierarchy', rows = len(finest)):
+        tables, counts = [], []
+        for level in range(len(keys) + 1):
+            prefix = list(keys[:level])
+            if level == 0:
+                group = np.zeros(len(finest), dtype=int)
+                table = pd.DataFrame(index=[0])
+            else:
+                group = finest.groupby(prefix, sort=True).ngroup().to_numpy()
+                table = finest[prefix].drop_duplicates().sort_values(prefix, ignore_index=True)
+            table['LEVEL'] = level
+            tables.append(table)
+            level_counts = {}
+            for name, c in fine_counts.items():
+                level_counts[name] = np.zeros((len(table),) + c.shape[1:])
+                np.add.at(level_counts[name], group, c)
+            counts.append(level_counts)
+
+        # keys below a map's level are blank
+        combos = pd.concat(tables, ignore_index=True)[list(keys) + ['LEVEL']].fillna('')
+        offsets = np.cumsum([0] + [len(t) for t in tables])
+
+        # parent of each map: the same combination without its last key
+        parent = np.full(len(combos), -1)
+        for level in range(1, len(keys) + 1):
+            rows = combos[combos.LEVEL == level]
+            up = combos[combos.LEVEL == level - 1].reset_index()
+            on = list(keys[:level - 1])
+            if on:
+                parent[rows.index] = rows[on].merge(up, on=on, how='left')['index'].to_numpy()
+            else:
+                parent[rows.index] = up['index'][0]
+        combos['PARENT'] = parent
+
+        counts = {name: np.concatenate([c[name] for c in counts]) for name in fine_counts}
+        combos['N'] = counts['n'].sum(axis=(1, 2, 3)).astype(int)
+
+    # sparse cells fall back to the parent, coarsest level first
+    with step('conditioned fallback', rows = len(combos)):
+        zone_rv, cs = zone_values(counts, strike_rv)
+        for level in range(1, len(keys) + 1):
+            rows = np.arange(offsets[level], offsets[level + 1])
+            up = parent[rows]
+            sparse = counts['n'][rows] < min_pitches
+            zone_rv[rows] = np.where(sparse[:, None], zone_rv[up], zone_rv[rows])
+            cs[rows] = np.where(counts['takes'][rows] < min_pitches, cs[up], cs[rows])
+
+    # every swing map smoothed at once
+    with step('conditioned diffusion', rows = zone_rv.size//13):
+        heatmaps = np.empty((len(combos), 4, 4, 3, zone_width, zone_height))
+        heatmaps[:, 1:3] = make_heatmaps(zone_rv, n_iter)
+        heatmaps[:, 3] = (cs[:, None, None]*strike_rv[None, :, :, None, None] +
+                          (1 - cs[:, None, None])*ball_rv[None, :, :, None, None])
+        heatmaps[:, 0] = heatmaps[:, 1]*heatmaps[:, 2] + (1 - heatmaps[:, 1])*heatmaps[:, 3]
+
+    return ConditionedHeatmaps(keys, combos, heatmaps.astype(np.float32), cs.astype(np.float32),
+                               zone_rv.astype(np.float32))
+
+
+###############################################################################
+################################### Storage ###################################
+###############################################################################
+
+
+class ConditionedHeatmaps:
+
+    def __init__(self, keys, combos, heatmaps, cs, zone_rv):
+
+        # one row per stored map: its key values, level, parent row and pitches
+        self.keys = tuple(keys)
+        self.combos = combos
+        # [map][kind 0-3][balls][strikes][x][z], [map][x][z], [map][2][balls][strikes][zone]
+        self.heatmaps = heatmaps
+        self.cs = cs
+        self.zone_rv = zone_rv
+
+        self.rows = {tuple(r): i for i, r in
+                     enumerate(combos[list(self.keys) + ['LEVEL']].itertuples(index=False, name=None))}
+
+    def __len__(self):
+        return len(self.combos)
+
+    # row of the most specific stored map for these conditions; keys are used
+    # in order, and an unseen value falls back to the parent. The maps are
+    # nested in key order (there is no p_throws-only map), so a key can only
+    # be given along with every key before it
+    def row(self, **conditions):
+
+        unknown = set(conditions) - set(self.keys)
+        if unknown:
+            raise KeyError('not a conditioning key: ' + ', '.join(sorted(unknown)))
+
+        last = max([self.keys.index(key) for key in conditions], default=0)
+        skipped = [key for key in self.keys[:last] if key not in conditions]
+        if skipped:
+            raise KeyError('conditioning on ' + self.keys[last] + ' also needs ' + ', '.join(skipped))
+
+        found = self.rows[('',)*len(self.keys) + (0,)]
+        values = []
+        for level, key in enumerate(self.keys, 1):
+            if key not in conditions:
+                break
+            values.append(str(conditions[key]))
+            r = self.rows.get(tuple(values) + ('',)*(len(self.keys) - level) + (level,))
+            if r is None:
+                break
+            found = r
+
+        return found
+
+    # same kinds as league_heatmaps (4 = called strike %, any count)
+    def heatmap(self, kind, b, s, **conditions):
+
+        r = self.row(**conditions)
+        if kind == 4:
+            return self.cs[r]
+
+        return self.heatmaps[r][kind][b][s]
+
+    def save(self, filename = 'conditioned_heatmaps.npz'):
+
+        np.savez(filename, keys=np.array(self.keys, dtype=str),
+                 combos=self.combos[list(self.keys)].to_numpy(dtype=str),
+                 level=self.combos.LEVEL.to_numpy(), parent=self.combos.PARENT.to_numpy(),
+                 n=self.combos.N.to_numpy(), heatmaps=self.heatmaps, cs=self.cs, zone_rv=self.zone_rv)
+
+    @classmethod
+    def load(cls, filename = 'conditioned_heatmaps.npz'):
+
+        f = np.load(filename)
+        keys = tuple(f['keys'])
+        combos = pd.DataFrame(f['combos'], columns=list(keys))
+        combos['LEVEL'] = f['level']
+        combos['PARENT'] = f['parent']
+        combos['N'] = f['n']
+
+        return cls(keys, combos, f['heatmaps'], f['cs'], f['zone_rv'])
@@ -7,13 +7,16 @@ Created on Sat Jun 22 15:22:23 2024
 """
 
 import pandas as pd
-import sqlite3
 import os
-import random
-import time
+import glob
+import hashlib
+import pickle
 import matplotlib.pyplot as plt
 import numpy as np
 import scipy.stats as stats
+from seager_data import load_data
+from player_search import select_player
+from concurrent.futures import ProcessPoolExecutor
 
 
 
@@ -23,272 +26,28 @@ import scipy.stats as stats
 
 def get_player_stats():
 
-    # import player lists
-    pdat_2021 = pd.read_csv('players_2021.csv')
-    pdat_2022 = pd.read_csv('players_2022.csv')
-    pdat_2023 = pd.read_csv('players_2023.csv')
-    pdat_2024 = pd.read_csv('players_2024.csv')
-
-    pdat = pd.concat([pdat_2021, pdat_2022, pdat_2023, pdat_2024], ignore_index=True)
-
-    pdat = pd.DataFrame({
-                        'ID': pdat['player_id'], 
-                        'Name': pdat['player_name']
-                        })
-
-    pdat = pdat.drop_duplicates()
-
-    player_name = list(pdat['Name'])
-    player_id = list(pdat['ID'])
-    first_list = []
-    last_list = []
-
-    for i in range(len(player_name)):
-        name = player_name[i]
-        player_name[i] = ' '.join(reversed(name.lower().split(', ')))
-        first_list.append(name.lower().split(', ')[1])
-        last_list.append(name.lower().split(', ')[0])
-
     # player selection
-    def select_player():
-        
-        instr = input("\nEnter an MLB batter, or type 'r' for random:\n").lower()
-        
-        if instr in player_name:
-            player = instr
-            i = player_name.index(instr)
-            print()
-            print(player.title() + ' selected.')
-            print()
-            return i
-        
-        
-        def choose_random():
-            global player
-            i = random.randrange(0, len(player_name) - 1)
-            player = player_name[i]
-            print('\n' + player.title() + ' selected.')
-            return i
-            
-        
-        def dym(first, last):
-            instr = input("\nDid you mean " + first.title() + ' ' + last.title() + '? (Y/N)\n')
-            return instr
-
-
-        def try_again():
-            instr = input("\nCouldn't find that player. Please try again:\n").lower()
-            return instr
-
-
-        def yes():
-            global player, i
-            player = player_name[i]
-            print('\n' + player.title() + ' selected.')
-            return i
-        
-        def check_matches(last_list, first_list, targets):
-            last_matches = []
-            first_matches = []
-            last_matches = [i for i in range(len(last_list)) if last_list[i] in targets]
-            first_matches = [i for i in range(len(first_list)) if first_list[i] in targets]
-            return last_matches, first_matches
-        
-        
-        # Handle improper entries
-        def resolve_entry(instr):
-            bad = 0
-            global i
-            
-            while True:
-                
-                # Break for correct input
-                if instr in player_name:
-                    player = instr
-                    i = player_name.index(player)
-                    i = yes()
-                    return i
-                
-                # Choose random player
-                if instr == 'r':
-                    i = choose_random()
-                    return i
-
-                # Handle one-word entries
-                if len(instr.split()) > 1:
-                    first = instr.lower().split()[0]
-                    last = instr.lower().split()[1]
-                else:
-                    first = instr.lower()
-                    last = instr.lower()
-                
-                # Make suggestions for partially correct names
-                l, f = check_matches(last_list, first_list, [first, last])
-
-                for n in range(len(l)):
-                    instr = dym(first_list[l[n]], last)
-                    if instr in ['Y', 'y']:
-                        i = l[n]
-                        i = yes()
-                        return i
-                        
-                for n in range(len(f)):
-                    instr = dym(first, last_list[f[n]])
-                    if instr in ['Y', 'y']:
-                        i = f[n]
-                        i = yes()
-                        return i
-                
-                # Re-prompt if no match is found
-                instr = try_again()
-                
-                # Allow a maximum of three tries
-                bad = bad + 1
-                if bad > 2:
-                    print("\nToo many attempts. Selecting a random player...")
-                    time.sleep(1)
-                    i = choose_random()
-                    return i
-
-        i = resolve_entry(instr)
-        
-        return i
-        
-    i = select_player()
-    pid = str(player_id[i])
-    
-    # Define the database file name
-    c_filename = 'classic_stats.db'
-    p_filename = 'player_stats.db'
-    
-    # Remove the existing database file if it exists
-    if os.path.exists(c_filename):
-        os.remove(c_filename)
-        os.remove(p_filename)
-    
-    # Load data
-    classic_2021 = pd.read_csv('classic_st_2021.csv')
-    classic_2022 = pd.read_csv('classic_st_2022.csv')
-    classic_2023 = pd.read_csv('classic_st_2023.csv')
-    classic_2024 = pd.read_csv('classic_st_2024.csv')
-    player_2021 = pd.read_csv('player_st_2021.csv')
-    player_2022 = pd.read_csv('player_st_2022.csv')
-    player_2023 = pd.read_csv('player_st_2023.csv')
-    player_2024 = pd.read_csv('player_st_2024.csv')
-    
-    # Add a 'Year' column to each DataFrame
-    classic_2021['Year'] = 2021
-    classic_2022['Year'] = 2022
-    classic_2023['Year'] = 2023
-    classic_2024['Year'] = 2024
-    player_2021['Year'] = 2021
-    player_2022['Year'] = 2022
-    player_2023['Year'] = 2023
-    player_2024['Year'] = 2024
-    
-    # Create a SQLite database connection
-    c_conn = sqlite3.connect(c_filename)
-    p_conn = sqlite3.connect(p_filename)
-    
-    
-    # Write the DataFrames to the SQLite database
-    classic_2021.to_sql('c_stats', c_conn, if_exists='append', index=False)
-    classic_2022.to_sql('c_stats', c_conn, if_exists='append', index=False)
-    classic_2023.to_sql('c_stats', c_conn, if_exists='append', index=False)
-    classic_2024.to_sql('c_stats', c_conn, if_exists='append', index=False)
-    player_2021.to_sql('p_stats', p_conn, if_exists='append', index=False)
-    player_2022.to_sql('p_stats', p_conn, if_exists='append', index=False)
-    player_2023.to_sql('p_stats', p_conn, if_exists='append', index=False)
-    player_2024.to_sql('p_stats', p_conn, if_exists='append', index=False)
-    
-    # Function to query the classic statistics
-    def query_classic_stats(player_id):
-        query = """
-        SELECT Year, SEAGER_Percentile, Selective_Percentile, Agression_Percentile, SWTR_Percentile
-        FROM c_stats
-        WHERE ID = ?
-        GROUP BY Name, Year
-        ORDER BY Year
-        """
-        cursor = c_conn.execute(query, (player_id,))
-        columns = [column[0] for column in cursor.description]
-        results = cursor.fetchall()
-        df = pd.DataFrame(results, columns=columns)
-        return df
-    
-    # Function to query the player statistics
-    def query_player_stats(player_id):
-        query = """
-        SELECT Year, SEAGER_Percentile, Selective_Percentile, Agression_Percentile, SWTR_Percentile
-        FROM p_stats
-        WHERE ID = ?
-        GROUP BY Name, Year
-        ORDER BY Year
-        """
-        cursor = p_conn.execute(query, (player_id,))
-        columns = [column[0] for column in cursor.description]
-        results = cursor.fetchall()
-        df = pd.DataFrame(results, columns=columns)
-        return df
-    
-    # Query the database for a specific player
-    classic_stats = query_classic_stats(pid)
-    player_stats = query_player_stats(pid)
-    
-    # Rename columns
-    classic_stats.columns = [x.split('_')[0] if '_' in x else x for x in classic_stats.columns]
-    player_stats.columns = [x.split('_')[0] if '_' in x else x for x in player_stats.columns]
+    player = select_player(data.name_index)
+    pid = str(player.ID)
     
+    # Query the dataset for a specific player
+    classic_stats, player_stats = data.percentiles(pid)
     
     print('\nClassic percentiles:\n')
     print(classic_stats.to_string(index=False))
     print('\nPlayer percentiles:\n')
     print(player_stats.to_string(index=False))
     
-
-    # # Merge into one df
-    # full_stats = pd.merge(classic_stats, player_stats, on='Year')
-    # print(full_stats)
-    
-    # Close the database connection
-    c_conn.close()
-    p_conn.close()
-    
 # get_player_stats()
 
 ###############################################################################
 ############################### Overall Stats #################################
 ###############################################################################
 
-# Load data
-classic_2021 = pd.read_csv('classic_st_2021.csv')
-classic_2022 = pd.read_csv('classic_st_2022.csv')
-classic_2023 = pd.read_csv('classic_st_2023.csv')
-classic_2024 = pd.read_csv('classic_st_2024.csv')
-player_2021 = pd.read_csv('player_st_2021.csv')
-player_2022 = pd.read_csv('player_st_2022.csv')
-player_2023 = pd.read_csv('player_st_2023.csv')
-player_2024 = pd.read_csv('player_st_2024.csv')
-
-# Add a 'Year' column to each DataFrame
-classic_2021.insert(3, 'Year', 2021)
-classic_2022.insert(3, 'Year', 2022)
-classic_2023.insert(3, 'Year', 2023)
-classic_2024.insert(3, 'Year', 2024)
-player_2021.insert(3, 'Year', 2021)
-player_2022.insert(3, 'Year', 2022)
-player_2023.insert(3, 'Year', 2023)
-player_2024.insert(3, 'Year', 2024)
-
-
-classic_stats = pd.concat([classic_2021, classic_2022, classic_2023, classic_2024], ignore_index=True)
-player_stats = pd.concat([player_2021, player_2022, player_2023, player_2024], ignore_index=True)
+# Load data (parsed once, then read from the seager_data.pkl snapshot)
+data = load_data()
 
-full_stats = pd.merge(classic_stats, player_stats, how='left', on=['NAME', 'ID', 'Year', 'N_SWINGS', 'N_TAKES', 'N_P'])
-
-full_stats.drop(full_stats.columns[full_stats.columns.str.contains('unnamed', case=False)], axis=1, inplace=True)
-full_stats = full_stats.drop(full_stats[full_stats.N_P < 1000].index)
-full_stats = full_stats.sort_values(['ID', 'Year'], ignore_index = True)
+full_stats = data.full_stats
 
 
 
@@ -320,29 +79,38 @@ def pvc(colname):
 # pvc('L_SEAGER')
 
 
+# Pair each player-season with the same player's following season
+def pair_seasons(stats, cols=None):
+    
+    # all metric columns by default
+    if cols is None:
+        cols = [c for c in stats.columns if c not in ['ID', 'Year']]
+    
+    # self-join on ID with Year + 1, so gap years are never paired
+    first = stats[['ID', 'Year'] + cols]
+    second = first.assign(Year=first['Year'] - 1)
+    pairs = pd.merge(first, second, on=['ID', 'Year'], suffixes=('_1', '_2'))
+    
+    # wide table indexed by (ID, first year), e.g. pairs.Year2['SEAGER_x']
+    pairs = pairs.set_index(['ID', 'Year'])
+    pairs.columns = pd.MultiIndex.from_arrays([['Year1']*len(cols) + ['Year2']*len(cols), 
+                                               cols + cols])
+    
+    return pairs
+
+full_pairs = pair_seasons(full_stats)
+
+
 # Stickiness year over year
 def yoy(colname):
     
-    p_rows = []
-    c_rows = []
-    for i in range(len(full_stats) - 1):
-        if full_stats['ID'][i + 1] == full_stats['ID'][i]:
-            c1 = full_stats[colname + '_x'][i]
-            c2 = full_stats[colname + '_x'][i + 1]
-            c3 = full_stats['N_P'][i]
-            c_rows.append({'Year1': c1,
-                         'Year2': c2,
-                         'N_P': c3})
-            
-            p1 = full_stats[colname + '_y'][i]
-            p2 = full_stats[colname + '_y'][i + 1]
-            p_rows.append({'Year1': p1,
-                         'Year2': p2,
-                         'N_P': c3})
-            
-            
-    classic_pairs = pd.DataFrame(c_rows)
-    player_pairs = pd.DataFrame(p_rows)
+    classic_pairs = pd.DataFrame({'Year1': full_pairs.Year1[colname + '_x'],
+                                  'Year2': full_pairs.Year2[colname + '_x'],
+                                  'N_P': full_pairs.Year1['N_P']}).reset_index(drop=True)
+    
+    player_pairs = pd.DataFrame({'Year1': full_pairs.Year1[colname + '_y'],
+                                 'Year2': full_pairs.Year2[colname + '_y'],
+                                 'N_P': full_pairs.Year1['N_P']}).reset_index(drop=True)
     
     
     #classic
@@ -436,25 +204,135 @@ def stabilization(cp, pp):
 # stabilization(cp, pp)
 
 
+# Split-half (odd/even pitch) reliability as a function of sample size. This
+# replaces the binned year-over-year approach above, using the per-pitch
+# decision values saved by seager_mod.swing_take (decisions_<year>.pkl).
+
+reliability_metrics = ['classic', 'player', 'classic_good', 'player_good']
+
+# load per-pitch decision values, grouped by batter-season in pitch order
+def load_decisions():
+    
+    frames = []
+    for filename in sorted(glob.glob('decisions_*.pkl')):
+        decisions = pd.read_pickle(filename)
+        decisions['Year'] = int(filename.split('_')[1].split('.')[0])
+        frames.append(decisions)
+    
+    decisions = pd.concat(frames, ignore_index=True)
+    decisions = decisions.sort_values(['batter', 'Year', 'game_date', 'at_bat_number', 
+                                       'pitch_number'], ignore_index=True)
+    
+    return decisions
+
+# odd/even correlation for every sample size and metric at once
+def split_half(values, starts, lengths, sizes):
+    
+    # position of each pitch within its batter-season
+    group = np.repeat(np.arange(len(starts)), lengths)
+    pos = np.arange(len(values)) - starts[group]
+    odd = (pos % 2 == 0)[:, None]
+    
+    # running totals over pitch order (leading row of zeros)
+    zero = np.zeros((1, values.shape[1]))
+    c_odd = np.concatenate([zero, np.cumsum(np.where(odd, values, 0), axis=0)])
+    c_even = np.concatenate([zero, np.cumsum(np.where(odd, 0, values), axis=0)])
+    
+    # half means over the first n pitches of every batter-season
+    end = np.minimum(starts[:, None] + sizes[None, :], len(values))
+    odd_mean = (c_odd[end] - c_odd[starts][:, None])/np.ceil(sizes/2)[None, :, None]
+    even_mean = (c_even[end] - c_even[starts][:, None])/np.floor(sizes/2)[None, :, None]
+    
+    # correlate across batter-seasons with at least n pitches
+    mask = (lengths[:, None] >= sizes[None, :])[:, :, None]
+    n = mask.sum(axis=0)
+    x = np.where(mask, odd_mean, 0)
+    y = np.where(mask, even_mean, 0)
+    x = np.where(mask, x - x.sum(axis=0)/n, 0)
+    y = np.where(mask, y - y.sum(axis=0)/n, 0)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r = (x*y).sum(axis=0)/np.sqrt((x**2).sum(axis=0)*(y**2).sum(axis=0))
+    
+    return r
+
+# split-half curves with pitch order shuffled within each batter-season
+def permuted_split_half(values, starts, lengths, sizes, seeds):
+    
+    group = np.repeat(np.arange(len(starts)), lengths)
+    
+    curves = []
+    for seed in seeds:
+        rng = np.random.default_rng(seed)
+        order = np.argsort(group + rng.random(len(values)))
+        curves.append(split_half(values[order], starts, lengths, sizes))
+    
+    return curves
+
+def reliability(metrics = reliability_metrics, sizes = range(100, 2001, 100), 
+                n_perm = 50, n_workers = None, seed = 0):
+    
+    decisions = load_decisions()
+    values = decisions[metrics].to_numpy(dtype=float)
+    lengths = decisions.groupby(['batter', 'Year'], sort=False).size().to_numpy()
+    starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    sizes = np.asarray(sizes)
+    
+    # observed pitch order
+    r = split_half(values, starts, lengths, sizes)
+    
+    # permutation repeats, split evenly across processes
+    if n_workers is None:
+        n_workers = os.cpu_count()
+    seeds = np.random.SeedSequence(seed).generate_state(n_perm)
+    chunks = [c for c in np.array_split(seeds, n_workers) if len(c) > 0]
+    
+    with ProcessPoolExecutor(len(chunks)) as executor:
+        futures = [executor.submit(permuted_split_half, values, starts, lengths, sizes, c) 
+                   for c in chunks]
+        perm = np.array([curve for f in futures for curve in f.result()])
+    
+    rows = []
+    for k, metric in enumerate(metrics):
+        for j, size in enumerate(sizes):
+            rows.append({'METRIC': metric,
+                         'N_P': size,
+                         'N_SEASONS': int(sum(lengths >= size)),
+                         'R': r[j][k],
+                         'R_FULL': 2*r[j][k]/(1 + r[j][k]),
+                         'R_PERM': np.nanmean(perm[:, j, k]),
+                         'R_LOW': np.nanpercentile(perm[:, j, k], 2.5),
+                         'R_HIGH': np.nanpercentile(perm[:, j, k], 97.5)})
+    
+    return pd.DataFrame(rows)
+
+def plot_reliability(curves, metric = 'player'):
+    
+    curve = curves[curves.METRIC == metric]
+    
+    plt.fill_between(curve.N_P, curve.R_LOW, curve.R_HIGH, color='lightgray')
+    plt.plot(curve.N_P, curve.R_PERM, '--k')
+    plt.scatter(curve.N_P, curve.R, s=10)
+    plt.title('Split-Half Reliability - ' + metric.title())
+    plt.xlabel('Number of Pitches')
+    plt.ylabel('Odd/Even Pitch Correlation')
+    plt.ylim([0,1])
+    plt.show()
+
+# curves = reliability()
+# plot_reliability(curves, 'classic')
+# plot_reliability(curves, 'player')
+
+
 ###############################################################################
 ########################### External Correlations #############################
 ###############################################################################
 
 
-# import player lists
-pdat_2021 = pd.read_csv('players_2021.csv')
-pdat_2022 = pd.read_csv('players_2022.csv')
-pdat_2023 = pd.read_csv('players_2023.csv')
-pdat_2024 = pd.read_csv('players_2024.csv')
-
-pdat_2021['Year'] = 2021
-pdat_2022['Year'] = 2022
-pdat_2023['Year'] = 2023
-pdat_2024['Year'] = 2024
-
-pstats = pd.concat([pdat_2021, pdat_2022, pdat_2023, pdat_2024], ignore_index=True)
-pstats = pstats.rename(columns={'player_id':'ID'})
-fuller_stats = pd.merge(full_stats, pstats, on=['ID', 'Year'])
+# player lists with outcome stats
+pstats = data.players.rename(columns={'player_id':'ID'})
+fuller_stats = data.fuller_stats
+fuller_pairs = pair_seasons(fuller_stats)
 
 def inseason_corr(ind_colname, dep_colname):
 
@@ -480,30 +358,8 @@ def inseason_corr(ind_colname, dep_colname):
 
 def nextseason_corr(ind_colname, dep_colname):
     
-    i_rows = []
-    d_rows = []
-    for i in range(len(fuller_stats) - 1):
-        if fuller_stats['ID'][i + 1] == fuller_stats['ID'][i]:
-            i1 = fuller_stats[ind_colname][i]
-            i2 = fuller_stats[ind_colname][i + 1]
-            i3 = fuller_stats['N_P'][i]
-            i_rows.append({'Year1': i1,
-                         'Year2': i2,
-                         'N_P': i3})
-            
-            d1 = fuller_stats[dep_colname][i]
-            d2 = fuller_stats[dep_colname][i + 1]
-            d_rows.append({'Year1': d1,
-                         'Year2': d2,
-                         'N_P': i3})
-            
-            
-    ind_pairs = pd.DataFrame(i_rows)
-    dep_pairs = pd.DataFrame(d_rows)
-    
-    
-    x = ind_pairs.Year1
-    y = dep_pairs.Year2
+    x = fuller_pairs.Year1[ind_colname]
+    y = fuller_pairs.Year2[dep_colname]
     
     m, b, r, p, std_err = stats.linregress(x, y)
     
@@ -522,15 +378,102 @@ def nextseason_corr(ind_colname, dep_colname):
     return r
 
 
-r = inseason_corr('SEAGER_x', 'iso')
-time.sleep(1)
-r = nextseason_corr('SEAGER_x', 'iso')
-time.sleep(1)
-r = inseason_corr('SEAGER_y', 'iso')
-time.sleep(1)
-r = nextseason_corr('SEAGER_y', 'iso')
 
 
+###############################################################################
+############################ Correlation Matrices #############################
+###############################################################################
+
+
+# SEAGER-family columns (classic = _x, player = _y) and outcome columns
+seager_cols = [c for c in full_stats.columns if c.endswith('_x') or c.endswith('_y')]
+outcome_cols = [c for c in pstats.select_dtypes('number').columns if c not in ['ID', 'Year']]
 
+# in-memory copy of the correlation cache
+correlations = {'key': None}
 
 
+# Pearson correlation of every column of x with every column of y
+def corr_matrix(x, y, method = 'pearson'):
+    
+    # spearman is pearson on ranks (ranked within each column)
+    if method == 'spearman':
+        x = x.rank()
+        y = y.rank()
+    elif method != 'pearson':
+        raise ValueError("Options for 'method' are: pearson, spearman")
+    
+    X = x.to_numpy(dtype=float)
+    Y = y.to_numpy(dtype=float)
+    
+    # pairwise complete observations, like linregress on the non-null rows
+    mx = ~np.isnan(X)
+    my = ~np.isnan(Y)
+    X = np.where(mx, X, 0)
+    Y = np.where(my, Y, 0)
+    mx = mx.astype(float)
+    my = my.astype(float)
+    
+    # all sums for all column pairs as matrix products
+    n = mx.T @ my
+    sx = X.T @ my
+    sy = mx.T @ Y
+    sxx = (X**2).T @ my
+    syy = mx.T @ Y**2
+    sxy = X.T @ Y
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = sxy - sx*sy/n
+        var_x = sxx - sx**2/n
+        var_y = syy - sy**2/n
+        r = cov/np.sqrt(var_x*var_y)
+    
+    return pd.DataFrame(r, index=x.columns, columns=y.columns)
+
+
+# Compute (or load) every SEAGER vs. outcome correlation matrix
+def get_correlations(filename = 'correlations.pkl'):
+    
+    global correlations
+    
+    # cache is keyed by the contents of the merged data
+    key = hashlib.sha1(pd.util.hash_pandas_object(fuller_stats).to_numpy()).hexdigest()
+    
+    if correlations['key'] == key:
+        return correlations
+    
+    if os.path.exists(filename):
+        with open(filename, 'rb') as f:
+            cached = pickle.load(f)
+        if cached['key'] == key:
+            correlations = cached
+            return correlations
+    
+    correlations = {'key': key}
+    for method in ['pearson', 'spearman']:
+        correlations[method, 'same'] = corr_matrix(fuller_stats[seager_cols], 
+                                                   fuller_stats[outcome_cols], method)
+        correlations[method, 'next'] = corr_matrix(fuller_pairs.Year1[seager_cols], 
+                                                   fuller_pairs.Year2[outcome_cols], method)
+    
+    with open(filename, 'wb') as f:
+        pickle.dump(correlations, f)
+    
+    return correlations
+
+
+# Look up a single correlation without recomputing
+def get_corr(ind_colname, dep_colname, method = 'pearson', season = 'same'):
+    
+    if season not in ['same', 'next']:
+        raise ValueError("Options for 'season' are: same, next")
+    
+    return get_correlations()[method, season].loc[ind_colname, dep_colname]
+
+
+if __name__ == '__main__':
+    
+    for colname in ['SEAGER_x', 'SEAGER_y']:
+        print(colname + ' vs. iso: R = ' + str(round(get_corr(colname, 'iso'), 2)) + 
+              ' (same season), ' + str(round(get_corr(colname, 'iso', season = 'next'), 2)) + 
+              ' (next season)')
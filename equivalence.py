@@ -0,0 +1,460 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Equivalence harness for SEAGER engines
+#
+
+# A faster get_league_data, get_player_data or swing_take is only useful if
+# it produces the same leaderboards. check() runs the frozen reference engine
+# (seager_reference.py, with the deliberate corrections in reference_fixes.py)
+# and a candidate engine (seager_mod by default) on the same fixed synthetic
+# input, each in its own scratch directory, and compares every output: the
+# league and player heatmaps and zone values, every column of the classic and
+# player leaderboards, and the per-pitch decision values. The report has one
+# row per output and metric with the largest absolute and relative deviation
+# and the number of values outside tolerance. benchmark.py runs it before
+# timing anything.
+#
+# The other scorers are checked against the same reference outputs: the
+# production pipeline with its default (unshrunk) player zone values, which
+# go through shrinkage.player_zone_rv rather than get_player_data
+# (pipeline_<output>), the sweep's vectorized scoring of the reference maps
+# against the leaderboard columns it reports (sweep_board), the live scorer's
+# decision values for every pitch (live_<year>), and the pitcher
+# leaderboard written by the candidate's swing_take against the one regrouped
+# from the reference decisions (pitcher_st_<year>). The ingest case stores
+# the last season only up to a cut-off date, runs the pipeline, ingests the
+# rest through ingest.update and runs the pipeline again; its outputs must
+# then match the reference on every pitch (ingest_<output>).
+#
+# The frozen reference is itself checked against the baseline engine
+# (seager_baseline.py, seager_mod as it was before any of this work): the
+# baseline case runs both on the same input, with the reference uncorrected,
+# and compares the heatmaps and leaderboards (baseline_<output>). Real
+# Statcast seasons need a download, so this runs on the synthetic input like
+# everything else.
+#
+# seager_reference.py must stay exactly as it was committed with the harness,
+# and seager_baseline.py as it was committed with the baseline case. Their
+# code (everything from the imports down) is pinned by hash, and check()
+# refuses to run against either if it has changed.
+
+
+import hashlib
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+import reference_fixes
+import seager_mod
+import seager_reference
+import synthetic
+from live_scoring import LiveScorer, grid_x, grid_z
+
+
+years = ['2021', '2022', '2023', '2024']
+
+seager_baseline_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'seager_baseline.py')
+
+# absolute tolerance by output; leaderboards are rounded to 0.1 and must match
+tolerances = {'array': 1e-9,
+              'leaderboard': 1e-6,
+              'decisions': 1e-9}
+
+report_cols = ['OUTPUT', 'METRIC', 'MAX_ABS', 'MAX_REL', 'N_DIFF', 'N', 'PASS']
+
+# sha1 of seager_reference.py from its first import on
+reference_sha1 = '3f3a772ae6d751bba7cab47d776f7ab748557e8d'
+baseline_sha1 = '6ea0243bfcaf3124986a89615e9d1be4d78289a3'
+
+# checks besides the engine's own outputs
+default_cases = ('baseline', 'pipeline', 'sweep', 'live', 'pitcher', 'ingest')
+
+# a pitch, in the decision tables
+pitch_key = ['batter', 'game_date', 'at_bat_number', 'pitch_number']
+
+# the league arrays are allocated with np.empty and only partly written: the
+# called strike grid has no count, and only the swing rate and swing RV zone
+# maps are kept. Everything outside these slices is leftover memory
+defined = {'league_heatmaps': [np.s_[0:4], np.s_[4, 0, 0]],
+           'league_zonemaps': [np.s_[1:3]]}
+defined.update({prefix + name: s for prefix in ['baseline_', 'pipeline_', 'ingest_'] for name, s in list(defined.items())})
+
+
+###############################################################################
+################################## Engines ####################################
+###############################################################################
+
+
+# fixed input: synthetic pitches and the matching player lists
+def fixed_input(n_pitches = 40000, n_batters = 200, seed = 2024):
+
+    pitch_data, year_pitch_data = synthetic.generate(n_pitches, n_batters, seed=seed)
+    min_pitches = int(min(100, max(20, n_pitches/(8*n_batters))))
+
+    return pitch_data, year_pitch_data, min_pitches
+
+def reference_hash(filename = seager_reference.__file__):
+
+    with open(filename) as f:
+        source = f.read()
+
+    return hashlib.sha1(source[source.index('\nimport ') + 1:].encode()).hexdigest()
+
+# a scratch directory with the fixed player lists, for one run
+@contextmanager
+def scratch_dir(year_pitch_data, min_pitches, seed = 2024):
+
+    cwd = os.getcwd()
+    scratch = tempfile.mkdtemp(prefix='seager_equiv_')
+    os.chdir(scratch)
+
+    try:
+        synthetic.write_players(year_pitch_data, min_pitches=min_pitches, seed=seed)
+        yield scratch
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(scratch, ignore_errors=True)
+
+# every output of one engine, run in its own directory
+def run_engine(engine, pitch_data, year_pitch_data, min_pitches, seed = 2024, **params):
+
+    with scratch_dir(year_pitch_data, min_pitches, seed):
+
+        league_params = {k: v for k, v in params.items() if k in ['n_iter', 'ball_rv', 'strike_rv']}
+        player_params = {k: v for k, v in params.items() if k in ['n_iter', 'strike_rv']}
+        score_params = {k: v for k, v in params.items() if k in ['bias']}
+
+        outputs = {}
+        outputs['league_heatmaps'] = np.asarray(engine.get_league_data(pitch_data, **league_params))
+        outputs['player_heatmaps'] = np.asarray(engine.get_player_data(pitch_data, **player_params))
+        outputs['league_zonemaps'] = np.load('league_zonemaps.npy')
+        outputs['player_zone_rv'] = np.load('player_zone_rv.npy')
+
+        for year in years:
+            classic_st, player_st = engine.swing_take(year, year_pitch_data, outputs['league_heatmaps'],
+                                                      outputs['player_heatmaps'], **score_params)
+            outputs['classic_st_' + year] = classic_st
+            outputs['player_st_' + year] = player_st
+            outputs['decisions_' + year] = pd.read_pickle('decisions_' + year + '.pkl')
+            if os.path.exists('pitcher_st_' + year + '.csv'):
+                outputs['pitcher_st_' + year] = pd.read_csv('pitcher_st_' + year + '.csv', index_col=0)
+
+    return outputs
+
+# the baseline engine's heatmaps and leaderboards, scored with the last
+# smoothing frame of its player maps
+def run_baseline(pitch_data, year_pitch_data, min_pitches, seed = 2024):
+
+    import seager_baseline
+
+    with scratch_dir(year_pitch_data, min_pitches, seed):
+
+        outputs = {}
+        outputs['baseline_league_heatmaps'] = np.asarray(seager_baseline.get_league_data(pitch_data))
+        outputs['baseline_league_zonemaps'] = np.load('league_zonemaps.npy')
+        outputs['baseline_player_heatmaps'] = np.asarray(seager_baseline.get_player_data(pitch_data))[:, :, :, -1]
+
+        for year in years:
+            classic_st, player_st = seager_baseline.swing_take(year, year_pitch_data,
+                                                               outputs['baseline_league_heatmaps'],
+                                                               outputs['baseline_player_heatmaps'])
+            outputs['baseline_classic_st_' + year] = classic_st
+            outputs['baseline_player_st_' + year] = player_st
+
+    return outputs
+
+# the same outputs from the cached stage pipeline (and its shrinkage stage,
+# at k = 0), run from scratch
+def run_pipeline(pitch_data, year_pitch_data, min_pitches, seed = 2024, **params):
+
+    import pipeline
+
+    with scratch_dir(year_pitch_data, min_pitches, seed):
+
+        run = pipeline.run_seager((pitch_data, year_pitch_data), report=None, years=years,
+                                  k_swings=0, k_contact=0, **params)
+
+        outputs = {}
+        outputs['pipeline_league_heatmaps'] = np.load('league_heatmaps.npy')
+        outputs['pipeline_league_zonemaps'] = np.load('league_zonemaps.npy')
+        outputs['pipeline_player_heatmaps'] = np.load('player_heatmaps.npy')
+        outputs['pipeline_player_zone_rv'] = np.load('player_zone_rv.npy')
+        for year in years:
+            classic_st, player_st, decisions, _ = run.outputs['season_' + year]
+            outputs['pipeline_classic_st_' + year] = classic_st
+            outputs['pipeline_player_st_' + year] = player_st
+            outputs['pipeline_decisions_' + year] = decisions
+
+    return outputs
+
+# the pipeline's outputs after a nightly ingest: the last season is stored
+# up to cut_off, run through the pipeline, completed by ingest.update and run
+# through the pipeline again, which has to pick up the new pitches
+def run_ingest(pitch_data, year_pitch_data, min_pitches, seed = 2024, cut_off = 0.8, **params):
+
+    import ingest
+    import pipeline
+    import seasons
+
+    with scratch_dir(year_pitch_data, min_pitches, seed):
+
+        last = year_pitch_data[-1]
+        date = last.game_date.iloc[int(len(last)*cut_off)]
+        os.makedirs(seasons.partition_dir)
+        for year, pitches in zip(years, year_pitch_data[:-1] + [last[last.game_date < date]]):
+            pitches.to_pickle(seasons.partition_file(year))
+        last[last.game_date >= date].to_pickle('new_pitches.pkl')
+
+        pipeline.run_seager(report=None, years=years, **params)
+        ingest.update(years, ingest.FileSource('new_pitches.pkl'))
+        run = pipeline.run_seager(report=None, years=years, **params)
+
+        outputs = {}
+        for name in ['league_heatmaps', 'league_zonemaps', 'player_heatmaps', 'player_zone_rv']:
+            outputs['ingest_' + name] = np.load(name + '.npy')
+        for year in years:
+            outputs['ingest_classic_st_' + year] = pd.read_csv('classic_st_' + year + '.csv', index_col=0)
+            outputs['ingest_player_st_' + year] = pd.read_csv('player_st_' + year + '.csv', index_col=0)
+            outputs['ingest_decisions_' + year] = run.outputs['season_' + year][2]
+
+    return outputs
+
+# the sweep's leaderboard metrics, from an engine's heatmaps (the same league
+# maps for every season)
+def run_sweep(outputs, pitch_data, year_pitch_data, min_pitches, seed = 2024, bias = 0):
+
+    import sweep
+
+    with scratch_dir(year_pitch_data, min_pitches, seed):
+        prepared = sweep.prepare((pitch_data, year_pitch_data), years)
+
+    league_heatmaps = np.repeat(outputs['league_heatmaps'][None], len(prepared['count_years']), axis=0)
+    board = sweep.score(prepared, league_heatmaps, outputs['player_heatmaps'], bias)
+
+    return {'sweep_board': board.reset_index().sort_values(['ID', 'Year'], ignore_index=True)}
+
+# the same columns from the batter leaderboards
+def sweep_board(reference):
+
+    import sweep
+
+    boards = []
+    for year in years:
+        classic = reference['classic_st_' + year].drop_duplicates('ID').set_index('ID')
+        player = reference['player_st_' + year].drop_duplicates('ID').set_index('ID')
+        board = pd.concat([classic[['N_P']], classic[sweep.metrics].add_prefix('CLASSIC_'),
+                           player[sweep.metrics].add_prefix('PLAYER_')], axis=1)
+        boards.append(board.assign(Year=int(year)).reset_index())
+
+    board = pd.concat(boards, ignore_index=True).sort_values(['ID', 'Year'], ignore_index=True)
+
+    return board[['ID', 'Year', 'N_P'] + [m + '_' + c for m in ['CLASSIC', 'PLAYER'] for c in sweep.metrics]]
+
+# the live scorer's decision values for every scored pitch, from an engine's
+# heatmaps
+def run_live(outputs, year_pitch_data, min_pitches, seed = 2024, bias = 0):
+
+    with scratch_dir(year_pitch_data, min_pitches, seed):
+
+        np.save('league_heatmaps.npy', outputs['league_heatmaps'])
+        np.save('player_heatmaps.npy', outputs['player_heatmaps'])
+        seager_mod.player_index(years).save('player_heatmaps_index.csv')
+        scorer = LiveScorer()
+
+        live = {}
+        for year in years:
+            pitches = year_pitch_data[years.index(year)]
+            listed = pd.read_csv('players_' + year + '.csv').player_id
+            pitches = pitches[pitches.batter.isin(listed)]
+            scored = scorer.score_batch(pitches, bias)
+            live['live_' + year] = decision_values(pd.concat([pitches.loc[scored.index, pitch_key[1:]],
+                                                              scored], axis=1))
+
+    return live
+
+# decision values in pitch order, one row per pitch
+def decision_values(decisions):
+
+    cols = pitch_key + ['swing', 'classic', 'player', 'classic_good', 'player_good']
+
+    return decisions[cols].drop_duplicates(pitch_key).sort_values(pitch_key, ignore_index=True)
+
+# the reference decisions with what the pitcher leaderboard also reads (the
+# frozen swing_take predates it): the pitcher, from the pitch data, and the
+# run value of the decision made, from the reference heatmaps
+def pitcher_decisions(decisions, pitches, league_heatmaps, player_heatmaps):
+
+    d = decisions.merge(pitches[pitch_key + ['pitcher']].drop_duplicates(pitch_key), on=pitch_key, how='left')
+
+    b, s = d.balls.to_numpy(dtype=int), d.strikes.to_numpy(dtype=int)
+    ix, iz = grid_x(d.plate_x.to_numpy(dtype=float)), grid_z(d.plate_z.to_numpy(dtype=float))
+    rows = reference_fixes.heatmap_rows()
+    row = d.batter.map(rows).to_numpy(dtype=int)
+
+    trv = league_heatmaps[3][b, s, ix, iz]
+    d['classic_rv'] = np.where(d.swing, league_heatmaps[2][b, s, ix, iz], trv)
+    d['player_rv'] = np.where(d.swing, player_heatmaps[row, b, s, ix, iz], trv)
+
+    return d
+
+# what the other scorers should give, from the reference outputs
+def expected_outputs(reference, year_pitch_data, min_pitches, seed = 2024, cases = default_cases):
+
+    expected = {}
+    if 'pipeline' in cases:
+        for name in ['league_heatmaps', 'league_zonemaps', 'player_heatmaps', 'player_zone_rv'] + \
+                    [kind + '_' + year for kind in ['classic_st', 'player_st', 'decisions'] for year in years]:
+            expected['pipeline_' + name] = reference[name]
+
+    if 'ingest' in cases:
+        for name in ['league_heatmaps', 'league_zonemaps', 'player_heatmaps', 'player_zone_rv']:
+            expected['ingest_' + name] = reference[name]
+        for year in years:
+            expected['ingest_decisions_' + year] = reference['decisions_' + year]
+            for kind in ['classic_st', 'player_st']:
+                expected['ingest_' + kind + '_' + year] = reference[kind + '_' + year]
+
+    if 'sweep' in cases:
+        expected['sweep_board'] = sweep_board(reference)
+
+    with scratch_dir(year_pitch_data, min_pitches, seed):
+        for year in years:
+            decisions = reference['decisions_' + year]
+            if 'live' in cases:
+                expected['live_' + year] = decision_values(decisions)
+            if 'pitcher' in cases:
+                d = pitcher_decisions(decisions, year_pitch_data[years.index(year)],
+                                      reference['league_heatmaps'], reference['player_heatmaps'])
+                expected['pitcher_st_' + year] = seager_mod.pitcher_leaderboard(d)
+
+    return expected
+
+
+###############################################################################
+################################# Comparison ##################################
+###############################################################################
+
+
+def diff_values(name, metric, ref, cand, atol):
+
+    ref = np.asarray(ref)
+    cand = np.asarray(cand)
+
+    if ref.shape != cand.shape:
+        return {'OUTPUT': name, 'METRIC': metric + ' (shape ' + str(cand.shape) + ' vs ' + str(ref.shape) + ')',
+                'MAX_ABS': np.nan, 'MAX_REL': np.nan, 'N_DIFF': max(ref.size, cand.size),
+                'N': ref.size, 'PASS': False}
+
+    # non-numeric columns must match exactly
+    if not (np.issubdtype(ref.dtype, np.number) or ref.dtype == bool):
+        n_diff = int((ref != cand).sum())
+        return {'OUTPUT': name, 'METRIC': metric, 'MAX_ABS': np.nan, 'MAX_REL': np.nan,
+                'N_DIFF': n_diff, 'N': ref.size, 'PASS': n_diff == 0}
+
+    ref = ref.astype(float)
+    cand = cand.astype(float)
+    both_nan = np.isnan(ref) & np.isnan(cand)
+    abs_diff = np.where(both_nan, 0, np.abs(cand - ref))
+    abs_diff = np.where(np.isnan(abs_diff), np.inf, abs_diff)
+    rel_diff = abs_diff/np.maximum(np.abs(ref), 1e-12)
+
+    n_diff = int((abs_diff > atol).sum())
+
+    return {'OUTPUT': name,
+            'METRIC': metric,
+            'MAX_ABS': float(abs_diff.max()) if abs_diff.size else 0.0,
+            'MAX_REL': float(np.where(abs_diff > 0, rel_diff, 0).max()) if abs_diff.size else 0.0,
+            'N_DIFF': n_diff,
+            'N': ref.size,
+            'PASS': n_diff == 0}
+
+def compare_outputs(reference, candidate, tolerances = tolerances):
+
+    rows = []
+    for name, ref in reference.items():
+
+        if name not in candidate:
+            rows.append({'OUTPUT': name, 'METRIC': 'missing', 'MAX_ABS': np.nan, 'MAX_REL': np.nan,
+                         'N_DIFF': np.nan, 'N': np.nan, 'PASS': False})
+            continue
+
+        cand = candidate[name]
+
+        if isinstance(ref, np.ndarray):
+            if name in defined and ref.shape == np.shape(cand):
+                ref = np.concatenate([ref[s].ravel() for s in defined[name]])
+                cand = np.concatenate([np.asarray(cand)[s].ravel() for s in defined[name]])
+            rows.append(diff_values(name, 'array', ref, cand, tolerances['array']))
+            continue
+
+        atol = tolerances['decisions'] if name.startswith('decisions') else tolerances['leaderboard']
+
+        # every column, in the reference's order
+        for col in ref.columns:
+            if col not in cand.columns:
+                rows.append({'OUTPUT': name, 'METRIC': col + ' (missing)', 'MAX_ABS': np.nan,
+                             'MAX_REL': np.nan, 'N_DIFF': len(ref), 'N': len(ref), 'PASS': False})
+            else:
+                rows.append(diff_values(name, col, ref[col].to_numpy(), cand[col].to_numpy(), atol))
+
+        for col in cand.columns:
+            if col not in ref.columns:
+                rows.append({'OUTPUT': name, 'METRIC': col + ' (extra)', 'MAX_ABS': np.nan,
+                             'MAX_REL': np.nan, 'N_DIFF': 0, 'N': len(cand), 'PASS': True})
+
+    return pd.DataFrame(rows, columns=report_cols)
+
+# run both engines (and the other scorers) on the fixed input and compare
+# every output
+def check(candidate = seager_mod, reference = reference_fixes, n_pitches = 40000, n_batters = 200,
+          seed = 2024, tolerances = tolerances, verbose = True, cases = default_cases, **params):
+
+    if reference_hash() != reference_sha1:
+        raise RuntimeError('seager_reference.py has been edited; corrections belong in reference_fixes.py')
+    if 'baseline' in cases and reference_hash(seager_baseline_file) != baseline_sha1:
+        raise RuntimeError('seager_baseline.py has been edited')
+
+    pitch_data, year_pitch_data, min_pitches = fixed_input(n_pitches, n_batters, seed)
+
+    ref = run_engine(reference, pitch_data, year_pitch_data, min_pitches, seed, **params)
+    cand = run_engine(candidate, pitch_data, year_pitch_data, min_pitches, seed, **params)
+
+    ref.update(expected_outputs(ref, year_pitch_data, min_pitches, seed, cases))
+
+    # the baseline has no parameters, and none of the corrections
+    if 'baseline' in cases and not params:
+        frozen = run_engine(seager_reference, pitch_data, year_pitch_data, min_pitches, seed)
+        baseline = run_baseline(pitch_data, year_pitch_data, min_pitches, seed)
+        ref.update({name: frozen[name[len('baseline_'):]] for name in baseline})
+        cand.update(baseline)
+    if 'pipeline' in cases:
+        cand.update(run_pipeline(pitch_data, year_pitch_data, min_pitches, seed, **params))
+    if 'ingest' in cases:
+        cand.update(run_ingest(pitch_data, year_pitch_data, min_pitches, seed, **params))
+    if 'sweep' in cases:
+        cand.update(run_sweep(cand, pitch_data, year_pitch_data, min_pitches, seed, params.get('bias', 0)))
+    if 'live' in cases:
+        cand.update(run_live(cand, year_pitch_data, min_pitches, seed, params.get('bias', 0)))
+
+    report = compare_outputs(ref, cand, tolerances)
+
+    if verbose:
+        failed = report[~report.PASS]
+        print()
+        if len(failed) == 0:
+            print('Equivalent:', len(report), 'outputs and columns within tolerance')
+        else:
+            print('NOT EQUIVALENT:', len(failed), 'of', len(report), 'outputs and columns differ')
+            print(failed.to_string(index=False))
+        print()
+
+    return report
+
+
+if __name__ == '__main__':
+
+    report = check()
+    print(report.groupby('OUTPUT')[['MAX_ABS', 'N_DIFF']].max().to_string())
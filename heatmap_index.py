@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Player heatmap row index
+#
+
+# The rows of player_heatmaps.npy (and player_zone_rv.npy) follow the
+# deduplicated union of the players_<year>.csv files, but swing_take used to
+# index them with each batter's position in a single season's list, and the
+# analysis scripts with positions in yet other lists. HeatmapIndex maps an
+# MLBAM ID (and optionally a season) to its row, is written next to the
+# heatmaps as <heatmap file>_index.csv whenever they are built, and is what
+# every reader uses to find a batter's maps. A row with a blank season is the
+# batter's map over all seasons; rows with a season are per-season maps, which
+# sit in the same array and use the same league maps. row(pid, season) falls
+# back to the all-season map when there is no map for that season.
+
+
+import os
+import numpy as np
+import pandas as pd
+
+
+def index_file(heatmap_file = 'player_heatmaps.npy'):
+    return os.path.splitext(heatmap_file)[0] + '_index.csv'
+
+
+class HeatmapIndex:
+
+    def __init__(self, ids, seasons = None):
+
+        # one entry per heatmap row; season '' is all seasons
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.seasons = [''] * len(self.ids) if seasons is None else [str(s) for s in seasons]
+
+        # first row wins if an ID appears twice (two spellings of one name)
+        self.rows = {}
+        for row, (pid, season) in enumerate(zip(self.ids, self.seasons)):
+            self.rows.setdefault((int(pid), season), row)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, pid):
+        return (int(pid), '') in self.rows
+
+    # heatmap row of a batter, for one season where there is a map for it
+    def row(self, pid, season = None):
+
+        if season is not None:
+            row = self.rows.get((int(pid), str(season)))
+            if row is not None:
+                return row
+
+        row = self.rows.get((int(pid), ''))
+        if row is None:
+            raise KeyError('Player ID ' + str(pid) + ' has no player heatmap')
+
+        return row
+
+    # rows of the all-season maps, in order
+    def pooled(self):
+        return np.array([row for row, season in enumerate(self.seasons) if season == ''])
+
+    def save(self, filename = index_file()):
+        pd.DataFrame({'ID': self.ids, 'SEASON': self.seasons}).to_csv(filename, index=False)
+
+    @classmethod
+    def load(cls, filename = index_file()):
+
+        df = pd.read_csv(filename, dtype={'ID': 'int64', 'SEASON': 'str'}, keep_default_na=False)
+
+        return cls(df.ID, df.SEASON)
+
+
+# index of a heatmap file; heatmaps built before the index existed follow
+# the player lists in load_data order
+def load_index(heatmap_file = 'player_heatmaps.npy'):
+
+    if os.path.exists(index_file(heatmap_file)):
+        return HeatmapIndex.load(index_file(heatmap_file))
+
+    from seager_data import load_data
+
+    return HeatmapIndex(load_data(os.path.dirname(heatmap_file) or '.').names.ID)
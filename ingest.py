@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Incremental Statcast ingest
+#
+
+# fetch_season downloads a season's full date range once, so keeping the
+# current season's leaderboard up to date meant deleting its partition and
+# fetching the whole season again. ingest() fetches only the dates after the
+# last game_date already in each season's partition and appends those pitches
+# to it. The last ingested date of every season is kept in
+# statcast/ingest_state.json. update() is the nightly job. After an ingest it
+# finds the listed batters with new pitches and rebuilds only their rows of
+# player_zone_rv, player_heatmaps and each season's leaderboards (and
+# decisions). Everyone else's rows are left as they were, and the pitcher
+# leaderboard is regrouped from the merged decisions. The parameters and
+# baselines are those of the last pipeline run (pipeline_params.json), and
+# only seasons that already have a partition are read; nothing is downloaded
+# except the new dates.
+#
+# The league heatmaps are not rebuilt, since a day of pitches barely moves
+# them and rebuilding them would change every batter's row. (With k_swings or
+# k_contact set, the changed batters are shrunk toward league rates from
+# every stored pitch and the others keep the rates of their last build.) The
+# next full pipeline run rebuilds everything from the same partitions: an
+# ingest changes a partition's size and modification time, which are part of
+# the pipeline's keys.
+#
+# Dates come from a source: any object with fetch(start_dt, end_dt) that
+# returns Statcast rows. PybaseballSource downloads them and FileSource reads
+# them from a local CSV or pickle, so an ingest can run without a download.
+# Since Statcast can publish a game late, the last few days are fetched again
+# on every ingest and only pitches not already stored are appended.
+
+
+import datetime
+import json
+import os
+import numpy as np
+import pandas as pd
+import pipeline
+import season_league
+import seager_mod
+import seasons
+import shrinkage
+from heatmap_index import HeatmapIndex, index_file, load_index
+from instrument import step
+
+
+state_name = 'ingest_state.json'
+
+# a pitch appears once per season
+pitch_key = ['game_pk', 'at_bat_number', 'pitch_number']
+
+# Statcast can publish a game's pitches a day or more late, so the last
+# lookback days before end are fetched again on every ingest
+lookback = 3
+
+
+###############################################################################
+################################### Sources ###################################
+###############################################################################
+
+
+class PybaseballSource:
+
+    def fetch(self, start_dt, end_dt):
+
+        import pybaseball
+        pybaseball.cache.enable()
+
+        return pybaseball.statcast(start_dt, end_dt)
+
+class FileSource:
+
+    def __init__(self, filename):
+        self.filename = filename
+
+    def fetch(self, start_dt, end_dt):
+
+        if self.filename.endswith('.csv'):
+            pitches = pd.read_csv(self.filename, parse_dates=['game_date'])
+        else:
+            pitches = pd.read_pickle(self.filename)
+
+        date = pd.to_datetime(pitches.game_date)
+
+        return pitches[(date >= pd.Timestamp(start_dt)) & (date <= pd.Timestamp(end_dt))]
+
+
+###############################################################################
+################################ Ingest State #################################
+###############################################################################
+
+
+def state_file(path = '.'):
+    return os.path.join(path, seasons.partition_dir, state_name)
+
+def load_state(path = '.'):
+
+    if not os.path.exists(state_file(path)):
+        return {}
+
+    with open(state_file(path)) as f:
+        return json.load(f)
+
+def save_state(state, path = '.'):
+
+    os.makedirs(os.path.dirname(state_file(path)), exist_ok=True)
+
+    tmp = state_file(path) + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(tmp, state_file(path))
+
+# last game_date in a season's partition: from the state file, else from the
+# partition itself, else the day before the season starts
+def last_date(year, path = '.', state = None):
+
+    if state is None:
+        state = load_state(path)
+
+    if str(year) in state:
+        return pd.Timestamp(state[str(year)])
+
+    filename = seasons.partition_file(year, path)
+    if os.path.exists(filename):
+        pitches = pd.read_pickle(filename)
+        if len(pitches):
+            return pd.to_datetime(pitches.game_date).max().normalize()
+
+    return pd.Timestamp(seasons.dates(year)[0]) - pd.Timedelta(days=1)
+
+
+###############################################################################
+################################### Ingest ####################################
+###############################################################################
+
+
+# append the dates after each season's last ingested date (up to end, by
+# default yesterday), and any pitches from the last lookback days that were
+# not there before, to its partition; returns the new pitches by season
+def ingest(years = None, source = None, path = '.', end = None):
+
+    if years is None:
+        years = seasons.active
+    if source is None:
+        source = PybaseballSource()
+    if end is None:
+        end = datetime.date.today() - datetime.timedelta(days=1)
+
+    state = load_state(path)
+    new = {}
+    for year in [str(y) for y in years]:
+        start = last_date(year, path, state) + pd.Timedelta(days=1)
+        start = min(start, max(pd.Timestamp(end) - pd.Timedelta(days=lookback - 1),
+                               pd.Timestamp(seasons.dates(year)[0])))
+        stop = min(pd.Timestamp(end), pd.Timestamp(seasons.dates(year)[1]))
+        if start > stop:
+            continue
+
+        with step('ingest fetch ' + year):
+            pitches = source.fetch(start.strftime('%Y-%m-%d'), stop.strftime('%Y-%m-%d'))
+
+        filename = seasons.partition_file(year, path)
+        if os.path.exists(filename):
+            stored = pd.read_pickle(filename)
+        else:
+            stored = pitches.iloc[:0]
+
+        # a re-delivered pitch is only stored once
+        key = [k for k in pitch_key if k in pitches and k in stored]
+        if key and len(stored):
+            seen = pd.MultiIndex.from_frame(stored[key])
+            pitches = pitches[~pd.MultiIndex.from_frame(pitches[key]).isin(seen)]
+
+        if len(pitches):
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            pd.concat([stored, pitches], ignore_index=True).to_pickle(filename)
+            new[year] = pitches
+
+        # dates with no games count as ingested too; a game published late is
+        # still picked up while its date is within lookback days of end
+        state[year] = stop.strftime('%Y-%m-%d')
+        save_state(state, path)
+
+    return new
+
+# listed batters with new pitches, by season
+def changed_batters(new, index):
+
+    return {year: sorted(int(pid) for pid in pitches.batter.unique() if pid in index)
+            for year, pitches in new.items()}
+
+
+###############################################################################
+################################ Player Update ################################
+###############################################################################
+
+
+# heatmap rows covering new pitches: each changed batter's all-season row and
+# their row for the season the pitches are from
+def changed_rows(index, changed):
+
+    rows = []
+    for row, (pid, season) in enumerate(zip(index.ids, index.seasons)):
+        if any(int(pid) in batters and season in ('', year) for year, batters in changed.items()):
+            rows.append(row)
+
+    return np.array(rows, dtype=int)
+
+# rebuild the changed rows of player_zone_rv and player_heatmaps from every
+# stored pitch, shrunk as in the pipeline
+def update_players(pitch_data, index, changed, n_iter = 10, k_swings = 0, k_contact = 0,
+                   strike_rv = seager_mod.strike_rv, path = '.'):
+
+    rows = changed_rows(index, changed)
+    if not len(rows):
+        return rows
+
+    subset = HeatmapIndex(index.ids[rows], [index.seasons[row] for row in rows])
+
+    with step('ingest player zone counts', rows = len(pitch_data)):
+        player, league = shrinkage.zone_counts(pitch_data, subset)
+        player_rv = shrinkage.shrunk_zone_rv(player, league, k_swings, k_contact, strike_rv)
+
+    with step('ingest player diffusion', rows = len(rows)):
+        heatmaps = seager_mod.make_heatmaps(player_rv, n_iter)
+
+    for name, values in [('player_zone_rv.npy', player_rv), ('player_heatmaps.npy', heatmaps)]:
+        filename = os.path.join(path, name)
+        x = np.load(filename)
+        x[rows] = values
+        np.save(filename, x, allow_pickle=True)
+        index.save(index_file(filename))
+
+    return rows
+
+
+###############################################################################
+################################# Nightly Job #################################
+###############################################################################
+
+
+# ingest new dates, then update the changed batters' player maps and
+# leaderboard rows; returns the new pitch count of every changed batter.
+# Parameters left as None are those of the last pipeline run
+def update(years = None, source = None, end = None, bias = None, n_iter = None, k_swings = None,
+           k_contact = None, season_baselines = None, league_file = 'league_heatmaps.npy',
+           strike_rv = seager_mod.strike_rv):
+
+    params = pipeline.run_params()
+    bias = params['bias'] if bias is None else bias
+    n_iter = params['n_iter'] if n_iter is None else n_iter
+    k_swings = params['k_swings'] if k_swings is None else k_swings
+    k_contact = params['k_contact'] if k_contact is None else k_contact
+    season_baselines = params['season_baselines'] if season_baselines is None else season_baselines
+
+    if years is None:
+        years = seasons.active
+    years = [str(y) for y in years]
+
+    new = ingest(years, source, end=end)
+
+    index = load_index('player_heatmaps.npy')
+    changed = {year: batters for year, batters in changed_batters(new, index).items() if batters}
+
+    report = pd.DataFrame([{'YEAR': year, 'ID': pid, 'NEW_PITCHES': int((new[year].batter == pid).sum())}
+                           for year, batters in changed.items() for pid in batters],
+                          columns=['YEAR', 'ID', 'NEW_PITCHES'])
+    if not changed:
+        return report
+
+    # every stored pitch, from the seasons that have a partition
+    year_pitch_data = {year: pd.read_pickle(seasons.partition_file(year)) for year in years
+                       if os.path.exists(seasons.partition_file(year))}
+    all_pitch_data = pd.concat(year_pitch_data.values())
+
+    update_players(all_pitch_data, index, changed, n_iter, k_swings, k_contact, strike_rv)
+
+    # an all-season map changes every season the batter is scored in; each
+    # season is scored against the baseline the pipeline used for it
+    player_heatmaps = np.load('player_heatmaps.npy')
+    touched = set(pid for batters in changed.values() for pid in batters)
+    for year, pitches in year_pitch_data.items():
+        batters = [pid for pid in touched if (pitches.batter == pid).any()]
+        if batters:
+            league_heatmaps = season_league.load(year) if season_baselines else np.load(league_file)
+            seager_mod.swing_take(year, year_pitch_data, league_heatmaps, player_heatmaps, bias, index,
+                                  batters)
+
+    return report
+
+
+if __name__ == '__main__':
+
+    print(update().to_string(index=False))
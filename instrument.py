@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Run instrumentation for the SEAGER pipeline
+#
+
+# The tqdm bars in seager_mod show progress but not where the time goes or
+# how large the process gets. Wrapping a piece of work in step() records its
+# wall time, CPU time, resident memory (current and peak) and, when given a
+# row count, throughput. Steps nest, so the pipeline stages and the sub-steps
+# inside seager_mod (zone aggregation, called strike grid, diffusion, scoring)
+# end up in one tree, which write_report() saves as JSON. step() costs a few
+# microseconds and does nothing beyond timing unless a report is written, so
+# it stays in the code permanently.
+#
+# SamplingProfiler is an optional statistical profiler: a background thread
+# samples the main thread's stack every few milliseconds and counts collapsed
+# stacks, which can be fed to any flame graph tool.
+
+
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from contextlib import contextmanager
+
+# not available on Windows
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+###############################################################################
+################################### Memory ####################################
+###############################################################################
+
+
+# current resident set size in MB, where the platform exposes it
+def rss_mb():
+
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1])*os.sysconf('SC_PAGE_SIZE')/2**20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+# high-water resident set size of the process so far, in MB
+def peak_rss_mb():
+
+    if resource is None:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # bytes on macOS, kilobytes on Linux
+    return peak/2**20 if sys.platform == 'darwin' else peak/2**10
+
+
+###############################################################################
+################################### Recorder ##################################
+###############################################################################
+
+
+class Recorder:
+
+    def __init__(self):
+
+        self.steps = []
+        self.stack = []
+        self.started = time.time()
+
+    @contextmanager
+    def step(self, name, rows = None):
+
+        record = {'name': name,
+                  'path': '/'.join([s['name'] for s in self.stack] + [name]),
+                  'depth': len(self.stack),
+                  'rows': rows}
+        self.steps.append(record)
+        self.stack.append(record)
+
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        rss = rss_mb()
+
+        try:
+            yield record
+        finally:
+            record['wall_s'] = round(time.perf_counter() - wall, 4)
+            record['cpu_s'] = round(time.process_time() - cpu, 4)
+            rss_end = rss_mb()
+            peak = peak_rss_mb()
+            record['rss_start_mb'] = None if rss is None else round(rss, 1)
+            record['rss_end_mb'] = None if rss_end is None else round(rss_end, 1)
+            record['peak_rss_mb'] = None if peak is None else round(peak, 1)
+            if record['rows'] is not None and record['wall_s'] > 0:
+                record['rows_per_s'] = round(record['rows']/record['wall_s'], 1)
+            else:
+                record['rows_per_s'] = None
+            self.stack.pop()
+
+    def report(self):
+
+        return {'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+                'python': sys.version.split()[0],
+                'pid': os.getpid(),
+                'peak_rss_mb': None if peak_rss_mb() is None else round(peak_rss_mb(), 1),
+                'steps': self.steps}
+
+    def summary(self):
+
+        lines = []
+        for s in self.steps:
+            if 'wall_s' not in s:
+                continue
+            rate = '' if s['rows_per_s'] is None else '  ' + format(int(s['rows_per_s']), ',') + ' rows/s'
+            peak = '' if s['peak_rss_mb'] is None else '  peak ' + str(int(s['peak_rss_mb'])) + ' MB'
+            lines.append('  '*s['depth'] + s['name'].ljust(40 - 2*s['depth']) +
+                         str(s['wall_s']).rjust(10) + ' s' + rate + peak)
+
+        return '\n'.join(lines)
+
+
+# the active recorder; replaced by start()
+recorder = Recorder()
+
+def start():
+
+    global recorder
+    recorder = Recorder()
+
+    return recorder
+
+def step(name, rows = None):
+    return recorder.step(name, rows)
+
+def write_report(filename = 'run_report.json', profiler = None):
+
+    report = recorder.report()
+    if profiler is not None:
+        report['profile'] = profiler.top(50)
+
+    with open(filename, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    return report
+
+
+###############################################################################
+############################## Sampling Profiler ##############################
+###############################################################################
+
+
+class SamplingProfiler:
+
+    def __init__(self, interval = 0.005, thread_id = None):
+
+        self.interval = interval
+        self.thread_id = threading.main_thread().ident if thread_id is None else thread_id
+        self.samples = Counter()
+        self.running = False
+        self.thread = None
+
+    def sample(self):
+
+        while self.running:
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                stack = traceback.extract_stack(frame)
+                self.samples[';'.join(f.name + ' (' + os.path.basename(f.filename) + ':' + str(f.lineno) + ')'
+                                      for f in stack)] += 1
+            time.sleep(self.interval)
+
+    def start(self):
+
+        self.running = True
+        self.thread = threading.Thread(target=self.sample, daemon=True)
+        self.thread.start()
+
+        return self
+
+    def stop(self):
+
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # most sampled stacks, innermost frame last
+    def top(self, n = 20):
+
+        total = sum(self.samples.values())
+
+        return [{'stack': stack, 'samples': count, 'share': round(count/total, 4)}
+                for stack, count in self.samples.most_common(n)]
+
+    # 'frame;frame;frame count' lines, for flamegraph.pl, speedscope, etc.
+    def write_collapsed(self, filename = 'profile.folded'):
+
+        with open(filename, 'w') as f:
+            for stack, count in self.samples.most_common():
+                f.write(stack + ' ' + str(count) + '\n')
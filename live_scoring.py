@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Live swing decision scoring
+#
+
+# swing_take in seager_mod scores a whole season at once. LiveScorer applies
+# the same evaluation to pitches as they arrive, either one at a time or in
+# small batches: the pitch location is snapped to the heatmap grid
+# arithmetically (instead of searching xlist/zlist), and every value comes
+# from a direct lookup into the league and player heatmaps, so a pitch costs
+# the same no matter how much has been scored. Batters are found by MLBAM ID
+# through the heatmap index, using their map for the season being scored
+# where there is one. As in swing_take, a swing is good when its run value
+# beats the take's by more than bias (and a take the other way round).
+# Running game and season totals per batter are kept in memory. replay()
+# streams a stored season through the scorer in game order and reports the
+# per-call latency, and serves as the load test.
+
+
+import threading
+import time
+import numpy as np
+import pandas as pd
+import seasons
+from heatmap_index import load_index
+from quantized import load_maps
+from seager_mod import swing_types, take_types
+
+
+# the same classification as swing_take
+actions = dict([(d, True) for d in swing_types] + [(d, False) for d in take_types])
+
+# running total columns
+total_cols = ['N_P', 'CLASSIC', 'PLAYER', 'CLASSIC_GOOD', 'PLAYER_GOOD']
+
+
+# nearest heatmap cell, as in swing_take's xlist/zlist search (ties go low)
+def grid_x(x):
+    return np.clip(np.ceil((np.asarray(x) - 1/27)*13.5 + 14.5), 0, 29).astype(int)
+
+def grid_z(z):
+    return np.clip(np.ceil(((np.asarray(z) - 1/27)*12 - 14)*35/32 - 0.5), 0, 34).astype(int)
+
+
+class LiveScorer:
+
+    def __init__(self, league_file = 'league_heatmaps.npy', player_file = 'player_heatmaps.npy', season = None):
+
+        # the league maps are small enough to hold in memory; either file may
+        # be a quantized copy (quantized.py)
+        league = load_maps(league_file)
+        self.league_xrv = np.array(league[0])
+        self.league_swing = np.array(league[1])
+        self.classic_srv = np.array(league[2])
+        self.trv = np.array(league[3])
+
+        self.player_heatmaps = load_maps(player_file)
+        self.index = load_index(player_file)
+        self.season = season
+
+        self.game_totals = {}
+        self.season_totals = {}
+        self.lock = threading.Lock()
+
+    # one pitch; returns None for bunts, pitchouts without location, etc.
+    def score(self, batter, balls, strikes, plate_x, plate_z, description, game_pk = None, bias = 0):
+
+        swing = actions.get(description)
+        if swing is None or plate_x is None or plate_z is None or plate_x != plate_x or plate_z != plate_z:
+            return None
+
+        b = min(int(balls), 3)
+        s = min(int(strikes), 2)
+        ix = int(grid_x(plate_x))
+        iz = int(grid_z(plate_z))
+
+        classic_srv = float(self.classic_srv[b, s, ix, iz])
+        trv = float(self.trv[b, s, ix, iz])
+        classic_xrv = float(self.league_xrv[b, s, ix, iz])
+        league_swing = float(self.league_swing[b, s, ix, iz])
+        player_srv = float(self.player_heatmaps[self.index.row(batter, self.season), b, s, ix, iz])
+        player_xrv = league_swing*player_srv + (1 - league_swing)*trv
+
+        if swing:
+            pitch = {'classic': classic_srv - classic_xrv,
+                     'player': player_srv - player_xrv,
+                     'classic_good': classic_srv > trv + bias,
+                     'player_good': player_srv > trv + bias}
+        else:
+            pitch = {'classic': trv - classic_xrv,
+                     'player': trv - player_xrv,
+                     'classic_good': trv > classic_srv + bias,
+                     'player_good': trv > player_srv + bias}
+
+        pitch['batter'] = int(batter)
+        pitch['swing'] = swing
+        pitch['classic_category'] = ('g' if pitch['classic_good'] else 'b') + ('s' if swing else 't')
+        pitch['player_category'] = ('g' if pitch['player_good'] else 'b') + ('s' if swing else 't')
+
+        self.add(int(batter), game_pk, [1, pitch['classic'], pitch['player'],
+                                        int(pitch['classic_good']), int(pitch['player_good'])])
+
+        return pitch
+
+    # a micro-batch, as a data frame with the same columns as statcast;
+    # pitches to batters without a player heatmap are left out like bunts, so
+    # one unknown batter does not fail the batch
+    def score_batch(self, pitches, bias = 0):
+
+        swing = np.array([actions.get(d) for d in pitches.description])
+        x = pitches.plate_x.to_numpy(dtype=float)
+        z = pitches.plate_z.to_numpy(dtype=float)
+        known = np.array([p in self.index for p in pitches.batter.to_numpy(dtype=int)], dtype=bool)
+        keep = (swing != None) & ~np.isnan(x) & ~np.isnan(z) & known
+        swing = swing[keep].astype(bool)
+
+        batters = pitches.batter.to_numpy(dtype=int)[keep]
+        rows = np.array([self.index.row(p, self.season) for p in batters], dtype=int)
+        b = np.minimum(pitches.balls.to_numpy(dtype=int)[keep], 3)
+        s = np.minimum(pitches.strikes.to_numpy(dtype=int)[keep], 2)
+        ix = grid_x(x[keep])
+        iz = grid_z(z[keep])
+
+        classic_srv = self.classic_srv[b, s, ix, iz]
+        trv = self.trv[b, s, ix, iz]
+        classic_xrv = self.league_xrv[b, s, ix, iz]
+        league_swing = self.league_swing[b, s, ix, iz]
+        player_srv = np.asarray(self.player_heatmaps[rows, b, s, ix, iz])
+        player_xrv = league_swing*player_srv + (1 - league_swing)*trv
+
+        classic_good = np.where(swing, classic_srv > trv + bias, trv > classic_srv + bias)
+        player_good = np.where(swing, player_srv > trv + bias, trv > player_srv + bias)
+
+        scored = pd.DataFrame({
+                              'batter': batters,
+                              'swing': swing,
+                              'classic': np.where(swing, classic_srv, trv) - classic_xrv,
+                              'player': np.where(swing, player_srv, trv) - player_xrv,
+                              'classic_good': classic_good,
+                              'player_good': player_good,
+                              'classic_category': np.where(classic_good, 'g', 'b').astype(object) + np.where(swing, 's', 't'),
+                              'player_category': np.where(player_good, 'g', 'b').astype(object) + np.where(swing, 's', 't')
+                              }, index=pitches.index[keep])
+
+        games = pitches.game_pk.to_numpy()[keep] if 'game_pk' in pitches else [None]*len(batters)
+        for batter, game, c, p, cg, pg in zip(batters.tolist(), games, scored.classic.tolist(),
+                                              scored.player.tolist(), classic_good.tolist(), player_good.tolist()):
+            self.add(batter, game, [1, c, p, int(cg), int(pg)])
+
+        return scored
+
+    def add(self, batter, game_pk, values):
+
+        keys = [(self.season_totals, batter)]
+        if game_pk is not None:
+            keys.append((self.game_totals, (batter, game_pk)))
+
+        with self.lock:
+            for totals, key in keys:
+                current = totals.setdefault(key, [0, 0.0, 0.0, 0, 0])
+                for k in range(len(values)):
+                    current[k] = current[k] + values[k]
+
+    # running totals for one batter, season and (optionally) one game
+    def totals(self, batter, game_pk = None):
+
+        with self.lock:
+            if game_pk is None:
+                current = self.season_totals.get(int(batter), [0, 0.0, 0.0, 0, 0])
+            else:
+                current = self.game_totals.get((int(batter), game_pk), [0, 0.0, 0.0, 0, 0])
+            return dict(zip(total_cols, current))
+
+    def reset(self, season = False):
+
+        with self.lock:
+            self.game_totals.clear()
+            if season:
+                self.season_totals.clear()
+
+
+###############################################################################
+################################ Replay Driver ################################
+###############################################################################
+
+
+# stream a stored season through the scorer in game order, timing each call
+def replay(pitches, scorer = None, batch_size = 1):
+
+    if scorer is None:
+        scorer = LiveScorer()
+
+    order = [c for c in ['game_date', 'game_pk', 'at_bat_number', 'pitch_number'] if c in pitches]
+    pitches = pitches.sort_values(order, kind='stable')
+
+    # only batters with a player heatmap can be scored
+    pitches = pitches[pitches.batter.isin(scorer.index.ids)]
+
+    latency = []
+
+    if batch_size == 1:
+        games = pitches.game_pk if 'game_pk' in pitches else [None]*len(pitches)
+        for batter, b, s, x, z, d, g in zip(pitches.batter, pitches.balls, pitches.strikes,
+                                            pitches.plate_x, pitches.plate_z, pitches.description, games):
+            t = time.perf_counter()
+            scorer.score(batter, b, s, x, z, d, g)
+            latency.append(time.perf_counter() - t)
+    else:
+        for start in range(0, len(pitches), batch_size):
+            batch = pitches.iloc[start:start + batch_size]
+            t = time.perf_counter()
+            scorer.score_batch(batch)
+            latency.append((time.perf_counter() - t)/len(batch))
+
+    latency = np.array(latency)*1e6
+
+    return {'N_P': len(pitches),
+            'BATCH': batch_size,
+            'MEAN_US': round(float(latency.mean()), 1),
+            'P50_US': round(float(np.percentile(latency, 50)), 1),
+            'P99_US': round(float(np.percentile(latency, 99)), 1),
+            'MAX_US': round(float(latency.max()), 1)}
+
+
+if __name__ == '__main__':
+
+    import pybaseball
+    pybaseball.cache.enable()
+
+    pitches = pybaseball.statcast(*seasons.dates(seasons.active[-1]))
+    scorer = LiveScorer(season = seasons.active[-1])
+
+    for batch_size in [1, 16]:
+        scorer.reset(season = True)
+        print(replay(pitches, scorer, batch_size))
@@ -0,0 +1,472 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Cached stage runner for the SEAGER pipeline
+#
+
+# Running seager_mod used to mean get_pitch_data -> get_league_data ->
+# get_player_data -> swing_take from scratch, even after changing a single
+# constant. Here each step is a Stage which declares what it depends on: the
+# stages it reads, its parameters, the source code of the functions it runs
+# and any files it reads from disk. A stage's key is a hash of all of those
+# (with the upstream stages represented by their own keys; the Statcast
+# partitions, which are too large to hash on every run and which ingest.py
+# appends to, by their size and modification time), and its output is
+# pickled under that key, so a run only recomputes the stages whose inputs
+# changed and everything downstream of them. Stages are loaded lazily: if
+# every consumer of a stage is a cache hit, it is never run or read at all.
+# Outputs that other scripts read from disk (heatmap .npy files, leaderboard
+# CSVs) are written again by each stage's publish function on a cache hit, so
+# the files always match the parameters of the last run.
+#
+# Player zone values are computed from grouped counts (shrinkage.py) in their
+# own stage before smoothing. With the default k_swings = 0 and k_contact = 0
+# they are the raw values of get_player_data (equivalence.py checks this);
+# larger k shrinks them toward the league by sample size, which changes every
+# published leaderboard and so has to be asked for. The player stages
+# carry the heatmap index (heatmap_index.py) with their arrays, and with
+# season_maps every batter also gets a map per season, which the season
+# stages use in place of their all-season map. With season_baselines, each
+# season is also scored against its own league maps (season_league.py), built
+# from that season or a rolling window of baseline_window seasons. Each run's
+# parameters are written to pipeline_params.json, so scripts that regenerate
+# part of the output (such as the SWING animations) can match it.
+
+
+import hashlib
+import inspect
+import json
+import multiprocessing
+import os
+import pickle
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import conditioned
+import heatmap_index
+import instrument
+import seager_mod
+import season_league
+import seasons
+import shrinkage
+
+
+# func is called with the outputs of inputs (in order), then params as
+# keywords; files are hashed, stamps (large files) only stat-ed. An uncached
+# stage whose stamped files do not exist yet (the pitch data, before a
+# season's partition is downloaded) is run before its key is taken, so that
+# nothing downstream is keyed on the missing files
+Stage = namedtuple('Stage', ['name', 'func', 'inputs', 'params', 'code', 'files', 'publish', 'cache',
+                             'stamps'],
+                   defaults=[(), {}, (), (), None, True, ()])
+
+
+###############################################################################
+################################### Hashing ###################################
+###############################################################################
+
+
+# content hash of a parameter value or externally supplied data
+def content_hash(obj):
+
+    h = hashlib.sha1()
+
+    if isinstance(obj, pd.DataFrame):
+        h.update(repr(list(obj.columns)).encode())
+        h.update(pd.util.hash_pandas_object(obj, index=False).to_numpy().tobytes())
+    elif isinstance(obj, np.ndarray):
+        h.update(repr((obj.dtype, obj.shape)).encode())
+        h.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, (list, tuple)):
+        for x in obj:
+            h.update(content_hash(x).encode())
+    elif isinstance(obj, dict):
+        for k in sorted(obj):
+            h.update(repr(k).encode())
+            h.update(content_hash(obj[k]).encode())
+    else:
+        h.update(repr(obj).encode())
+
+    return h.hexdigest()
+
+def file_hash(filename):
+
+    with open(filename, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+# size and modification time of a file, or None while it does not exist
+def file_stamp(filename):
+
+    if not os.path.exists(filename):
+        return None
+
+    stat = os.stat(filename)
+
+    return [stat.st_size, stat.st_mtime_ns]
+
+def code_hash(funcs):
+    return content_hash([inspect.getsource(f) for f in funcs])
+
+
+###############################################################################
+################################### Runner ####################################
+###############################################################################
+
+
+class Pipeline:
+
+    def __init__(self, stages, data = None, cache_dir = 'pipeline_cache'):
+
+        self.stages = {stage.name: stage for stage in stages}
+        self.data = {} if data is None else data
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self.keys = {}
+        self.outputs = {}
+        self.summary = []
+
+    # key of a stage (or of externally supplied data)
+    def key(self, name):
+
+        if name not in self.keys:
+            if name in self.data:
+                self.keys[name] = content_hash(self.data[name])
+            else:
+                stage = self.stages[name]
+                if not stage.cache and not all(os.path.exists(f) for f in stage.stamps):
+                    self.output(name)
+                parts = {'name': name,
+                         'inputs': [self.key(x) for x in stage.inputs],
+                         'params': stage.params,
+                         'code': code_hash(stage.code + (stage.func,)),
+                         'files': [file_hash(f) for f in stage.files]}
+                if stage.stamps:
+                    parts['stamps'] = [file_stamp(f) for f in stage.stamps]
+                self.keys[name] = content_hash(parts)
+
+        return self.keys[name]
+
+    def cache_file(self, name):
+        return os.path.join(self.cache_dir, name + '_' + self.key(name)[:16] + '.pkl')
+
+    # output of a stage, from memory, the cache, or by running it
+    def output(self, name):
+
+        if name in self.outputs:
+            return self.outputs[name]
+
+        if name in self.data:
+            return self.data[name]
+
+        stage = self.stages[name]
+        filename = self.cache_file(name) if stage.cache else None
+
+        start = time.perf_counter()
+        if stage.cache and os.path.exists(filename):
+            with instrument.step(name + ' (cached)'):
+                with open(filename, 'rb') as f:
+                    out = pickle.load(f)
+                if stage.publish is not None:
+                    stage.publish(out)
+            status = 'hit'
+        else:
+            args = [self.output(x) for x in stage.inputs]
+            start = time.perf_counter()
+            with instrument.step(name):
+                out = stage.func(*args, **stage.params)
+                if stage.cache:
+                    with open(filename, 'wb') as f:
+                        pickle.dump(out, f, protocol=pickle.HIGHEST_PROTOCOL)
+            status = 'miss' if stage.cache else 'run'
+
+        self.outputs[name] = out
+        self.summary.append({'STAGE': name,
+                             'STATUS': status,
+                             'KEY': self.key(name)[:12],
+                             'SECONDS': round(time.perf_counter() - start, 2)})
+
+        return out
+
+    # stages among names that have to be computed (not supplied, not cached)
+    def misses(self, names):
+
+        return [name for name in names if name in self.stages and name not in self.data and
+                name not in self.outputs and
+                not (self.stages[name].cache and os.path.exists(self.cache_file(name)))]
+
+    # independent stages, each in a forked worker which inherits their inputs
+    def run_parallel(self, names, n_workers):
+
+        global active
+
+        for name in names:
+            for x in self.stages[name].inputs:
+                self.output(x)
+
+        active = self
+        start = time.perf_counter()
+        try:
+            with instrument.step('parallel (' + ', '.join(names) + ')'):
+                with ProcessPoolExecutor(min(n_workers, len(names)),
+                                         mp_context=multiprocessing.get_context('fork')) as executor:
+                    futures = {name: executor.submit(run_forked, name) for name in names}
+                    for name in names:
+                        self.outputs[name] = futures[name].result()
+                        self.summary.append({'STAGE': name,
+                                             'STATUS': 'miss' if self.stages[name].cache else 'run',
+                                             'KEY': self.key(name)[:12],
+                                             'SECONDS': round(time.perf_counter() - start, 2)})
+        finally:
+            active = None
+
+    def run(self, targets = None, n_workers = 1):
+
+        # uncached stages (the pitch data) only run when a stage that reads
+        # them has to be computed
+        if targets is None:
+            targets = [name for name, stage in self.stages.items() if stage.cache]
+
+        # with several workers, run the stages that have to be computed in
+        # waves: every stage whose inputs are ready runs at the same time
+        # (e.g. one process per season), then the stages that read them
+        if n_workers > 1 and 'fork' in multiprocessing.get_all_start_methods():
+            while True:
+                misses = self.misses(targets)
+                ready = [name for name in misses if not set(self.stages[name].inputs) & set(misses)]
+                if len(ready) > 1:
+                    self.run_parallel(ready, n_workers)
+                elif ready:
+                    self.output(ready[0])
+                else:
+                    break
+
+        for name in targets:
+            self.output(name)
+
+        summary = pd.DataFrame(self.summary, columns=['STAGE', 'STATUS', 'KEY', 'SECONDS'])
+        print()
+        print(summary.to_string(index=False))
+        print()
+
+        return summary
+
+
+# the pipeline whose stages forked workers run
+active = None
+
+def run_forked(name):
+
+    stage = active.stages[name]
+    args = [active.output(x) for x in stage.inputs]
+    out = stage.func(*args, **stage.params)
+
+    if stage.cache:
+        with open(active.cache_file(name), 'wb') as f:
+            pickle.dump(out, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    return out
+
+
+###############################################################################
+################################ SEAGER Stages ################################
+###############################################################################
+
+
+def pitch_stage(years):
+    return seager_mod.get_pitch_data(years)
+
+# league heatmaps and the zone maps get_league_data saves beside them
+def league_stage(pitch_data, n_iter, ball_rv, strike_rv):
+
+    league_heatmaps = seager_mod.get_league_data(pitch_data[0], n_iter, ball_rv, strike_rv)
+
+    return league_heatmaps, np.load('league_zonemaps.npy')
+
+# league heatmaps and zone maps for each season, from its own window of
+# seasons
+def season_league_stage(pitch_data, years, window, n_iter, ball_rv, strike_rv):
+
+    heatmaps, zonemaps = season_league.build(pitch_data[0], years, window, n_iter, ball_rv, strike_rv)
+    season_league.save(heatmaps, zonemaps)
+
+    return heatmaps, zonemaps
+
+# player zone values, shrunk toward the league by sample size, and their index
+def player_zone_stage(pitch_data, k_swings, k_contact, strike_rv, years, season_maps):
+    return shrinkage.player_zone_rv(pitch_data[0], k_swings, k_contact, strike_rv, years, season_maps)
+
+# heatmaps, the zone values they were smoothed from and their index
+def player_stage(player_zone_rv, n_iter):
+
+    zone_rv, index = player_zone_rv
+
+    return shrinkage.player_heatmaps(zone_rv, index, n_iter), zone_rv, index
+
+# league heatmaps by handedness and pitch type
+def conditioned_stage(pitch_data, keys, min_pitches, n_iter, ball_rv, strike_rv):
+
+    maps = conditioned.build(pitch_data[0], keys, min_pitches, n_iter, ball_rv, strike_rv)
+    maps.save('conditioned_heatmaps.npz')
+
+    return maps
+
+# batter and pitcher leaderboards and per-pitch decisions for one season
+def season_stage(pitch_data, league_heatmaps, player_heatmaps, year, bias):
+
+    # both league stages give (heatmaps, zonemaps), and season baselines come
+    # as one array per season
+    league_heatmaps = league_heatmaps[0]
+    if isinstance(league_heatmaps, dict):
+        league_heatmaps = league_heatmaps[year]
+
+    classic_st, player_st = seager_mod.swing_take(year, pitch_data[1], league_heatmaps,
+                                                  player_heatmaps[0], bias, player_heatmaps[2])
+    decisions = pd.read_pickle('decisions_' + year + '.pkl')
+    pitcher_st = pd.read_csv('pitcher_st_' + year + '.csv', index_col=0)
+
+    return classic_st, player_st, decisions, pitcher_st
+
+def publish_league(out):
+    np.save('league_heatmaps.npy', np.array(out[0], dtype=float), allow_pickle=True)
+    np.save('league_zonemaps.npy', np.array(out[1], dtype=float), allow_pickle=True)
+
+def publish_season_league(out):
+    season_league.save(out[0], out[1])
+
+def publish_player_zones(out):
+    np.save('player_zone_rv.npy', np.array(out[0], dtype=float), allow_pickle=True)
+    out[1].save(heatmap_index.index_file('player_zone_rv.npy'))
+
+def publish_player(out):
+    np.save('player_heatmaps.npy', np.array(out[0], dtype=float), allow_pickle=True)
+    np.save('player_zone_rv.npy', np.array(out[1], dtype=float), allow_pickle=True)
+    out[2].save(heatmap_index.index_file('player_heatmaps.npy'))
+    out[2].save(heatmap_index.index_file('player_zone_rv.npy'))
+
+def publish_conditioned(maps):
+    maps.save('conditioned_heatmaps.npz')
+
+def publish_season(year):
+
+    def publish(out):
+        classic_st, player_st, decisions, pitcher_st = out
+        classic_st.to_csv('classic_st_' + year + '.csv')
+        player_st.to_csv('player_st_' + year + '.csv')
+        decisions.to_pickle('decisions_' + year + '.pkl')
+        pitcher_st.to_csv('pitcher_st_' + year + '.csv')
+
+    return publish
+
+def seager_stages(n_iter = 10, bias = 0, ball_rv = seager_mod.ball_rv, strike_rv = seager_mod.strike_rv,
+                  years = None, condition_keys = conditioned.default_keys, min_condition_pitches = 50,
+                  k_swings = 0, k_contact = 0, season_maps = False, season_baselines = False,
+                  baseline_window = 1):
+
+    if years is None:
+        years = seasons.active
+    years = [str(year) for year in years]
+
+    solver = (seager_mod.zone_labels, seager_mod.diffusion_frames, seager_mod.make_heatmaps)
+
+    # statcast downloads are already cached by pybaseball, and an ingest into
+    # a partition changes its stamp
+    stages = [Stage('pitch_data', pitch_stage, params={'years': years},
+                    code=(seager_mod.get_pitch_data, seasons.fetch_season), cache=False,
+                    stamps=[seasons.partition_file(y) for y in years]),
+              Stage('league_heatmaps', league_stage, ['pitch_data'],
+                    {'n_iter': n_iter, 'ball_rv': ball_rv, 'strike_rv': strike_rv},
+                    (seager_mod.get_league_data,) + solver, publish=publish_league),
+              Stage('player_zone_rv', player_zone_stage, ['pitch_data'],
+                    {'k_swings': k_swings, 'k_contact': k_contact, 'strike_rv': strike_rv, 'years': years,
+                     'season_maps': season_maps},
+                    (seager_mod.player_list, seager_mod.player_index, heatmap_index.HeatmapIndex, shrinkage.zone_counts, shrinkage.shrink, shrinkage.rate,
+                     shrinkage.shrunk_zone_rv, shrinkage.player_zone_rv),
+                    [seasons.season_file('players', y) for y in years], publish_player_zones),
+              Stage('player_heatmaps', player_stage, ['player_zone_rv'], {'n_iter': n_iter},
+                    (shrinkage.player_heatmaps,) + solver, publish=publish_player),
+              Stage('conditioned_heatmaps', conditioned_stage, ['pitch_data'],
+                    {'keys': tuple(condition_keys), 'min_pitches': min_condition_pitches,
+                     'n_iter': n_iter, 'ball_rv': ball_rv, 'strike_rv': strike_rv},
+                    (conditioned.pitch_combos, conditioned.zone_counts, conditioned.zone_values,
+                     conditioned.build) + solver, publish=publish_conditioned)]
+
+    # each season against its own baseline, or all against the pooled one
+    baseline = 'league_heatmaps'
+    if season_baselines:
+        baseline = 'season_league_heatmaps'
+        stages.append(Stage(baseline, season_league_stage, ['pitch_data'],
+                            {'years': years, 'window': baseline_window, 'n_iter': n_iter,
+                             'ball_rv': ball_rv, 'strike_rv': strike_rv},
+                            (season_league.season_counts, season_league.window_years, season_league.league_maps,
+                             season_league.build, season_league.save,
+                             conditioned.zone_counts, conditioned.zone_values) + solver,
+                            publish=publish_season_league))
+
+    for year in years:
+        stages.append(Stage('season_' + year, season_stage,
+                            ['pitch_data', baseline, 'player_heatmaps'],
+                            {'year': year, 'bias': bias},
+                            (seager_mod.swing_take, seager_mod.pitcher_leaderboard, heatmap_index.HeatmapIndex),
+                            [seasons.season_file('players', year)], publish_season(year)))
+
+    return stages
+
+# parameters of the last run, for scripts that redo part of its work (the
+# SWING animations regenerate the smoothing frames with its n_iter)
+params_file = 'pipeline_params.json'
+
+# seager_stages parameters with their defaults filled in, as far as they can
+# be written to JSON
+def stage_params(**params):
+
+    bound = inspect.signature(seager_stages).bind(**params)
+    bound.apply_defaults()
+
+    return {k: v for k, v in bound.arguments.items() if isinstance(v, (bool, int, float, str, list, tuple, type(None)))}
+
+def run_params(path = '.'):
+
+    filename = os.path.join(path, params_file)
+    if not os.path.exists(filename):
+        return stage_params()
+
+    with open(filename) as f:
+        return dict(stage_params(), **json.load(f))
+
+# run (or reuse) every SEAGER stage; pitch_data may be supplied directly as
+# (all_pitch_data, year_pitch_data) instead of being downloaded. Timings,
+# memory and throughput go to report (JSON), and with profile = True the
+# sampled stacks go to the report and to a .folded file beside it. With
+# n_workers > 1, independent stages (the seasons in particular) run in
+# parallel worker processes
+def run_seager(pitch_data = None, cache_dir = 'pipeline_cache', report = 'run_report.json',
+               profile = False, n_workers = 1, **params):
+
+    data = None if pitch_data is None else {'pitch_data': pitch_data}
+    pipeline = Pipeline(seager_stages(**params), data, cache_dir)
+
+    recorder = instrument.start()
+    profiler = instrument.SamplingProfiler().start() if profile else None
+
+    try:
+        pipeline.run(n_workers=n_workers)
+        with open(params_file, 'w') as f:
+            json.dump(stage_params(**params), f, indent=1)
+    finally:
+        if profiler is not None:
+            profiler.stop()
+            if report is not None:
+                profiler.write_collapsed(os.path.splitext(report)[0] + '.folded')
+        if report is not None:
+            instrument.write_report(report, profiler)
+        print(recorder.summary())
+
+    return pipeline
+
+
+if __name__ == '__main__':
+
+    run_seager()
@@ -11,16 +11,20 @@ Created on Wed Feb 21 18:51:49 2024
 # Johnny Nienstedt 6/21/24
 #
 
-import pandas as pd
-import random
 import time
 import matplotlib.pyplot as plt
 import matplotlib
 from matplotlib.lines import Line2D
 import numpy as np
-import sqlite3
-import os
 import pybaseball
+import player_search
+import seasons
+import shared_heatmaps
+from heatmap_index import load_index
+from pipeline import run_params
+from seager_data import load_data
+from seager_mod import diffusion_frames
+from render_cache import RenderCache, heatmap_key
 
 pybaseball.cache.enable()
 
@@ -31,26 +35,24 @@ pybaseball.cache.enable()
 
 
 # import player lists
-pdat_2021 = pd.read_csv('players_2021.csv')
-pdat_2022 = pd.read_csv('players_2022.csv')
-pdat_2023 = pd.read_csv('players_2023.csv')
-pdat_2024 = pd.read_csv('players_2024.csv')
-
-pdat = pd.concat([pdat_2021, pdat_2022, pdat_2023, pdat_2024], ignore_index=True)
-
-pdat = pd.DataFrame({
-                    'ID': pdat['player_id'], 
-                    'Name': pdat['player_name']
-                    })
-
-pdat = pdat.drop_duplicates()
+data = load_data()
+pdat = data.names
+name_index = data.name_index
 player_name = list(pdat['Name'])
 player_id = list(pdat['ID'])
 
 
-# import league and player data
-league_heatmaps = np.load('league_heatmaps.npy')
-player_heatmaps = np.load('player_heatmaps.npy')
+# import league and player data (shared with every other process on the
+# host when shared_heatmaps.py is running, memory-mapped otherwise)
+league_heatmaps = shared_heatmaps.load('league_heatmaps.npy')
+player_heatmaps = shared_heatmaps.load('player_heatmaps.npy')
+player_zone_rv = shared_heatmaps.load('player_zone_rv.npy')
+
+# player heatmap rows by ID (and season, where there are season maps)
+heatmap_rows = load_index('player_heatmaps.npy')
+
+# finished heatmap images, reused on repeat views
+render_cache = RenderCache()
 
 
 
@@ -66,6 +68,17 @@ def get_Z(z):
     Z = (z*12 - 14)*35/32
     return Z
 
+# show a cached heatmap image
+def show_cached(filename):
+    
+    img = plt.imread(filename)
+    
+    fig = plt.figure(figsize=(img.shape[1]/100, img.shape[0]/100), dpi=100)
+    ax = fig.add_axes([0, 0, 1, 1])
+    ax.imshow(img)
+    ax.set_axis_off()
+    plt.show()
+
 # plot function for league heatmaps
 def plot_league_heatmap(count = '0-0', action = 'DELTA'):
     
@@ -90,6 +103,13 @@ def plot_league_heatmap(count = '0-0', action = 'DELTA'):
     elif action == 'EXPECTED': pvals = league_heatmaps[0][b][s]
     else:
         raise ValueError("Options for 'action' are: SWING, TAKE, DELTA, EXPECTED")
+    
+    # repeat view
+    key = heatmap_key('league', None, count, action, pvals)
+    filename = render_cache.get(key)
+    if filename is not None:
+        show_cached(filename)
+        return
             
     pvals = pvals.transpose()
     
@@ -102,12 +122,8 @@ def plot_league_heatmap(count = '0-0', action = 'DELTA'):
     plt.colorbar(shrink=0.7, extend='both', label='League-wide Run Value', ticks=[0,0.5, 0.1])
     
     # make strike zone outline
-    lw = 1/72
     left, right, bot, top = get_X(-17/24), get_X(17/24), get_Z(1.5), get_Z(3.5)
-    plt.plot(np.linspace(left, right, 100), np.linspace(top,top,100), color = 'black', linewidth = lw*72)
-    plt.plot(np.linspace(left, right, 100), np.linspace(bot,bot,100), color = 'black', linewidth = lw*72)
-    plt.plot(np.linspace(left, left, 100), np.linspace(bot,top,100), color = 'black', linewidth = lw*72)
-    plt.plot(np.linspace(right, right, 100), np.linspace(bot,top,100), color = 'black', linewidth = lw*72)
+    plt.plot([left, right, right, left, left], [bot, bot, top, top, bot], color = 'black', linewidth = 1)
     
     # set ticks and labels
     xlabels = [-1, 0, 1]
@@ -128,16 +144,18 @@ def plot_league_heatmap(count = '0-0', action = 'DELTA'):
     
     # force correct aspect ratio
     ax.set_aspect(1)
+    render_cache.put(key, fig)
     plt.show()
         
 
 # Plot function for player heat map
-def plot_player_heatmap(pid = '608369', count = '0-0', action = 'DELTA'):
+def plot_player_heatmap(pid = '608369', count = '0-0', action = 'DELTA', season = None):
     
-    # determine player index and name
+    # determine player index, name and heatmap row
     pid = int(pid)
-    i = player_id.index(pid)
+    i = name_index.lookup(pid)
     player = player_name[i]
+    heatmap_row = heatmap_rows.row(pid, season)
     player = player.split(', ')[1] + ' ' + player.split(', ')[0]
 
     # image size
@@ -152,10 +170,20 @@ def plot_player_heatmap(pid = '608369', count = '0-0', action = 'DELTA'):
     # get correct map
     if   action == 'SWING': 
         
+        # repeat view shows the finished map without the animation
+        key = heatmap_key('player', pid, count, action, player_heatmaps[heatmap_row][b][s])
+        filename = render_cache.get(key)
+        if filename is not None:
+            show_cached(filename)
+            return
+        
         #
         # dynamic plot
         #
-        pvals = player_heatmaps[i][b][s]
+        
+        # frames of the numerical solution, regenerated from zone values
+        # with the smoothing of the last pipeline run
+        pvals = list(diffusion_frames(player_zone_rv[heatmap_row][b][s], run_params()['n_iter']))
         
         # enable interactive mode
         plt.ion()
@@ -186,7 +214,7 @@ def plot_player_heatmap(pid = '608369', count = '0-0', action = 'DELTA'):
         ax.set_aspect(1)
         
         # loop over maps
-        for j in range(11):
+        for j in range(len(pvals)):
             # Update plot data
             mesh.set_array(pvals[j].transpose().ravel())
             
@@ -213,25 +241,29 @@ def plot_player_heatmap(pid = '608369', count = '0-0', action = 'DELTA'):
                 plt.pause(2)
             
             # make strike zone outline
-            if j == 10:
-                lw = 1/72
+            if j == len(pvals) - 1:
                 left, right, bot, top = get_X(-17/24), get_X(17/24), get_Z(1.5), get_Z(3.5)
-                plt.plot(np.linspace(left, right, 100), np.linspace(top,top,100), color = 'black', linewidth = lw*72)
-                plt.plot(np.linspace(left, right, 100), np.linspace(bot,bot,100), color = 'black', linewidth = lw*72)
-                plt.plot(np.linspace(left, left, 100), np.linspace(bot,top,100), color = 'black', linewidth = lw*72)
-                plt.plot(np.linspace(right, right, 100), np.linspace(bot,top,100), color = 'black', linewidth = lw*72)
+                ax.plot([left, right, right, left, left], [bot, bot, top, top, bot], color = 'black', linewidth = 1)
              
             plt.pause(0.1)
         
+        render_cache.put(key, fig)
 
         plt.ioff()
         plt.show()
         
         return   
     elif action == 'TAKE': pvals = league_heatmaps[3][b][s]
-    elif action == 'DELTA': pvals = player_heatmaps[i][b][s][10] - league_heatmaps[3][b][s]
+    elif action == 'DELTA': pvals = player_heatmaps[heatmap_row][b][s] - league_heatmaps[3][b][s]
     else:
         raise ValueError("Options for 'action' are: SWING, TAKE, DELTA")
+    
+    # repeat view
+    key = heatmap_key('player', pid, count, action, pvals)
+    filename = render_cache.get(key)
+    if filename is not None:
+        show_cached(filename)
+        return
 
     pvals = pvals.transpose()
     
@@ -261,142 +293,34 @@ def plot_player_heatmap(pid = '608369', count = '0-0', action = 'DELTA'):
         plt.title(action.title() + ' Run Value for\n' + player.title() + ' (' + count[0] + '-' + count[2] + ' count)')
     
     #make strike zone outline
-    lw = 1/72
     left, right, bot, top = get_X(-17/24), get_X(17/24), get_Z(1.5), get_Z(3.5)
-    plt.plot(np.linspace(left, right, 100), np.linspace(top,top,100), color = 'black', linewidth = lw*72)
-    plt.plot(np.linspace(left, right, 100), np.linspace(bot,bot,100), color = 'black', linewidth = lw*72)
-    plt.plot(np.linspace(left, left, 100), np.linspace(bot,top,100), color = 'black', linewidth = lw*72)
-    plt.plot(np.linspace(right, right, 100), np.linspace(bot,top,100), color = 'black', linewidth = lw*72)
+    plt.plot([left, right, right, left, left], [bot, bot, top, top, bot], color = 'black', linewidth = 1)
 
     # Force correct aspect ratio
     ax.set_aspect(1)
     
+    render_cache.put(key, fig)
     plt.show()
 
 
 # player selection
 def select_player():
     
-    instr = input("\nEnter an MLB batter, or type R for random:\n").lower()
-    
-    # separate first and last names
-    player_name = list(pdat.Name)
-    player_id = list(pdat.ID)
-    first_list = []
-    last_list = []
-    for i in range(len(player_name)):
-        name = player_name[i]
-        player_name[i] = ' '.join(reversed(name.lower().split(', ')))
-        first_list.append(player_name[i].split()[0])
-        last_list.append(player_name[i].split()[1])
-    
-    if instr in player_name:
-        player = instr
-        i = player_name.index(instr)
-        print()
-        print(player.title() + ' selected.')
-        print()
-        return i, player_id[i], player.title()
-
-    
-    def choose_random():
-        global player
-        i = random.randrange(0, len(player_name) - 1)
-        player = player_name[i]
-        print('\n' + player.title() + ' selected.')
-        return i, player_id[i], player.title()
-        
-    
-    def dym(first, last):
-        instr = input("\nDid you mean " + first.title() + ' ' + last.title() + '? (Y/N)\n')
-        return instr
-
-
-    def try_again():
-        instr = input("\nCouldn't find that player. Please try again:\n").lower()
-        return instr
-
-
-    def yes():
-        global player, i
-        player = player_name[i]
-        print('\n' + player.title() + ' selected.')
-        return i, player_id[i], player.title()
-    
-    def check_matches(last_list, first_list, targets):
-        last_matches = [i for i in range(len(last_list)) if last_list[i] in targets]
-        first_matches = [i for i in range(len(first_list)) if first_list[i] in targets]
-        return last_matches, first_matches
+    player = player_search.select_player(name_index)
     
-    
-    # Handle improper entries
-    def resolve_entry(instr):
-        bad = 0
-        global i
-        
-        while True:
-            
-            # Break for correct input
-            if instr in player_name:
-                player = instr
-                i = player_name.index(player)
-                i, player_id, player = yes()
-                return i, player_id, player
-            
-            # Choose random player
-            if instr == 'r':
-                i, player_id, player = choose_random()
-                return i, player_id, player
-
-            # Handle one-word entries
-            if len(instr.split()) > 1:
-                first = instr.lower().split()[0]
-                last = instr.lower().split()[1]
-            else:
-                first = instr.lower()
-                last = instr.lower()
-            
-            # Make suggestions for partially correct names
-            l, f = check_matches(last_list, first_list, [first, last])
-
-            for n in range(len(l)):
-                instr = dym(first_list[l[n]], last)
-                if instr in ['Y', 'y']:
-                    i = l[n]
-                    i, player_id, player = yes()
-                    return i, player_id, player
-                    
-            for n in range(len(f)):
-                instr = dym(first, last_list[f[n]])
-                if instr in ['Y', 'y']:
-                    i = f[n]
-                    i, player_id, player = yes()
-                    return i, player_id, player
-            
-            # Re-prompt if no match is found
-            instr = try_again()
-            
-            # Allow a maximum of three tries
-            bad = bad + 1
-            if bad > 2:
-                print("\nToo many attempts. Selecting a random player...")
-                time.sleep(1)
-                i, player_id, player = choose_random()
-                return i, player_id, player
-
-    i, player_id, player = resolve_entry(instr)
-    
-    return i, player_id, player
+    return player.row, player.ID, player.name
     
 
 # display random pitch
-def random_pitch(pid = '608369', year = '2024'):
+def random_pitch(pid = '608369', year = None):
     
-    year = str(year)
+    # latest active season by default
+    year = str(seasons.active[-1] if year is None else year)
     
-    i = pdat[pdat['ID'] == int(pid)].index[0]
+    i = name_index.lookup(pid)
     name = pdat.Name[i]
     name = name.split(', ')[1] + ' ' + name.split(', ')[0]
+    heatmap_row = heatmap_rows.row(pid, year)
     
     global xlist, zlist
     xlist, zlist = [], []
@@ -406,14 +330,7 @@ def random_pitch(pid = '608369', year = '2024'):
         zlist.append((Z*32/35 + 14)/12 + 1/27)
     
     # data for pitches to this player
-    if year == '2021':
-        start_dt, end_dt = '2021-04-01', '2021-10-03'
-    if year == '2022':
-        start_dt, end_dt = '2022-04-07', '2022-10-05'
-    if year == '2023':
-        start_dt, end_dt = '2023-03-30', '2023-10-01'
-    if year == '2024':
-        start_dt, end_dt = '2024-03-28', '2024-9-27'
+    start_dt, end_dt = seasons.dates(year)
     
     pitches = pybaseball.statcast_batter(start_dt, end_dt, pid)
     
@@ -465,7 +382,7 @@ def random_pitch(pid = '608369', year = '2024'):
     trv = league_heatmaps[3][b][s][ix][iz]
     
     # player actual run value for swings (trv is the same)
-    player_srv = player_heatmaps[i][b][s][10][ix][iz]
+    player_srv = player_heatmaps[heatmap_row][b][s][ix][iz]
     
     # classic expected run value (using league stats)
     classic_xrv = league_heatmaps[0][b][s][ix][iz]
@@ -670,9 +587,10 @@ def pitch_by_pitch(pid, year):
     
     year = str(year)
     
-    i = pdat[pdat['ID'] == int(pid)].index[0]
+    i = name_index.lookup(pid)
     name = pdat.Name[i]
     name = name.split(', ')[1] + ' ' + name.split(', ')[0]
+    heatmap_row = heatmap_rows.row(pid, year)
     
     xlist, zlist = [], []
     for X in range(-15, 15):
@@ -681,14 +599,7 @@ def pitch_by_pitch(pid, year):
         zlist.append((Z*32/35 + 14)/12 + 1/27)
     
     # data for pitches to this player
-    if year == '2021':
-        start_dt, end_dt = '2021-04-01', '2021-10-03'
-    if year == '2022':
-        start_dt, end_dt = '2022-04-07', '2022-10-05'
-    if year == '2023':
-        start_dt, end_dt = '2023-03-30', '2023-10-01'
-    if year == '2024':
-        start_dt, end_dt = '2024-03-28', '2024-9-27'
+    start_dt, end_dt = seasons.dates(year)
     
     pitches = pybaseball.statcast_batter(start_dt, end_dt, pid)
     
@@ -738,7 +649,7 @@ def pitch_by_pitch(pid, year):
         trv = league_heatmaps[3][b][s][ix][iz]
         
         # player actual run value for swings (trv is the same)
-        player_srv = player_heatmaps[i][b][s][10][ix][iz]
+        player_srv = player_heatmaps[heatmap_row][b][s][ix][iz]
         
         
         #
@@ -827,89 +738,11 @@ def pitch_by_pitch(pid, year):
 # display stats
 def display(pid):
     
-    i = player_id.index(int(pid))
+    i = name_index.lookup(pid)
     player = player_name[i]
     
-    # Define the database file name
-    c_filename = 'classic_stats.db'
-    p_filename = 'player_stats.db'
-    
-    # Remove the existing database file if it exists
-    if os.path.exists(c_filename):
-        os.remove(c_filename)
-        os.remove(p_filename)
-    
-    # Create a SQLite database connection
-    c_conn = sqlite3.connect(c_filename)
-    p_conn = sqlite3.connect(p_filename)
-    
-    # Load data
-    classic_2021 = pd.read_csv('classic_st_2021.csv')
-    classic_2022 = pd.read_csv('classic_st_2022.csv')
-    classic_2023 = pd.read_csv('classic_st_2023.csv')
-    classic_2024 = pd.read_csv('classic_st_2024.csv')
-    player_2021 = pd.read_csv('player_st_2021.csv')
-    player_2022 = pd.read_csv('player_st_2022.csv')
-    player_2023 = pd.read_csv('player_st_2023.csv')
-    player_2024 = pd.read_csv('player_st_2024.csv')
-    
-    # Add a 'Year' column to each DataFrame
-    classic_2021['Year'] = 2021
-    classic_2022['Year'] = 2022
-    classic_2023['Year'] = 2023
-    classic_2024['Year'] = 2024
-    player_2021['Year'] = 2021
-    player_2022['Year'] = 2022
-    player_2023['Year'] = 2023
-    player_2024['Year'] = 2024
-    
-    # Write the DataFrames to the SQLite database
-    classic_2021.to_sql('c_stats', c_conn, if_exists='append', index=False)
-    classic_2022.to_sql('c_stats', c_conn, if_exists='append', index=False)
-    classic_2023.to_sql('c_stats', c_conn, if_exists='append', index=False)
-    classic_2024.to_sql('c_stats', c_conn, if_exists='append', index=False)
-    player_2021.to_sql('p_stats', p_conn, if_exists='append', index=False)
-    player_2022.to_sql('p_stats', p_conn, if_exists='append', index=False)
-    player_2023.to_sql('p_stats', p_conn, if_exists='append', index=False)
-    player_2024.to_sql('p_stats', p_conn, if_exists='append', index=False)
-    
-    # Function to query the classic statistics
-    def query_classic_stats(player_id):
-        query = """
-        SELECT Year, SEAGER_Percentile, Selective_Percentile, Agression_Percentile, SWTR_Percentile
-        FROM c_stats
-        WHERE ID = ?
-        GROUP BY Name, Year
-        ORDER BY Year
-        """
-        cursor = c_conn.execute(query, (player_id,))
-        columns = [column[0] for column in cursor.description]
-        results = cursor.fetchall()
-        df = pd.DataFrame(results, columns=columns)
-        return df
-    
-    # Function to query the player statistics
-    def query_player_stats(player_id):
-        query = """
-        SELECT Year, SEAGER_Percentile, Selective_Percentile, Agression_Percentile, SWTR_Percentile
-        FROM p_stats
-        WHERE ID = ?
-        GROUP BY Name, Year
-        ORDER BY Year
-        """
-        cursor = p_conn.execute(query, (player_id,))
-        columns = [column[0] for column in cursor.description]
-        results = cursor.fetchall()
-        df = pd.DataFrame(results, columns=columns)
-        return df
-    
-    # Query the database for a specific player
-    classic_stats = query_classic_stats(pid)
-    player_stats = query_player_stats(pid)
-    
-    # Rename columns
-    classic_stats.columns = [x.split('_')[0] if '_' in x else x for x in classic_stats.columns]
-    player_stats.columns = [x.split('_')[0] if '_' in x else x for x in player_stats.columns]
+    # percentiles for every season on disk
+    classic_stats, player_stats = data.percentiles(pid)
     
     print('\n__________________________________________________________')
     print('\nClassic swing decision percentiles for ' + player.title() + ':\n')
@@ -1072,6 +905,7 @@ def options():
 # display(pid)
 # time.sleep(2)
 
-options()
+if __name__ == '__main__':
+    options()
 
 
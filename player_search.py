@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Player name search
+#
+
+# Prebuilt index over the player list for name and MLBAM ID lookups. Names are
+# normalized (lowercase, accents and punctuation stripped, 'Last, First' turned
+# into 'first last') and indexed by whole token and by character trigram. A
+# fuzzy search only scores the few names sharing the most trigrams with the
+# query, by edit similarity, so typos, partial names and one-word entries all
+# return ranked candidates without scanning the whole list. NameIndex never
+# prompts for input, so the same lookups serve scripts; select_player below is
+# the interactive front end.
+
+
+import random
+import re
+import unicodedata
+from collections import namedtuple
+from difflib import SequenceMatcher
+
+
+Match = namedtuple('Match', ['row', 'ID', 'name', 'score'])
+
+suffixes = {'jr', 'sr', 'ii', 'iii', 'iv'}
+
+
+# 'Acuña Jr., Ronald' -> 'ronald acuna'
+def normalize(name):
+
+    name = unicodedata.normalize('NFKD', name)
+    name = ''.join(c for c in name if not unicodedata.combining(c)).lower()
+
+    # statcast lists names as 'Last, First'
+    if ', ' in name:
+        last, first = name.split(', ', 1)
+        name = first + ' ' + last
+
+    tokens = re.sub(r"[^a-z ]", ' ', name.replace("'", '').replace('.', '')).split()
+
+    return ' '.join(t for t in tokens if t not in suffixes)
+
+def trigrams(text):
+
+    text = ' ' + text + ' '
+
+    return {text[k:k + 3] for k in range(len(text) - 2)}
+
+
+class NameIndex:
+
+    def __init__(self, names):
+
+        # names is a data frame with 'ID' and 'Name' ('Last, First') columns
+        self.ids = [int(x) for x in names['ID']]
+        self.names = [' '.join(reversed(n.split(', '))) for n in names['Name']]
+        self.keys = [normalize(n) for n in names['Name']]
+
+        self.by_id = {}
+        self.by_key = {}
+        self.by_token = {}
+        self.by_trigram = {}
+
+        for row, (pid, key) in enumerate(zip(self.ids, self.keys)):
+
+            # first row wins if an ID appears under two spellings
+            self.by_id.setdefault(pid, row)
+            self.by_key.setdefault(key, []).append(row)
+
+            for token in key.split():
+                self.by_token.setdefault(token, set()).add(row)
+            for gram in trigrams(key):
+                self.by_trigram.setdefault(gram, []).append(row)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def match(self, row, score = 1.0):
+        return Match(row, self.ids[row], self.names[row], score)
+
+    # row of a player by MLBAM ID
+    def lookup(self, pid):
+        return self.by_id[int(pid)]
+
+    # ranked matches for a (possibly misspelled or partial) name
+    def search(self, query, k = 5, min_score = 0.6):
+
+        key = normalize(query)
+        if not key:
+            return []
+
+        # exact full name
+        if key in self.by_key:
+            return [self.match(row) for row in self.by_key[key]][:k]
+
+        # every entered token is a whole first or last name ('seager')
+        tokens = key.split()
+        rows = set.intersection(*[self.by_token.get(t, set()) for t in tokens])
+        if rows:
+            return [self.match(row, 0.95) for row in sorted(rows)][:k]
+
+        # candidates sharing the most trigrams with the query
+        shared = {}
+        for gram in trigrams(key):
+            for row in self.by_trigram.get(gram, ()):
+                shared[row] = shared.get(row, 0) + 1
+
+        candidates = sorted(shared, key=shared.get, reverse=True)[:max(10, 2*k)]
+
+        # edit similarity against the full name, or token by token so that
+        # one-word and partial entries ('semein', 'vlad guerrero') still match;
+        # only an exact full name scores 1
+        full = SequenceMatcher(None, '', key)
+        by_token = [SequenceMatcher(None, '', t) for t in tokens]
+
+        scores = []
+        for row in candidates:
+            full.set_seq1(self.keys[row])
+            score = full.ratio()
+
+            token_score = 0
+            for matcher in by_token:
+                best = 0
+                for token in self.keys[row].split():
+                    matcher.set_seq1(token)
+                    best = max(best, matcher.ratio())
+                token_score = token_score + best/len(by_token)
+
+            score = max(score, 0.95*token_score)
+            if score >= min_score:
+                scores.append((score, row))
+
+        scores.sort(reverse=True)
+
+        return [self.match(row, round(score, 3)) for score, row in scores[:k]]
+
+
+# interactive player selection, returns a Match
+def select_player(index, tries = 3):
+
+    instr = input("\nEnter an MLB batter, or type R for random:\n")
+    bad = 0
+
+    while instr.lower() != 'r':
+
+        matches = index.search(instr)
+
+        # exact match
+        if matches and matches[0].score == 1:
+            print('\n' + matches[0].name + ' selected.')
+            return matches[0]
+
+        # suggestions for partially correct names
+        if matches:
+            print('\nDid you mean:')
+            for n, m in enumerate(matches):
+                print('  ' + str(n + 1) + '. ' + m.name)
+            instr = input('\nEnter a number, or try another name:\n')
+
+            if instr.isdigit() and 1 <= int(instr) <= len(matches):
+                m = matches[int(instr) - 1]
+                print('\n' + m.name + ' selected.')
+                return m
+        else:
+            instr = input("\nCouldn't find that player. Please try again:\n")
+
+        # allow a limited number of tries
+        bad = bad + 1
+        if bad >= tries:
+            print("\nToo many attempts. Selecting a random player...")
+            break
+
+    m = index.match(random.randrange(len(index)))
+    print('\n' + m.name + ' selected.')
+
+    return m
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Reduced-precision heatmap storage
+#
+
+# Heatmap values are run values of a few tenths at most, but the arrays are
+# saved as float64. QuantizedMaps stores them at 2 bytes a value instead.
+# Every 30 x 35 map gets its own offset (the middle of its range) and scale
+# (half its range), and the values go into int16 (steps of scale/32767) or
+# float16 (about 3 significant digits) relative to those. The reconstruction
+# error is bounded per map and reported when a file is written. Lookups with a
+# full index (as the live scorer and the sweep scorer make) decode only the
+# cells they touch, so scoring reads a quarter of the bytes. Any other index
+# returns the decoded float64 values.
+#
+# verify() scores the same pitches with full-precision and quantized maps and
+# compares the SEAGER/SWTR leaderboards. Running this script writes
+# <name>_<mode>.npz next to league_heatmaps.npy and player_heatmaps.npy.
+#
+# Undefined parts of league_heatmaps (kind 4 outside [4][0][0]) are whatever
+# np.empty left there. They are stored as zeros and left out of the error,
+# and so are any non-finite values in the other maps.
+
+
+import os
+import numpy as np
+import pandas as pd
+import shared_heatmaps
+from heatmap_index import HeatmapIndex, index_file
+
+
+modes = {'int16': 32767, 'float16': 1}
+
+default_files = ('league_heatmaps.npy', 'player_heatmaps.npy')
+
+# maps holding real values, where not all of them do (as in equivalence.py)
+defined_maps = {'league_heatmaps.npy': [np.s_[0:4], np.s_[4, 0, 0]]}
+
+# largest allowed change in a rounded leaderboard column (0.1 steps) when
+# scored from quantized maps
+default_tolerance = 0.1
+
+
+class QuantizedMaps:
+
+    def __init__(self, q, scale, offset, mode):
+
+        # codes [..., x, z], and per-map scale and offset [..., 1, 1]
+        self.q = q
+        self.scale = scale
+        self.offset = offset
+        self.mode = mode
+
+    @property
+    def shape(self):
+        return self.q.shape
+
+    @property
+    def ndim(self):
+        return self.q.ndim
+
+    def __len__(self):
+        return len(self.q)
+
+    @property
+    def nbytes(self):
+        return self.q.nbytes + self.scale.nbytes + self.offset.nbytes
+
+    # decoded values; the scale and offset are indexed like the codes, with
+    # the grid axes pointing at their single entry
+    def __getitem__(self, index):
+
+        if not isinstance(index, tuple):
+            index = (index,)
+        index = index + (slice(None),)*(self.ndim - len(index))
+
+        at_map = []
+        for i in index[-2:]:
+            if isinstance(i, slice):
+                at_map.append(slice(None))
+            else:
+                at_map.append(np.zeros_like(i))
+        at_map = index[:-2] + tuple(at_map)
+
+        return self.q[index].astype(float)*self.scale[at_map]/modes[self.mode] + self.offset[at_map]
+
+    def dequantize(self):
+        return self[()]
+
+    def save(self, filename):
+        np.savez(filename, q=self.q, scale=self.scale, offset=self.offset, mode=self.mode)
+
+    @classmethod
+    def load(cls, filename):
+
+        f = np.load(filename)
+
+        return cls(f['q'], f['scale'], f['offset'], str(f['mode']))
+
+
+###############################################################################
+################################# Quantization ################################
+###############################################################################
+
+
+# which maps of an array of shape [..., x, z] to keep, from a list of slices
+def defined_mask(shape, slices = None):
+
+    if slices is None:
+        return np.ones(shape[:-2], dtype=bool)
+
+    mask = np.zeros(shape[:-2], dtype=bool)
+    for s in slices:
+        mask[s] = True
+
+    return mask
+
+def kept_values(x, slices = None):
+    return np.isfinite(x) & defined_mask(x.shape, slices)[..., None, None]
+
+def quantize(x, mode = 'int16', slices = None):
+
+    if mode not in modes:
+        raise ValueError("Options for 'mode' are: " + ', '.join(modes))
+
+    x = np.asarray(x, dtype=float)
+    finite = kept_values(x, slices)
+
+    # per-map range of the finite values
+    with np.errstate(invalid='ignore'):
+        lo = np.where(finite, x, np.inf).min(axis=(-2, -1), keepdims=True)
+        hi = np.where(finite, x, -np.inf).max(axis=(-2, -1), keepdims=True)
+    empty = ~np.isfinite(lo)
+    lo, hi = np.where(empty, 0, lo), np.where(empty, 0, hi)
+
+    offset = (lo + hi)/2
+    scale = (hi - lo)/2
+    scale = np.where(scale > 0, scale, 1)
+
+    with np.errstate(invalid='ignore', over='ignore'):
+        unit = np.where(finite, (x - offset)/scale, 0)
+    if mode == 'int16':
+        q = np.round(unit*modes[mode]).astype(np.int16)
+    else:
+        q = unit.astype(np.float16)
+
+    return QuantizedMaps(q, scale, offset, mode)
+
+# largest reconstruction error over the finite values, and the bound for
+# the mode (half a step for int16, half an ulp at |unit| = 1 for float16)
+def error(x, maps, slices = None):
+
+    x = np.asarray(x, dtype=float)
+    finite = kept_values(x, slices)
+    err = np.abs(np.where(finite, maps.dequantize() - np.where(finite, x, 0), 0))
+
+    step = 1/modes[maps.mode] if maps.mode == 'int16' else 2.0**-10
+    bound = float((np.where(finite.any(axis=(-2, -1), keepdims=True), maps.scale, 0)*step/2).max())
+
+    return {'MODE': maps.mode, 'MAX_ERROR': float(err.max()), 'BOUND': bound,
+            'MB': round(x.nbytes/2**20, 2), 'QUANTIZED_MB': round(maps.nbytes/2**20, 2)}
+
+def quantized_file(filename, mode = 'int16'):
+    return os.path.splitext(filename)[0] + '_' + mode + '.npz'
+
+# write quantized copies of the heatmap files, reporting their errors
+def save_artifacts(mode = 'int16', path = '.', files = default_files):
+
+    report = []
+    for name in files:
+        filename = os.path.join(path, name)
+        x = np.load(filename, mmap_mode='r')
+        maps = quantize(x, mode, defined_maps.get(name))
+        maps.save(quantized_file(filename, mode))
+        if os.path.exists(index_file(filename)):
+            HeatmapIndex.load(index_file(filename)).save(index_file(quantized_file(filename, mode)))
+        report.append(dict({'FILE': name}, **error(x, maps, defined_maps.get(name))))
+
+    return report
+
+# heatmaps from either kind of file
+def load_maps(filename):
+
+    if filename.endswith('.npz'):
+        return QuantizedMaps.load(filename)
+
+    return shared_heatmaps.load(filename)
+
+
+###############################################################################
+################################# Verification ################################
+###############################################################################
+
+
+# leaderboard columns from full-precision and quantized maps: the largest
+# change in each, and how many batter-seasons moved at all
+def verify(pitch_data = None, years = None, storage = ('int16', 'float16'), bias = 0,
+           tolerance = default_tolerance, prepared = None, **map_params):
+
+    import sweep
+
+    if prepared is None:
+        prepared = sweep.prepare(pitch_data, years)
+
+    params = dict({k: v[0] for k, v in sweep.default_grid.items() if k != 'bias'}, **map_params)
+    league_heatmaps, player_heatmaps = sweep.sweep_maps(prepared, **params)
+    full = sweep.score(prepared, league_heatmaps, player_heatmaps, bias)
+
+    # the sweep's league maps have a season axis in front
+    league_slices = [np.s_[:, 0:4], np.s_[:, 4, 0, 0]]
+
+    rows = []
+    for mode in storage:
+        league_q = quantize(league_heatmaps, mode, league_slices)
+        player_q = quantize(player_heatmaps, mode)
+        board = sweep.score(prepared, league_q, player_q, bias)
+
+        row = {'MODE': mode,
+               'LEAGUE_ERROR': error(league_heatmaps, league_q, league_slices)['MAX_ERROR'],
+               'PLAYER_ERROR': error(player_heatmaps, player_q)['MAX_ERROR']}
+        for col in full.columns.drop('N_P'):
+            diff = (board[col] - full[col]).abs()
+            diff = diff[np.isfinite(full[col])]
+            row[col] = float(diff.max())
+            row[col + '_CHANGED'] = int((diff > 0).sum())
+        row['PASS'] = all(row[col] <= tolerance + 1e-9 for col in full.columns.drop('N_P'))
+        rows.append(row)
+
+    return pd.DataFrame(rows)
+
+
+if __name__ == '__main__':
+
+    for mode in modes:
+        for row in save_artifacts(mode):
+            print(row)
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Deliberate corrections to the frozen SEAGER reference
+#
+
+# seager_reference.py is never edited, so that the numbers equivalence.py
+# checks against cannot move by accident. When seager_mod's results are
+# changed on purpose, the same correction is applied here instead, as a
+# wrapper around the frozen functions, and equivalence.py checks candidates
+# against this module. Each correction names the request that made it:
+#
+#   - user-045: swing_take looks up each batter's player heatmap by MLBAM ID
+#     (first row of that ID in the get_player_data player list) rather than
+#     by their position in the season's player list. The frozen swing_take
+#     reads row i for the i-th listed batter, so it is given the heatmaps
+#     reordered to the season's list.
+
+
+import numpy as np
+import pandas as pd
+import seager_reference
+from seager_reference import get_league_data, get_player_data
+
+
+years = ['2021', '2022', '2023', '2024']
+
+
+# player heatmap row of every ID, in get_player_data order (first row wins)
+def heatmap_rows():
+
+    heatmap_id = pd.concat([pd.read_csv('players_' + y + '.csv') for y in years],
+                           ignore_index=True)[['player_id', 'player_name']].drop_duplicates().player_id
+
+    rows = {}
+    for row, pid in enumerate(heatmap_id):
+        rows.setdefault(pid, row)
+
+    return rows
+
+def swing_take(year, year_pitch_data, league_heatmaps, player_heatmaps, bias = 0):
+
+    rows = heatmap_rows()
+    listed = pd.read_csv('players_' + year + '.csv').player_id
+    season_heatmaps = np.asarray(player_heatmaps)[[rows[pid] for pid in listed]]
+
+    return seager_reference.swing_take(year, year_pitch_data, league_heatmaps, season_heatmaps, bias)
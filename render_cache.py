@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# On-disk cache of rendered heatmaps
+#
+
+# plot_league_heatmap and plot_player_heatmap redraw the whole figure every
+# time, even for a map that was just viewed. RenderCache keeps the finished
+# PNGs in a directory, keyed by map kind, batter, count, action and a hash of
+# the heatmap values being drawn, so a repeat view is a single image read.
+# Rebuilding league_heatmaps.npy or player_heatmaps.npy changes the values and
+# therefore the key, so stale images are never shown; they simply age out. The
+# least recently viewed images are deleted once the cache holds max_items.
+
+
+import hashlib
+import os
+from collections import OrderedDict
+import numpy as np
+
+
+# bump whenever the figure layout changes, so old images are not reused
+render_version = 1
+
+
+def heatmap_key(kind, pid, count, action, pvals):
+
+    h = hashlib.sha1(repr((render_version, kind, pid, count, action)).encode())
+    h.update(np.ascontiguousarray(pvals, dtype='float64').tobytes())
+
+    return h.hexdigest()
+
+
+class RenderCache:
+
+    def __init__(self, path = 'render_cache', max_items = 2000):
+
+        self.path = path
+        self.max_items = max_items
+        os.makedirs(path, exist_ok=True)
+
+        # file modification times record the last view, oldest first
+        files = [f for f in os.listdir(path) if f.endswith('.png')]
+        files.sort(key=lambda f: os.stat(os.path.join(path, f)).st_mtime_ns)
+        self.entries = OrderedDict((f[:-4], None) for f in files)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def file(self, key):
+        return os.path.join(self.path, key + '.png')
+
+    # path of a cached image, or None
+    def get(self, key):
+
+        if key not in self.entries:
+            return None
+
+        filename = self.file(key)
+        if not os.path.exists(filename):
+            del self.entries[key]
+            return None
+
+        self.entries.move_to_end(key)
+        os.utime(filename)
+
+        return filename
+
+    # save a finished figure under key and evict the oldest images
+    def put(self, key, fig):
+
+        filename = self.file(key)
+        fig.savefig(filename)
+
+        return self.add(key)
+
+    # register an image already written to self.file(key)
+    def add(self, key):
+
+        filename = self.file(key)
+
+        self.entries[key] = None
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.max_items:
+            old, _ = self.entries.popitem(last=False)
+            if os.path.exists(self.file(old)):
+                os.remove(self.file(old))
+
+        return filename
+
+    def clear(self):
+
+        for key in list(self.entries):
+            if os.path.exists(self.file(key)):
+                os.remove(self.file(key))
+
+        self.entries.clear()
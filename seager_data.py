@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Shared data layer for SEAGER leaderboards and player lists
+#
+
+# Every analysis script used to read the same twelve CSVs (four seasons of
+# classic_st, player_st and players files) on its own, often more than once.
+# load_data() parses each source once, in parallel and with explicit dtypes,
+# merges them, and pickles the result to a snapshot which is reused until any
+# source file changes.
+
+
+import os
+import pickle
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import seasons
+from player_search import NameIndex
+
+
+# explicit column types; every other column is a float
+st_dtypes = defaultdict(lambda: 'float64', {
+                        'NAME': 'str',
+                        'ID': 'int64',
+                        'N_SWINGS': 'int64',
+                        'N_TAKES': 'int64',
+                        'N_P': 'int64',
+                        'SEAGER_Percentile': 'int64',
+                        'Selective_Percentile': 'int64',
+                        'Agression_Percentile': 'int64',
+                        'SWTR_Percentile': 'int64'
+                        })
+
+players_dtypes = defaultdict(lambda: 'float64', {
+                             'player_id': 'int64',
+                             'player_name': 'str',
+                             'pitches': 'int64',
+                             'total_pitches': 'int64'
+                             })
+
+# bump whenever SeagerData changes, so old snapshots are rebuilt
+snapshot_version = 2
+
+percentile_cols = ['SEAGER_Percentile', 'Selective_Percentile',
+                   'Agression_Percentile', 'SWTR_Percentile']
+
+
+class SeagerData:
+
+    def __init__(self, classic, player, players, min_pitches = 1000):
+
+        # all seasons stacked, with a 'Year' column
+        self.classic = classic
+        self.player = player
+        self.players = players
+
+        # one row per player (ID, Name), in first-seen order
+        self.names = pd.DataFrame({
+                                  'ID': players['player_id'],
+                                  'Name': players['player_name']
+                                  }).drop_duplicates(ignore_index=True)
+        self.name_index = NameIndex(self.names)
+
+        # classic (_x) and player (_y) stats side by side
+        full_stats = pd.merge(classic, player, how='left',
+                              on=['NAME', 'ID', 'Year', 'N_SWINGS', 'N_TAKES', 'N_P'])
+        full_stats = full_stats[full_stats.N_P >= min_pitches]
+        self.full_stats = full_stats.sort_values(['ID', 'Year'], ignore_index = True)
+
+        # plus outcome stats from the player lists
+        pstats = players.rename(columns={'player_id':'ID'})
+        self.fuller_stats = pd.merge(self.full_stats, pstats, on=['ID', 'Year'])
+
+    # swing decision percentiles for one player, by season
+    def percentiles(self, pid):
+
+        def query(st):
+            df = st[st.ID == int(pid)].drop_duplicates(['NAME', 'Year'])
+            df = df.sort_values('Year')[['Year'] + percentile_cols]
+            df.columns = [x.split('_')[0] for x in df.columns]
+            return df.reset_index(drop=True)
+
+        return query(self.classic), query(self.player)
+
+
+# source files for every active season in the registry
+def source_files(path = '.'):
+
+    return {kind: [seasons.season_file(kind, year, path=path) for year in seasons.active]
+            for kind in ['classic_st', 'player_st', 'players']}
+
+def read_source(filename):
+
+    year = int(filename.split('_')[-1][:4])
+
+    if os.path.basename(filename).startswith('players_'):
+        df = pd.read_csv(filename, dtype=players_dtypes)
+    else:
+        df = pd.read_csv(filename, dtype=st_dtypes, index_col=0)
+
+    df['Year'] = year
+
+    return df
+
+# loaded datasets, keyed by snapshot file
+loaded = {}
+
+def load_data(path = '.', snapshot = 'seager_data.pkl', min_pitches = 1000):
+
+    files = source_files(path)
+    all_files = [f for kind in files for f in files[kind]]
+    snapshot = os.path.join(path, snapshot)
+
+    # snapshot is valid as long as no source has been modified
+    signature = [(f, os.stat(f).st_mtime_ns, os.stat(f).st_size) for f in all_files]
+    signature.append((snapshot_version, min_pitches))
+
+    if snapshot in loaded and loaded[snapshot][0] == signature:
+        return loaded[snapshot][1]
+
+    if os.path.exists(snapshot):
+        with open(snapshot, 'rb') as f:
+            cached_signature, data = pickle.load(f)
+        if cached_signature == signature:
+            loaded[snapshot] = (signature, data)
+            return data
+
+    # parse every source file once, in parallel
+    with ThreadPoolExecutor(len(all_files)) as executor:
+        frames = dict(zip(all_files, executor.map(read_source, all_files)))
+
+    def stack(kind):
+        return pd.concat([frames[f] for f in files[kind]], ignore_index=True)
+
+    data = SeagerData(stack('classic_st'), stack('player_st'), stack('players'), min_pitches)
+
+    with open(snapshot, 'wb') as f:
+        pickle.dump((signature, data), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    loaded[snapshot] = (signature, data)
+
+    return data
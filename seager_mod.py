@@ -29,28 +29,155 @@ import numpy as np
 from scipy import stats
 from tqdm import tqdm
 import pybaseball
+from concurrent.futures import ThreadPoolExecutor
+import seasons
+from heatmap_index import HeatmapIndex, index_file
+from instrument import step
 
 # enable caching
 pybaseball.cache.enable()
 
-# scrape all pitch data
-def get_pitch_data():
+
+###############################################################################
+################################## Constants ##################################
+###############################################################################
+
+# RE24 values of a ball and a strike, indexed [balls][strikes]
+ball_rv = np.array([[0.032, 0.024, 0.021],
+                    [0.088, 0.048, 0.038],
+                    [0.143, 0.064, 0.085],
+                    [0.051, 0.168, 0.234]])
+
+strike_rv = np.array([[-0.037, -0.051, -0.150],
+                      [-0.035, -0.054, -0.171],
+                      [-0.062, -0.069, -0.209],
+                      [-0.117, -0.066, -0.294]])
+
+swing_types = ['hit_into_play', 'foul', 'swinging_strike', 'foul_tip', 
+               'swinging_strike_blocked', 'swinging_pitchout',
+               'foul_pitchout']
+take_types = ['ball', 'called_strike', 'blocked_ball', 'hit_by_pitch', 
+              'pitchout']
+bunt_types = ['missed_bunt', 'foul_bunt', 'foul_tip_bunt']
+
+
+
+###############################################################################
+############################### Heatmap Solver ################################
+###############################################################################
+
+# strike zone dimensions
+zone_width = 30
+zone_height = 35
+
+# zone boundaries
+x0, y0 = 0, 0
+x1, y1 = 5, 6
+x15, y15 = 9, 10
+x2, y2 = 12, 14
+x25, y25 = 15, 18
+x3, y3 = 18, 22
+x35, y35 = 21, 26
+x4, y4 = 25, 30
+x5, y5 = 30, 35
+
+# index (0-12) into the 13 MLBAM zone values for each grid cell: where the
+# initial conditions are set, and which cells are reset after every iteration
+def zone_labels():
+    
+    init = np.full([zone_width, zone_height], -1)
+    reset = np.full([zone_width, zone_height], -1)
+    
+    # Set the initial conditions by zone
+    init[x1:x2, y3:y4] = 0
+    init[x2:x3, y3:y4] = 1
+    init[x3:x4, y3:y4] = 2
+    init[x1:x2, y2:y3] = 3
+    init[x2:x3, y2:y3] = 4
+    init[x3:x4, y2:y3] = 5
+    init[x1:x2, y1:y2] = 6
+    init[x2:x3, y1:y2] = 7
+    init[x3:x4, y1:y2] = 8
+    init[x0:x1, y25:y5] = 9
+    init[x1:x25, y4:y5] = 9
+    init[x25:x5, y4:y5] = 10
+    init[x4:x5, y25:y5] = 10
+    init[x0:x1, y0:y25] = 11
+    init[x1:x25, y0:y1] = 11
+    init[x25:x5, y0:y1] = 12
+    init[x4:x5, y0:y25] = 12
+    
+    # reset boundary conditions
+    reset[x0,y4:y5] = 9
+    reset[x0:x1,y5-1] = 9
+    
+    reset[x4:x5,y5-1] = 10
+    reset[x5-1,y4:y5] = 10
+    
+    reset[x0:x1,y0] = 11
+    reset[x0,y0:y1] = 11
+    
+    reset[x5-1,y0:y1] = 12
+    reset[x4:x5,y0] = 12
+    
+    reset[x15,y35] = 0
+    reset[x25,y35] = 1
+    reset[x35,y35] = 2
+    reset[x15,y25] = 3
+    reset[x25,y25] = 4
+    reset[x35,y25] = 5
+    reset[x15,y15] = 6
+    reset[x25,y15] = 7
+    reset[x35,y15] = 8
+    
+    return init, reset
+
+init_labels, reset_labels = zone_labels()
+
+# heatmaps after 0, 1, ..., n_iter iterations of the np.roll method, for any
+# stack of zone values (shape [..., 13] -> [..., zone_width, zone_height])
+def diffusion_frames(zone_rv, n_iter = 10):
+    
+    zone_rv = np.asarray(zone_rv, dtype=float)
+    
+    # initial conditions
+    rv_map = np.where(init_labels >= 0, zone_rv[..., init_labels], 0)
+    yield rv_map
+    
+    for n in range(n_iter):
+        rv_map = 0.25*(np.roll(rv_map, zone_height - 1, axis = -1) + np.roll(rv_map, 1 - zone_height, axis = -1) + np.roll(rv_map, zone_width - 1, axis = -2) + np.roll(rv_map, 1 - zone_width, axis = -2))
+        rv_map = np.where(reset_labels >= 0, zone_rv[..., reset_labels], rv_map)
+        yield rv_map
+
+# final smoothed heatmaps
+def make_heatmaps(zone_rv, n_iter = 10):
+    
+    for rv_map in diffusion_frames(zone_rv, n_iter):
+        pass
+    
+    return rv_map
+
+
+
+# scrape all pitch data for the given (default: active) seasons
+def get_pitch_data(years = None):
     
     ###########################################################################
     ############################# Get Pitch Data ##############################
     ###########################################################################
 
-    pitch_data_2021 = pybaseball.statcast('2021-04-01', '2021-10-03')
-    pitch_data_2022 = pybaseball.statcast('2022-04-07', '2022-10-05')
-    pitch_data_2023 = pybaseball.statcast('2023-03-30', '2023-10-01')
-    pitch_data_2024 = pybaseball.statcast('2024-03-28', '2024-9-27')
-    year_pitch_data = [pitch_data_2021, pitch_data_2022, pitch_data_2023, pitch_data_2024]
-    all_pitch_data = pd.concat([pitch_data_2021, pitch_data_2022, pitch_data_2023, pitch_data_2024])
+    if years is None:
+        years = seasons.active
+
+    # each season downloads (or loads from its partition) independently
+    with ThreadPoolExecutor(len(years)) as executor:
+        year_pitch_data = list(executor.map(seasons.fetch_season, years))
+    all_pitch_data = pd.concat(year_pitch_data)
 
     return all_pitch_data, year_pitch_data
 
 # get league data for all years
-def get_league_data(pitch_data):
+def get_league_data(pitch_data, n_iter = 10, ball_rv = ball_rv, strike_rv = strike_rv):
     
     ###########################################################################
     ############################# Get League Data #############################
@@ -61,47 +188,6 @@ def get_league_data(pitch_data):
     print()
     
     
-    # RE24 values
-    global ball_rv, strike_rv
-    ball_rv = np.zeros([4, 3])
-    strike_rv = np.zeros([4, 3])
-    
-    ball_rv[0][0] = 0.032
-    ball_rv[1][0] = 0.088
-    ball_rv[2][0] = 0.143
-    ball_rv[3][0] = 0.051
-    ball_rv[0][1] = 0.024
-    ball_rv[1][1] = 0.048
-    ball_rv[2][1] = 0.064
-    ball_rv[3][1] = 0.168
-    ball_rv[0][2] = 0.021
-    ball_rv[1][2] = 0.038
-    ball_rv[2][2] = 0.085
-    ball_rv[3][2] = 0.234
-    strike_rv[0][0] = -0.037
-    strike_rv[1][0] = -0.035
-    strike_rv[2][0] = -0.062
-    strike_rv[3][0] = -0.117
-    strike_rv[0][1] = -0.051
-    strike_rv[1][1] = -0.054
-    strike_rv[2][1] = -0.069
-    strike_rv[3][1] = -0.066
-    strike_rv[0][2] = -0.150
-    strike_rv[1][2] = -0.171
-    strike_rv[2][2] = -0.209
-    strike_rv[3][2] = -0.294
-    
-    
-    global swing_types, take_types, bunt_types
-    
-    swing_types = ['hit_into_play', 'foul', 'swinging_strike', 'foul_tip', 
-                   'swinging_strike_blocked', 'swinging_pitchout',
-                   'foul_pitchout']
-    take_types = ['ball', 'called_strike', 'blocked_ball', 'hit_by_pitch', 
-                  'pitchout']
-    bunt_types = ['missed_bunt', 'foul_bunt', 'foul_tip_bunt']
-    
-    
     # initialize data frame and array
     league_rv = np.empty([4,4,3,13])
     # indices are:
@@ -115,57 +201,58 @@ def get_league_data(pitch_data):
     #            
     
     # get swing RV based on contact%, whiff%, and xWOBACON
-    for j in tqdm(range(13)):
+    with step('league zone aggregation', rows = len(pitch_data)):
+        for j in tqdm(range(13)):
         
-        if j < 9: zone = j + 1
-        else: zone = j + 2
+            if j < 9: zone = j + 1
+            else: zone = j + 2
             
-        for s in range(3):
-            for b in range(4):
+            for s in range(3):
+                for b in range(4):
                 
-                # data for pitches here in this count
-                pitches = pitch_data[(pitch_data.zone == zone) &
-                                     (pitch_data.balls == b) &
-                                     (pitch_data.strikes == s)]
-                n = len(pitches)
+                    # data for pitches here in this count
+                    pitches = pitch_data[(pitch_data.zone == zone) &
+                                         (pitch_data.balls == b) &
+                                         (pitch_data.strikes == s)]
+                    n = len(pitches)
                 
                 
-                # pitches swung at
-                swings = pitches[pitches.description.isin(swing_types)]
+                    # pitches swung at
+                    swings = pitches[pitches.description.isin(swing_types)]
                 
-                # number of swings
-                n_swings = len(swings)
+                    # number of swings
+                    n_swings = len(swings)
                 
-                if n != 0:
-                    swing_rate = n_swings/n
-                else:
-                    swing_rate = 0
+                    if n != 0:
+                        swing_rate = n_swings/n
+                    else:
+                        swing_rate = 0
                 
-                league_rv[1][b][s][j] = swing_rate
+                    league_rv[1][b][s][j] = swing_rate
                 
                 
-                # contact & foul ball percentage
-                if n_swings != 0:
-                    contact = sum(swings.description == 'hit_into_play')/n_swings
-                    foul = sum(swings.description == 'foul')/n_swings
-                    whiff = 1 - contact - foul
-                else:
-                    contact, foul, whiff = 0, 0, 0
+                    # contact & foul ball percentage
+                    if n_swings != 0:
+                        contact = sum(swings.description == 'hit_into_play')/n_swings
+                        foul = sum(swings.description == 'foul')/n_swings
+                        whiff = 1 - contact - foul
+                    else:
+                        contact, foul, whiff = 0, 0, 0
                             
-                # observed run value on balls in play
-                if contact != 0:
-                    xwobacon = swings[swings.description == 'hit_into_play']['estimated_woba_using_speedangle'].fillna(0).mean()
-                    bip_rv = 0.6679*xwobacon - 0.192
-                else:
-                    bip_rv  = 0
+                    # observed run value on balls in play
+                    if contact != 0:
+                        xwobacon = swings[swings.description == 'hit_into_play']['estimated_woba_using_speedangle'].fillna(0).mean()
+                        bip_rv = 0.6679*xwobacon - 0.192
+                    else:
+                        bip_rv  = 0
                     
-                # calculated run value for swings, based on RE24
-                if s == 2:
-                    swing_rv = (contact*bip_rv + whiff*strike_rv[b][s])
-                else:
-                    swing_rv = (contact*bip_rv + (whiff + foul)*strike_rv[b][s])
+                    # calculated run value for swings, based on RE24
+                    if s == 2:
+                        swing_rv = (contact*bip_rv + whiff*strike_rv[b][s])
+                    else:
+                        swing_rv = (contact*bip_rv + (whiff + foul)*strike_rv[b][s])
                 
-                league_rv[2][b][s][j] = swing_rv
+                    league_rv[2][b][s][j] = swing_rv
                 
     
     
@@ -179,167 +266,107 @@ def get_league_data(pitch_data):
     print('Making Heatmaps')
     print()
     
-    # strike zone dimensions
-    zone_height = 35
-    zone_width = 30
-    
-    # number of iterations for numerical solution
-    n_iter = 10
-    
-    # create zones
-    x0, y0 = 0, 0
-    x1, y1 = 5, 6
-    x15, y15 = 9, 10
-    x2, y2 = 12, 14
-    x25, y25 = 15, 18
-    x3, y3 = 18, 22
-    x35, y35 = 21, 26
-    x4, y4 = 25, 30
-    x5, y5 = 30, 35
-    
     # Initialize arrays
     league_zonemaps = np.empty([4, 4, 3, zone_width, zone_height])
     league_heatmaps = np.empty([5, 4, 3, zone_width, zone_height])
     # ^ extra 5th pouch is for cs%
     
     # first get called strike % (more granular than swing rv)
-    for X in tqdm(range(-15, 15)):
-        x = X/13.5
-        xx = (X + 1)/13.5
-        for Z in range(35):
-            z = (Z*32/35 + 14)/12
-            zz = ((Z + 1)*32/35 + 14)/12
+    with step('called strike grid', rows = len(pitch_data)):
+        for X in tqdm(range(-15, 15)):
+            x = X/13.5
+            xx = (X + 1)/13.5
+            for Z in range(35):
+                z = (Z*32/35 + 14)/12
+                zz = ((Z + 1)*32/35 + 14)/12
             
-            pitches = pitch_data[(pitch_data.plate_x >= x) &
-                                 (pitch_data.plate_x < xx) &
-                                 (pitch_data.plate_z >= z) &
-                                 (pitch_data.plate_z < zz)]
+                pitches = pitch_data[(pitch_data.plate_x >= x) &
+                                     (pitch_data.plate_x < xx) &
+                                     (pitch_data.plate_z >= z) &
+                                     (pitch_data.plate_z < zz)]
             
-            # pitches taken
-            takes = pitches[pitches.description.isin(take_types)]
+                # pitches taken
+                takes = pitches[pitches.description.isin(take_types)]
             
-            # percentage of taken pitches called stikes
-            n_takes = len(takes)
-            cs = sum(takes.description == 'called_strike')/n_takes
+                # percentage of taken pitches called stikes
+                n_takes = len(takes)
+                if n_takes != 0:
+                    cs = sum(takes.description == 'called_strike')/n_takes
+                else:
+                    cs = 0
             
-            league_heatmaps[4][0][0][X + 15][Z] = cs
+                league_heatmaps[4][0][0][X + 15][Z] = cs
     
-            # different values of TRV for each count
-            for s in range(3):
-                for b in range(4):
+                # different values of TRV for each count
+                for s in range(3):
+                    for b in range(4):
                     
-                    # and calculate TRV using RE24
-                    take_rv = cs*strike_rv[b,s] + (1 - cs)*ball_rv[b,s]
+                        # and calculate TRV using RE24
+                        take_rv = cs*strike_rv[b,s] + (1 - cs)*ball_rv[b,s]
                     
-                    # append to array
-                    league_heatmaps[3][b][s][X+15][Z] = take_rv
+                        # append to array
+                        league_heatmaps[3][b][s][X+15][Z] = take_rv
     
     
     # now merge zone data to make swing heatmaps
-    for i in range(1,3):
-        for b in range(4):
-            for s in range(3):
-                
-                # initialize heat map
-                rv_map = np.zeros([zone_width, zone_height])
-                
-                # initial condition set/reset function
-                def set_conds(rv_map, reset = False):
-                    
-                    # initial conditions
-                    z1 = league_rv[i][b][s][0]
-                    z2 = league_rv[i][b][s][1]
-                    z3 = league_rv[i][b][s][2]
-                    z4 = league_rv[i][b][s][3]
-                    z5 = league_rv[i][b][s][4]
-                    z6 = league_rv[i][b][s][5]
-                    z7 = league_rv[i][b][s][6]
-                    z8 = league_rv[i][b][s][7]
-                    z9 = league_rv[i][b][s][8]
-                    z11 = league_rv[i][b][s][9]
-                    z12 = league_rv[i][b][s][10]
-                    z13 = league_rv[i][b][s][11]
-                    z14 = league_rv[i][b][s][12]
-                    
-                    
-                    if not reset:
-                        # Set the initial conditions by zone
-                        rv_map[x1:x2, y3:y4] = z1
-                        rv_map[x2:x3, y3:y4] = z2
-                        rv_map[x3:x4, y3:y4] = z3
-                        rv_map[x1:x2, y2:y3] = z4
-                        rv_map[x2:x3, y2:y3] = z5
-                        rv_map[x3:x4, y2:y3] = z6
-                        rv_map[x1:x2, y1:y2] = z7
-                        rv_map[x2:x3, y1:y2] = z8
-                        rv_map[x3:x4, y1:y2] = z9
-                        rv_map[x0:x1, y25:y5] = z11
-                        rv_map[x1:x25, y4:y5] = z11
-                        rv_map[x25:x5, y4:y5] = z12
-                        rv_map[x4:x5, y25:y5] = z12
-                        rv_map[x0:x1, y0:y25] = z13
-                        rv_map[x1:x25, y0:y1] = z13
-                        rv_map[x25:x5, y0:y1] = z14
-                        rv_map[x4:x5, y0:y25] = z14
-                    
-                    # reset boundary conditions
-                    if reset: 
-                        rv_map[x0,y4:y5] = z11
-                        rv_map[x0:x1,y5-1] = z11
-                        
-                        rv_map[x4:x5,y5-1] = z12
-                        rv_map[x5-1,y4:y5] = z12
-                        
-                        rv_map[x0:x1,y0] = z13
-                        rv_map[x0,y0:y1] = z13
-                        
-                        rv_map[x5-1,y0:y1] = z14
-                        rv_map[x4:x5,y0] = z14
-                        
-                        rv_map[x15,y35] = z1
-                        rv_map[x25,y35] = z2
-                        rv_map[x35,y35] = z3
-                        rv_map[x15,y25] = z4
-                        rv_map[x25,y25] = z5
-                        rv_map[x35,y25] = z6
-                        rv_map[x15,y15] = z7
-                        rv_map[x25,y15] = z8
-                        rv_map[x35,y15] = z9
-                    
-                    return rv_map
-    
-                # set initial conditions
-                rv_map = set_conds(rv_map)
-                league_zonemaps[i][b][s] = rv_map
-
-    
-                # make heatmaps using np.roll method
-                for n in range(n_iter):
-                    rv_map = 0.25*(np.roll(rv_map, zone_height - 1, axis = 1) + np.roll(rv_map, 1 - zone_height, axis = 1) + np.roll(rv_map, zone_width - 1, axis = 0) + np.roll(rv_map, 1 - zone_width, axis = 0))
-                    rv_map = set_conds(rv_map, reset = True)  
-                
-                # append heatmaps to arrays
-                league_heatmaps[i][b][s] = rv_map
+    with step('league diffusion', rows = league_rv[1:3].size//13):
+        league_zonemaps[1:3] = next(diffusion_frames(league_rv[1:3]))
+        league_heatmaps[1:3] = make_heatmaps(league_rv[1:3], n_iter)
                        
-    # calculate expected RV by location and count
-    for s in range(3):
-        for b in range(4):
-            swing_rate = league_heatmaps[1][b][s]
-            take_rate = 1 - swing_rate
-            swing_rv = league_heatmaps[2][b][s]
-            take_rv = league_heatmaps[3][b][s]
+        # calculate expected RV by location and count
+        for s in range(3):
+            for b in range(4):
+                swing_rate = league_heatmaps[1][b][s]
+                take_rate = 1 - swing_rate
+                swing_rv = league_heatmaps[2][b][s]
+                take_rv = league_heatmaps[3][b][s]
             
-            xrv = swing_rate*swing_rv + take_rate*take_rv
+                xrv = swing_rate*swing_rv + take_rate*take_rv
             
-            league_heatmaps[0][b][s] = xrv
+                league_heatmaps[0][b][s] = xrv
               
     np.save('league_heatmaps.npy', np.array(league_heatmaps, dtype=float), allow_pickle=True)
     np.save('league_zonemaps.npy', np.array(league_zonemaps, dtype=float), allow_pickle=True)
     
     return league_heatmaps
     
+# every listed batter in the given (default: active) seasons, in heatmap row order
+def player_list(years = None):
+    
+    if years is None:
+        years = seasons.active
+    
+    pdat = pd.concat([pd.read_csv(seasons.season_file('players', year)) for year in years], ignore_index=True)
+
+    pdat = pd.DataFrame({
+                        'ID': pdat['player_id'], 
+                        'Name': pdat['player_name']
+                        })
+
+    pdat = pdat.drop_duplicates()
+
+    return list(pdat['ID'])
+
+# heatmap rows: every listed batter over all seasons, then (with season_maps)
+# each season's batters for that season alone
+def player_index(years = None, season_maps = False):
+    
+    if years is None:
+        years = seasons.active
+    
+    ids = player_list(years)
+    row_seasons = [''] * len(ids)
+    
+    if season_maps:
+        for year in years:
+            season_ids = list(pd.read_csv(seasons.season_file('players', year)).player_id.drop_duplicates())
+            ids = ids + season_ids
+            row_seasons = row_seasons + [str(year)] * len(season_ids)
+    
+    return HeatmapIndex(ids, row_seasons)
+
 # get player data
-def get_player_data(pitch_data):
+def get_player_data(pitch_data, n_iter = 10, strike_rv = strike_rv, season_maps = False):
     
     
     ###########################################################################
@@ -348,118 +375,70 @@ def get_player_data(pitch_data):
     
     
     
-    # RE24 values
-    global ball_rv, strike_rv
-    ball_rv = np.zeros([4, 3])
-    strike_rv = np.zeros([4, 3])
-    
-    ball_rv[0][0] = 0.032
-    ball_rv[1][0] = 0.088
-    ball_rv[2][0] = 0.143
-    ball_rv[3][0] = 0.051
-    ball_rv[0][1] = 0.024
-    ball_rv[1][1] = 0.048
-    ball_rv[2][1] = 0.064
-    ball_rv[3][1] = 0.168
-    ball_rv[0][2] = 0.021
-    ball_rv[1][2] = 0.038
-    ball_rv[2][2] = 0.085
-    ball_rv[3][2] = 0.234
-    strike_rv[0][0] = -0.037
-    strike_rv[1][0] = -0.035
-    strike_rv[2][0] = -0.062
-    strike_rv[3][0] = -0.117
-    strike_rv[0][1] = -0.051
-    strike_rv[1][1] = -0.054
-    strike_rv[2][1] = -0.069
-    strike_rv[3][1] = -0.066
-    strike_rv[0][2] = -0.150
-    strike_rv[1][2] = -0.171
-    strike_rv[2][2] = -0.209
-    strike_rv[3][2] = -0.294
-    
-    
-    global swing_types, take_types, bunt_types
-    
-    swing_types = ['hit_into_play', 'foul', 'swinging_strike', 'foul_tip', 
-                   'swinging_strike_blocked', 'swinging_pitchout',
-                   'foul_pitchout']
-    take_types = ['ball', 'called_strike', 'blocked_ball', 'hit_by_pitch', 
-                  'pitchout']
-    bunt_types = ['missed_bunt', 'foul_bunt', 'foul_tip_bunt']
-    
-    
     print()
     print("Gathering Player Data")
     print()
         
     
     # load player data
-    pdat_2021 = pd.read_csv('players_2021.csv')
-    pdat_2022 = pd.read_csv('players_2022.csv')
-    pdat_2023 = pd.read_csv('players_2023.csv')
-    pdat_2024 = pd.read_csv('players_2024.csv')
-
-    pdat = pd.concat([pdat_2021, pdat_2022, pdat_2023, pdat_2024], ignore_index=True)
-
-    pdat = pd.DataFrame({
-                        'ID': pdat['player_id'], 
-                        'Name': pdat['player_name']
-                        })
-
-    pdat = pdat.drop_duplicates()
-
-    player_id = list(pdat['ID'])
+    index = player_index(season_maps = season_maps)
+    player_id = index.ids
     
     # intialise list of dictionaries
     player_rv = np.empty([len(player_id), 4, 3, 13])
     
     # Get batter stats for each zone to be converted to RV
-    for i in tqdm(range(len(player_id))):         
-        # get player rv for each zone
-        for j in range(13):
+    with step('player zone aggregation', rows = len(pitch_data)):
+        for i in tqdm(range(len(player_id))):         
+            
+            # pitches to this player, in this row's season if it has one
+            player_pitches = pitch_data[pitch_data.batter == player_id[i]]
+            if index.seasons[i]:
+                player_pitches = player_pitches[player_pitches.game_year.astype(str) == index.seasons[i]]
+            
+            # get player rv for each zone
+            for j in range(13):
         
-            if j < 9: zone = j + 1
-            else: zone = j + 2
+                if j < 9: zone = j + 1
+                else: zone = j + 2
             
-            # data for pitches in this zone to this player
-            pitches = pitch_data[(pitch_data.batter == player_id[i]) & 
-                                   (pitch_data.zone == zone)]
+                # data for pitches in this zone to this player
+                pitches = player_pitches[player_pitches.zone == zone]
                         
             
-            # pitches swung at
-            swings = pitches[pitches.description.isin(swing_types)]
+                # pitches swung at
+                swings = pitches[pitches.description.isin(swing_types)]
             
-            # number of swings
-            n_swings = len(swings)
+                # number of swings
+                n_swings = len(swings)
             
-            # contact & foul ball percentage
-            if n_swings != 0:
-                contact = sum(swings.description == 'hit_into_play')/n_swings
-                foul = sum(swings.description == 'foul')/n_swings
-                whiff = 1 - contact - foul
-            else:
-                contact, foul, whiff = 0, 0, 0
+                # contact & foul ball percentage
+                if n_swings != 0:
+                    contact = sum(swings.description == 'hit_into_play')/n_swings
+                    foul = sum(swings.description == 'foul')/n_swings
+                    whiff = 1 - contact - foul
+                else:
+                    contact, foul, whiff = 0, 0, 0
                 
-            # observed run value on balls in play
-            if contact != 0:
-                xwobacon = swings[swings.description == 'hit_into_play']['estimated_woba_using_speedangle'].fillna(0).mean()
-                bip_rv = 0.6679*xwobacon - 0.192
-            else:
-                bip_rv  = 0
+                # observed run value on balls in play
+                if contact != 0:
+                    xwobacon = swings[swings.description == 'hit_into_play']['estimated_woba_using_speedangle'].fillna(0).mean()
+                    bip_rv = 0.6679*xwobacon - 0.192
+                else:
+                    bip_rv  = 0
 
 
-            # calculated run value for swings, based on RE24
-            for s in range(3):
-                for b in range(4):
+                # calculated run value for swings, based on RE24
+                for s in range(3):
+                    for b in range(4):
                     
-                    # swings
-                    if s == 2:
-                        swing_rv = contact*bip_rv + whiff*strike_rv[b][s]
-                    else:
-                        swing_rv = contact*bip_rv + (whiff + foul)*strike_rv[b][s]
+                        # swings
+                        if s == 2:
+                            swing_rv = contact*bip_rv + whiff*strike_rv[b][s]
+                        else:
+                            swing_rv = contact*bip_rv + (whiff + foul)*strike_rv[b][s]
                     
-                    player_rv[i][b][s][j] = swing_rv
+                        player_rv[i][b][s][j] = swing_rv
     
     
     
@@ -473,122 +452,20 @@ def get_player_data(pitch_data):
     print("Making Heatmaps")
     print()
     
-    # player list
-    player_name = list(pdat['Name'])
-    player_id = list(pdat['ID'])
-    n_players = len(player_name)
-    
-    # strike zone dimensions
-    zone_height = 35
-    zone_width = 30
-    
-    # number of iterations for numerical solution
-    n_iter = 10
-    
-    # Initialize array
-    player_heatmaps = np.empty([n_players, 4, 3, 11, zone_width, zone_height])
-    
-    for i in tqdm(range(len(player_id))):        
-        for b in range(4):
-            for s in range(3):
-                
-                # initialize heat map
-                swing_rv = np.zeros([zone_width, zone_height])
-                
-                # create zones
-                x0, y0 = 0, 0
-                x1, y1 = 5, 6
-                x15, y15 = 9, 10
-                x2, y2 = 12, 14
-                x25, y25 = 15, 18
-                x3, y3 = 18, 22
-                x35, y35 = 21, 26
-                x4, y4 = 25, 30
-                x5, y5 = 30, 35
-                
-                # initial conditions
-                z1 = player_rv[i][b][s][0]
-                z2 = player_rv[i][b][s][1]
-                z3 = player_rv[i][b][s][2]
-                z4 = player_rv[i][b][s][3]
-                z5 = player_rv[i][b][s][4]
-                z6 = player_rv[i][b][s][5]
-                z7 = player_rv[i][b][s][6]
-                z8 = player_rv[i][b][s][7]
-                z9 = player_rv[i][b][s][8]
-                z11 = player_rv[i][b][s][9]
-                z12 = player_rv[i][b][s][10]
-                z13 = player_rv[i][b][s][11]
-                z14 = player_rv[i][b][s][12]
-
-                
-                # initial condition set/reset function
-                def set_conds(rv_map, reset = False):
-                    
-                    if not reset:
-                        # Set the initial conditions by zone
-                        rv_map[x1:x2, y3:y4] = z1
-                        rv_map[x2:x3, y3:y4] = z2
-                        rv_map[x3:x4, y3:y4] = z3
-                        rv_map[x1:x2, y2:y3] = z4
-                        rv_map[x2:x3, y2:y3] = z5
-                        rv_map[x3:x4, y2:y3] = z6
-                        rv_map[x1:x2, y1:y2] = z7
-                        rv_map[x2:x3, y1:y2] = z8
-                        rv_map[x3:x4, y1:y2] = z9
-                        rv_map[x0:x1, y25:y5] = z11
-                        rv_map[x1:x25, y4:y5] = z11
-                        rv_map[x25:x5, y4:y5] = z12
-                        rv_map[x4:x5, y25:y5] = z12
-                        rv_map[x0:x1, y0:y25] = z13
-                        rv_map[x1:x25, y0:y1] = z13
-                        rv_map[x25:x5, y0:y1] = z14
-                        rv_map[x4:x5, y0:y25] = z14
-                    
-                    # reset boundary conditions
-                    if reset: 
-                        rv_map[x0,y4:y5] = z11
-                        rv_map[x0:x1,y5-1] = z11
-                        
-                        rv_map[x4:x5,y5-1] = z12
-                        rv_map[x5-1,y4:y5] = z12
-                        
-                        rv_map[x0:x1,y0] = z13
-                        rv_map[x0,y0:y1] = z13
-                        
-                        rv_map[x5-1,y0:y1] = z14
-                        rv_map[x4:x5,y0] = z14
-                        
-                        rv_map[x15,y35] = z1
-                        rv_map[x25,y35] = z2
-                        rv_map[x35,y35] = z3
-                        rv_map[x15,y25] = z4
-                        rv_map[x25,y25] = z5
-                        rv_map[x35,y25] = z6
-                        rv_map[x15,y15] = z7
-                        rv_map[x25,y15] = z8
-                        rv_map[x35,y15] = z9
-                    
-                    return rv_map
-    
-                # set initial conditions
-                swing_rv = set_conds(swing_rv)
-                player_heatmaps[i][b][s][0] = swing_rv
+    # smooth every player and count at once; only the final iteration is
+    # stored, the zone values are kept so the frames can be regenerated
+    with step('player diffusion', rows = player_rv.size//13):
+        player_heatmaps = make_heatmaps(player_rv, n_iter)
     
-                # make heatmap using np.roll method
-                for n in range(n_iter):
-                    swing_rv = 0.25*(np.roll(swing_rv, zone_height - 1, axis = 1) + np.roll(swing_rv, 1 - zone_height, axis = 1) + np.roll(swing_rv, zone_width - 1, axis = 0) + np.roll(swing_rv, 1 - zone_width, axis = 0))
-                    swing_rv = set_conds(swing_rv, reset = True)       
-                    player_heatmaps[i][b][s][n + 1] = swing_rv
-                
-                    
-              
     np.save('player_heatmaps.npy', np.array(player_heatmaps, dtype=float), allow_pickle=True)
+    np.save('player_zone_rv.npy', np.array(player_rv, dtype=float), allow_pickle=True)
+    index.save(index_file('player_heatmaps.npy'))
     
     return player_heatmaps
     
 # evaluate swing/take decisions
-def swing_take(year, year_pitch_data, league_heatmaps, player_heatmaps):
+def swing_take(year, year_pitch_data, league_heatmaps, player_heatmaps, bias = 0, player_index = None,
+               batters = None):
     
     
     ###########################################################################
@@ -602,270 +479,295 @@ def swing_take(year, year_pitch_data, league_heatmaps, player_heatmaps):
     print()
     
     # select proper year
-    pitch_data = year_pitch_data[int(year) - 2021]
-    pdat = pd.read_csv('players_' + year + '.csv')
+    pitch_data = seasons.season_pitches(year_pitch_data, year)
+    pdat = pd.read_csv(seasons.season_file('players', year))
     player_name = pdat.player_name
     player_id = pdat.player_id
+    
+    # heatmap rows by ID; this season's maps where there are any
+    if player_index is None:
+        player_index = HeatmapIndex(player_list())
 
-    # RE24 values
-    ball_rv = np.zeros([4, 3])
-    strike_rv = np.zeros([4, 3])
-    
-    ball_rv[0][0] = 0.032
-    ball_rv[1][0] = 0.088
-    ball_rv[2][0] = 0.143
-    ball_rv[3][0] = 0.051
-    ball_rv[0][1] = 0.024
-    ball_rv[1][1] = 0.048
-    ball_rv[2][1] = 0.064
-    ball_rv[3][1] = 0.168
-    ball_rv[0][2] = 0.021
-    ball_rv[1][2] = 0.038
-    ball_rv[2][2] = 0.085
-    ball_rv[3][2] = 0.234
-    strike_rv[0][0] = -0.037
-    strike_rv[1][0] = -0.035
-    strike_rv[2][0] = -0.062
-    strike_rv[3][0] = -0.117
-    strike_rv[0][1] = -0.051
-    strike_rv[1][1] = -0.054
-    strike_rv[2][1] = -0.069
-    strike_rv[3][1] = -0.066
-    strike_rv[0][2] = -0.150
-    strike_rv[1][2] = -0.171
-    strike_rv[2][2] = -0.209
-    strike_rv[3][2] = -0.294
-        
-    swing_types = ['hit_into_play', 'foul', 'swinging_strike', 'foul_tip', 
-                   'swinging_strike_blocked', 'swinging_pitchout',
-                   'foul_pitchout']
-    take_types = ['ball', 'called_strike', 'blocked_ball', 'hit_by_pitch', 
-                  'pitchout']
-    bunt_types = ['missed_bunt', 'foul_bunt', 'foul_tip_bunt']
-
+    # with batters, only their rows are redone and merged into the saved
+    # leaderboards (as in an incremental ingest)
+    if batters is None:
+        players = list(range(len(player_id)))
+    else:
+        batters = set(int(pid) for pid in batters)
+        players = [i for i in range(len(player_id)) if int(player_id[i]) in batters]
 
     # initialize lists
     c_rows = [None] * len(player_id)
     p_rows = [None] * len(player_id)
+    decisions = []
 
     # loop over all players
-    for i in tqdm(range(len(player_id))): 
+    with step('scoring ' + year, rows = len(pitch_data)):
+        for i in tqdm(players): 
                 
-        # initialize values
-        classic_xrv = 0
+            # initialize values
+            classic_xrv = 0
         
-        c_good_swings = 0
-        c_good_swing_runs = 0
-        c_bad_swings = 0
-        c_bad_swing_runs = 0
+            c_good_swings = 0
+            c_good_swing_runs = 0
+            c_bad_swings = 0
+            c_bad_swing_runs = 0
         
-        c_good_takes = 0
-        c_good_take_runs = 0
-        c_bad_takes = 0
-        c_bad_take_runs = 0
+            c_good_takes = 0
+            c_good_take_runs = 0
+            c_bad_takes = 0
+            c_bad_take_runs = 0
         
         
-        player_xrv = 0
+            player_xrv = 0
         
-        p_good_swings = 0
-        p_good_swing_runs = 0
-        p_bad_swings = 0
-        p_bad_swing_runs = 0
+            p_good_swings = 0
+            p_good_swing_runs = 0
+            p_bad_swings = 0
+            p_bad_swing_runs = 0
         
-        p_good_takes = 0
-        p_good_take_runs = 0
-        p_bad_takes = 0
-        p_bad_take_runs = 0
+            p_good_takes = 0
+            p_good_take_runs = 0
+            p_bad_takes = 0
+            p_bad_take_runs = 0
         
         
-        ns, nt = 0, 0
+            ns, nt = 0, 0
         
         
-        xlist = []
-        zlist = []
-        for X in range(-15, 15):
-            xlist.append(X/13.5 + 1/27)
-        for Z in range(35):
-            zlist.append((Z*32/35 + 14)/12 + 1/27)
+            xlist = []
+            zlist = []
+            for X in range(-15, 15):
+                xlist.append(X/13.5 + 1/27)
+            for Z in range(35):
+                zlist.append((Z*32/35 + 14)/12 + 1/27)
         
-        # data for pitches to this player
-        pitches = pitch_data[pitch_data.batter == player_id[i]]
+            # data for pitches to this player
+            pitches = pitch_data[pitch_data.batter == player_id[i]]
+            heatmap_row = player_index.row(player_id[i], year)
         
-        for index, row in pitches.iterrows():
+            for index, row in pitches.iterrows():
             
-            # determine location
-            x = row.plate_x
-            z = row.plate_z
+                # determine location
+                x = row.plate_x
+                z = row.plate_z
             
-            if pd.isna(x):
-                continue
+                if pd.isna(x):
+                    continue
             
-            if row.description in bunt_types:
-                continue
+                if row.description in bunt_types:
+                    continue
             
-            # round appropriately to proper zone
-            x = min(xlist, key=lambda d:abs(d-x))
-            z = min(zlist, key=lambda d:abs(d-z))
+                # round appropriately to proper zone
+                x = min(xlist, key=lambda d:abs(d-x))
+                z = min(zlist, key=lambda d:abs(d-z))
             
-            # get proper index for matrix retrieval
-            ix = xlist.index(x)
-            iz = zlist.index(z)
+                # get proper index for matrix retrieval
+                ix = xlist.index(x)
+                iz = zlist.index(z)
             
-            # determine count
-            b = row.balls
-            s = row.strikes
-            if b > 3: b = 3
-            if s > 2: s = 2
+                # determine count
+                b = row.balls
+                s = row.strikes
+                if b > 3: b = 3
+                if s > 2: s = 2
             
-            #
-            # fetch data from league and player heatmaps
-            #
+                #
+                # fetch data from league and player heatmaps
+                #
         
-            # classic actual run value for swings and takes
-            classic_srv = league_heatmaps[2][b][s][ix][iz]
-            trv = league_heatmaps[3][b][s][ix][iz]
+                # classic actual run value for swings and takes
+                classic_srv = league_heatmaps[2][b][s][ix][iz]
+                trv = league_heatmaps[3][b][s][ix][iz]
             
-            # player actual run value for swings (trv is the same)
-            player_srv = player_heatmaps[i][b][s][ix][iz]
+                # player actual run value for swings (trv is the same)
+                player_srv = player_heatmaps[heatmap_row][b][s][ix][iz]
             
-            # classic expected run value (using league stats)
-            classic_xrv = classic_xrv + league_heatmaps[0][b][s][ix][iz]
+                # classic expected run value (using league stats)
+                pitch_classic_xrv = league_heatmaps[0][b][s][ix][iz]
+                classic_xrv = classic_xrv + pitch_classic_xrv
             
-            # player expected run value (using player stats)
-            league_swing = league_heatmaps[1][b][s][ix][iz]
-            player_xrv = player_xrv + league_swing*player_srv + (1 - league_swing)*trv
+                # player expected run value (using player stats)
+                league_swing = league_heatmaps[1][b][s][ix][iz]
+                pitch_player_xrv = league_swing*player_srv + (1 - league_swing)*trv
+                player_xrv = player_xrv + pitch_player_xrv
             
             
-            #
-            # evaluate swing decision
-            #
+                #
+                # evaluate swing decision
+                #
             
-            bias = 0
-            
-            # if the player swung
-            if row.description in swing_types:
+                # if the player swung
+                if row.description in swing_types:
                 
-                ns = ns + 1
+                    ns = ns + 1
                 
-                # classic
-                if classic_srv > trv + bias:
-                    c_good_swings = c_good_swings + 1
-                    c_good_swing_runs = c_good_swing_runs + classic_srv
-                else:
-                    c_bad_swings = c_bad_swings + 1
-                    c_bad_swing_runs = c_bad_swing_runs + classic_srv
+                    # classic
+                    if classic_srv > trv + bias:
+                        c_good_swings = c_good_swings + 1
+                        c_good_swing_runs = c_good_swing_runs + classic_srv
+                    else:
+                        c_bad_swings = c_bad_swings + 1
+                        c_bad_swing_runs = c_bad_swing_runs + classic_srv
                     
                     
-                # player
-                if player_srv > trv + bias:
-                    p_good_swings = p_good_swings + 1
-                    p_good_swing_runs = p_good_swing_runs + player_srv
-                else:
-                    p_bad_swings = p_bad_swings + 1
-                    p_bad_swing_runs = p_bad_swing_runs + player_srv
+                    # player
+                    if player_srv > trv + bias:
+                        p_good_swings = p_good_swings + 1
+                        p_good_swing_runs = p_good_swing_runs + player_srv
+                    else:
+                        p_bad_swings = p_bad_swings + 1
+                        p_bad_swing_runs = p_bad_swing_runs + player_srv
+                
+                    # decision values for this pitch
+                    decisions.append({'batter': player_id[i],
+                                      'pitcher': row.pitcher,
+                                      'game_date': row.game_date,
+                                      'at_bat_number': row.at_bat_number,
+                                      'pitch_number': row.pitch_number,
+                                      'balls': b,
+                                      'strikes': s,
+                                      'plate_x': row.plate_x,
+                                      'plate_z': row.plate_z,
+                                      'swing': True,
+                                      'classic_rv': classic_srv,
+                                      'player_rv': player_srv,
+                                      'classic': classic_srv - pitch_classic_xrv,
+                                      'player': player_srv - pitch_player_xrv,
+                                      'classic_good': classic_srv > trv + bias,
+                                      'player_good': player_srv > trv + bias})
             
             
-            # if the player did not swing
-            if row.description in take_types:
+                # if the player did not swing
+                if row.description in take_types:
 
-                nt = nt + 1
+                    nt = nt + 1
                 
-                if trv > classic_srv + bias:
-                    c_good_takes = c_good_takes + 1
-                    c_good_take_runs = c_good_take_runs + trv
-                else:
-                    c_bad_takes = c_bad_takes + 1
-                    c_bad_take_runs = c_bad_take_runs + trv
+                    if trv > classic_srv + bias:
+                        c_good_takes = c_good_takes + 1
+                        c_good_take_runs = c_good_take_runs + trv
+                    else:
+                        c_bad_takes = c_bad_takes + 1
+                        c_bad_take_runs = c_bad_take_runs + trv
                     
                     
-                if trv > player_srv + bias:
-                    p_good_takes = p_good_takes + 1
-                    p_good_take_runs = p_good_take_runs + trv
-                else:
-                    p_bad_takes = p_bad_takes + 1
-                    p_bad_take_runs = p_bad_take_runs + trv
+                    if trv > player_srv + bias:
+                        p_good_takes = p_good_takes + 1
+                        p_good_take_runs = p_good_take_runs + trv
+                    else:
+                        p_bad_takes = p_bad_takes + 1
+                        p_bad_take_runs = p_bad_take_runs + trv
+                
+                    # decision values for this pitch
+                    decisions.append({'batter': player_id[i],
+                                      'pitcher': row.pitcher,
+                                      'game_date': row.game_date,
+                                      'at_bat_number': row.at_bat_number,
+                                      'pitch_number': row.pitch_number,
+                                      'balls': b,
+                                      'strikes': s,
+                                      'plate_x': row.plate_x,
+                                      'plate_z': row.plate_z,
+                                      'swing': False,
+                                      'classic_rv': trv,
+                                      'player_rv': trv,
+                                      'classic': trv - pitch_classic_xrv,
+                                      'player': trv - pitch_player_xrv,
+                                      'classic_good': trv > classic_srv + bias,
+                                      'player_good': trv > player_srv + bias})
                     
                     
                     
-        csrv = c_good_swing_runs + c_bad_swing_runs
-        ctrv = c_good_take_runs + c_bad_take_runs
-        n_p = round(ns + nt)
+            csrv = c_good_swing_runs + c_bad_swing_runs
+            ctrv = c_good_take_runs + c_bad_take_runs
+            n_p = round(ns + nt)
         
-        # hittable pitches taken
-        c_hpt = c_bad_takes/nt*100  
-        # weird selectiveness metric
-        c_sel = c_good_takes/(c_good_takes + c_good_swings)*100
+            # hittable pitches taken
+            c_hpt = c_bad_takes/nt*100  
+            # weird selectiveness metric
+            c_sel = c_good_takes/(c_good_takes + c_good_swings)*100
         
-        c_rows[i] = {
-                    'NAME': player_name[i],
-                    'ID': player_id[i],
-                    'N_SWINGS': ns,
-                    'N_TAKES': nt,
-                    'N_P': n_p,
-                    'G%S': round(c_good_swings/ns*100, 1),
-                    'GS_RV': round(c_good_swing_runs, 1),
-                    'B%S': round(c_bad_swings/ns*100, 1),
-                    'BS_RV': round(c_bad_swing_runs, 1),
-                    'SRV': round(csrv, 1),
-                    'G%T': round(c_good_takes/nt*100, 1),
-                    'GT_RV': round(c_good_take_runs, 1),
-                    'B%T': round(c_hpt, 1),
-                    'BT_RV': round(c_bad_take_runs, 1),
-                    'TRV': round(ctrv, 1),
-                    'TOT_RV': round(csrv + ctrv, 1),
-                    'EXP_RV': round(classic_xrv, 1),
-                    'SWTR': round(csrv + ctrv - classic_xrv, 1),
-                    'SWTR_Per650': round((csrv + ctrv - classic_xrv)/n_p*2542, 1),
-                    'EXP_RV+': round(player_xrv, 1),
-                    'SWTR+': round(csrv + ctrv - player_xrv, 1),
-                    'SWTR_Per650+': round((csrv + ctrv - player_xrv)/n_p*2542, 1),
-                    'Correct%': round((c_good_swings + c_good_takes)/n_p*100, 1),
-                    'Selective': round(c_sel, 1),
-                    'Agression': round(c_hpt, 1),
-                    'SEAGER': round(c_sel - c_hpt, 1),
-                    'L_SEAGER': round(c_good_swings/ns*100 - c_hpt, 1)
-                    }
+            c_rows[i] = {
+                        'NAME': player_name[i],
+                        'ID': player_id[i],
+                        'N_SWINGS': ns,
+                        'N_TAKES': nt,
+                        'N_P': n_p,
+                        'G%S': round(c_good_swings/ns*100, 1),
+                        'GS_RV': round(c_good_swing_runs, 1),
+                        'B%S': round(c_bad_swings/ns*100, 1),
+                        'BS_RV': round(c_bad_swing_runs, 1),
+                        'SRV': round(csrv, 1),
+                        'G%T': round(c_good_takes/nt*100, 1),
+                        'GT_RV': round(c_good_take_runs, 1),
+                        'B%T': round(c_hpt, 1),
+                        'BT_RV': round(c_bad_take_runs, 1),
+                        'TRV': round(ctrv, 1),
+                        'TOT_RV': round(csrv + ctrv, 1),
+                        'EXP_RV': round(classic_xrv, 1),
+                        'SWTR': round(csrv + ctrv - classic_xrv, 1),
+                        'SWTR_Per650': round((csrv + ctrv - classic_xrv)/n_p*2542, 1),
+                        'EXP_RV+': round(player_xrv, 1),
+                        'SWTR+': round(csrv + ctrv - player_xrv, 1),
+                        'SWTR_Per650+': round((csrv + ctrv - player_xrv)/n_p*2542, 1),
+                        'Correct%': round((c_good_swings + c_good_takes)/n_p*100, 1),
+                        'Selective': round(c_sel, 1),
+                        'Agression': round(c_hpt, 1),
+                        'SEAGER': round(c_sel - c_hpt, 1),
+                        'L_SEAGER': round(c_good_swings/ns*100 - c_hpt, 1)
+                        }
         
         
-        psrv = p_good_swing_runs + p_bad_swing_runs
-        ptrv = p_good_take_runs + p_bad_take_runs
+            psrv = p_good_swing_runs + p_bad_swing_runs
+            ptrv = p_good_take_runs + p_bad_take_runs
         
-        # hittable pitches taken
-        p_hpt = p_bad_takes/nt*100  
-        # weird selectiveness metric
-        p_sel = p_good_takes/(p_good_takes + p_good_swings)*100
+            # hittable pitches taken
+            p_hpt = p_bad_takes/nt*100  
+            # weird selectiveness metric
+            p_sel = p_good_takes/(p_good_takes + p_good_swings)*100
         
-        p_rows[i] = {
-                    'NAME': player_name[i],
-                    'ID': player_id[i],
-                    'N_SWINGS': ns,
-                    'N_TAKES': nt,
-                    'N_P': n_p,
-                    'G%S': round(p_good_swings/ns*100, 1),
-                    'GS_RV': round(p_good_swing_runs, 1),
-                    'B%S': round(p_bad_swings/ns*100, 1),
-                    'BS_RV': round(p_bad_swing_runs, 1),
-                    'SRV': round(psrv, 1),
-                    'G%T': round(p_good_takes/nt*100, 1),
-                    'GT_RV': round(p_good_take_runs, 1),
-                    'B%T': round(p_hpt, 1),
-                    'BT_RV': round(p_bad_take_runs, 1),
-                    'TRV': round(ptrv, 1),
-                    'TOT_RV': round(psrv + ptrv, 1),
-                    'EXP_RV': round(player_xrv, 1),
-                    'SWTR': round(psrv + ptrv - player_xrv, 1),
-                    'SWTR_Per650': round((psrv + ptrv - player_xrv)/n_p*2542, 1),
-                    'Correct%': round((p_good_swings + p_good_takes)/n_p*100, 1),
-                    'Selective': round(p_sel, 1),
-                    'Agression': round(p_hpt, 1),
-                    'SEAGER': round(p_sel - p_hpt, 1),
-                    'L_SEAGER': round(p_good_swings/ns*100 - p_hpt, 1)
-                    }
+            p_rows[i] = {
+                        'NAME': player_name[i],
+                        'ID': player_id[i],
+                        'N_SWINGS': ns,
+                        'N_TAKES': nt,
+                        'N_P': n_p,
+                        'G%S': round(p_good_swings/ns*100, 1),
+                        'GS_RV': round(p_good_swing_runs, 1),
+                        'B%S': round(p_bad_swings/ns*100, 1),
+                        'BS_RV': round(p_bad_swing_runs, 1),
+                        'SRV': round(psrv, 1),
+                        'G%T': round(p_good_takes/nt*100, 1),
+                        'GT_RV': round(p_good_take_runs, 1),
+                        'B%T': round(p_hpt, 1),
+                        'BT_RV': round(p_bad_take_runs, 1),
+                        'TRV': round(ptrv, 1),
+                        'TOT_RV': round(psrv + ptrv, 1),
+                        'EXP_RV': round(player_xrv, 1),
+                        'SWTR': round(psrv + ptrv - player_xrv, 1),
+                        'SWTR_Per650': round((psrv + ptrv - player_xrv)/n_p*2542, 1),
+                        'Correct%': round((p_good_swings + p_good_takes)/n_p*100, 1),
+                        'Selective': round(p_sel, 1),
+                        'Agression': round(p_hpt, 1),
+                        'SEAGER': round(p_sel - p_hpt, 1),
+                        'L_SEAGER': round(p_good_swings/ns*100 - p_hpt, 1)
+                        }
         
         
     # make dataframes
-    classic_st = pd.DataFrame(c_rows)
-    player_st = pd.DataFrame(p_rows)
+    classic_st = pd.DataFrame([c_rows[i] for i in players], index=players)
+    player_st = pd.DataFrame([p_rows[i] for i in players], index=players)
+    decisions = pd.DataFrame(decisions)
+
+    # everyone else's rows and decisions as saved
+    if batters is not None:
+        old_classic = pd.read_csv(seasons.season_file('classic_st', year), index_col=0)
+        old_player = pd.read_csv(seasons.season_file('player_st', year), index_col=0)
+        old_decisions = pd.read_pickle('decisions_' + year + '.pkl')
+        classic_st = pd.concat([old_classic[~old_classic.ID.isin(batters)], classic_st]).sort_index()
+        player_st = pd.concat([old_player[~old_player.ID.isin(batters)], player_st]).sort_index()
+        decisions = pd.concat([old_decisions[~old_decisions.batter.isin(batters)], decisions],
+                              ignore_index=True)
 
 
     # percentiles
@@ -889,15 +791,102 @@ def swing_take(year, year_pitch_data, league_heatmaps, player_heatmaps):
     # save to csv
     classic_st.to_csv('classic_st_' + year + '.csv')
     player_st.to_csv('player_st_' + year + '.csv')
+    
+    # save per-pitch decision values (used for reliability analysis)
+    decisions.to_pickle('decisions_' + year + '.pkl')
 
-    return classic_st, player_st
+    # the same decisions, seen from the mound
+    pitcher_st = pitcher_leaderboard(decisions)
+    pitcher_st.to_csv('pitcher_st_' + year + '.csv')
 
+    return classic_st, player_st
 
-# run everything
-all_pitch_data, year_pitch_data = get_pitch_data()
-league_heatmaps = get_league_data(all_pitch_data)
-player_heatmaps = get_player_data(all_pitch_data)
-for year in range(2021, 2025):
-    year = str(year)
-    classic_st, player_st = swing_take(year, year_pitch_data, league_heatmaps,
-                                        player_heatmaps)
+# decision run value induced by each pitcher, regrouped from the per-pitch
+# values swing_take already computed. Rates and run values are those of the
+# batters' decisions against the pitcher (classic heatmaps, with the player heatmap
+# versions marked +), so a low SWTR or SEAGER is good for the pitcher and the
+# percentiles are flipped to match: 100 is the pitcher who induced the most
+# chases and called strikes. Only pitches to listed batters are counted
+def pitcher_leaderboard(decisions, min_pitches = 100):
+    
+    d = decisions.copy()
+    d['take'] = ~d.swing
+    d['c_xrv'] = d.classic_rv - d.classic
+    d['p_xrv'] = d.player_rv - d.player
+    
+    for side in ['swing', 'take']:
+        d['good_' + side] = d[side] & d.classic_good
+        d['bad_' + side] = d[side] & ~d.classic_good
+        d['good_' + side + '_rv'] = d.classic_rv.where(d['good_' + side], 0)
+        d['bad_' + side + '_rv'] = d.classic_rv.where(d['bad_' + side], 0)
+    
+    g = d.groupby('pitcher').agg(ns = ('swing', 'sum'),
+                                 nt = ('take', 'sum'),
+                                 good_swings = ('good_swing', 'sum'),
+                                 bad_swings = ('bad_swing', 'sum'),
+                                 good_takes = ('good_take', 'sum'),
+                                 bad_takes = ('bad_take', 'sum'),
+                                 good_swing_runs = ('good_swing_rv', 'sum'),
+                                 bad_swing_runs = ('bad_swing_rv', 'sum'),
+                                 good_take_runs = ('good_take_rv', 'sum'),
+                                 bad_take_runs = ('bad_take_rv', 'sum'),
+                                 classic_xrv = ('c_xrv', 'sum'),
+                                 player_xrv = ('p_xrv', 'sum'))
+    
+    # every listed pitcher needs swings and takes for the rates
+    g = g[(g.ns + g.nt >= min_pitches) & (g.ns > 0) & (g.nt > 0)]
+    
+    srv = g.good_swing_runs + g.bad_swing_runs
+    trv = g.good_take_runs + g.bad_take_runs
+    n_p = g.ns + g.nt
+    
+    # hittable pitches taken
+    hpt = g.bad_takes/g.nt*100
+    # weird selectiveness metric
+    sel = g.good_takes/(g.good_takes + g.good_swings)*100
+    
+    pitcher_st = pd.DataFrame({
+                              'ID': g.index,
+                              'N_SWINGS': g.ns,
+                              'N_TAKES': g.nt,
+                              'N_P': n_p,
+                              'G%S': (g.good_swings/g.ns*100).round(1),
+                              'GS_RV': g.good_swing_runs.round(1),
+                              'B%S': (g.bad_swings/g.ns*100).round(1),
+                              'BS_RV': g.bad_swing_runs.round(1),
+                              'SRV': srv.round(1),
+                              'G%T': (g.good_takes/g.nt*100).round(1),
+                              'GT_RV': g.good_take_runs.round(1),
+                              'B%T': hpt.round(1),
+                              'BT_RV': g.bad_take_runs.round(1),
+                              'TRV': trv.round(1),
+                              'TOT_RV': (srv + trv).round(1),
+                              'EXP_RV': g.classic_xrv.round(1),
+                              'SWTR': (srv + trv - g.classic_xrv).round(1),
+                              'SWTR_Per650': ((srv + trv - g.classic_xrv)/n_p*2542).round(1),
+                              'EXP_RV+': g.player_xrv.round(1),
+                              'SWTR+': (srv + trv - g.player_xrv).round(1),
+                              'SWTR_Per650+': ((srv + trv - g.player_xrv)/n_p*2542).round(1),
+                              'Correct%': ((g.good_swings + g.good_takes)/n_p*100).round(1),
+                              'Selective': sel.round(1),
+                              'Agression': hpt.round(1),
+                              'SEAGER': (sel - hpt).round(1),
+                              'L_SEAGER': (g.good_swings/g.ns*100 - hpt).round(1)
+                              }).reset_index(drop=True)
+    
+    # percentiles, from the pitcher's side
+    def percentile(col):
+        return col.apply(lambda x: round(stats.percentileofscore(col, x)))
+    
+    pitcher_st['SEAGER_Percentile'] = 100 - percentile(pitcher_st['SEAGER'])
+    pitcher_st['Selective_Percentile'] = 100 - percentile(pitcher_st['Selective'])
+    pitcher_st['Agression_Percentile'] = percentile(pitcher_st['Agression'])
+    pitcher_st['SWTR_Percentile'] = 100 - percentile(pitcher_st['SWTR_Per650'])
+    
+    return pitcher_st.sort_values('SWTR_Percentile', ascending=False, kind='stable', ignore_index=True)
+
+
+# run everything, reusing any stage whose inputs have not changed
+if __name__ == '__main__':
+    from pipeline import run_seager
+    run_seager()
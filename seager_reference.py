@@ -0,0 +1,698 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Frozen reference copy of the SEAGER evaluation
+#
+
+# This is seager_mod's get_league_data, get_player_data and swing_take (with
+# the heatmap solver and constants they use) exactly as they stood when the
+# equivalence harness was added, minus the instrumentation hooks. It exists
+# only so that equivalence.py has a fixed set of numbers to check any faster
+# engine against, and must not be optimized or otherwise edited: a change here
+# would silently move the target.
+
+
+import pandas as pd
+import numpy as np
+from scipy import stats
+from tqdm import tqdm
+
+
+###############################################################################
+################################## Constants ##################################
+###############################################################################
+
+# RE24 values of a ball and a strike, indexed [balls][strikes]
+ball_rv = np.array([[0.032, 0.024, 0.021],
+                    [0.088, 0.048, 0.038],
+                    [0.143, 0.064, 0.085],
+                    [0.051, 0.168, 0.234]])
+
+strike_rv = np.array([[-0.037, -0.051, -0.150],
+                      [-0.035, -0.054, -0.171],
+                      [-0.062, -0.069, -0.209],
+                      [-0.117, -0.066, -0.294]])
+
+swing_types = ['hit_into_play', 'foul', 'swinging_strike', 'foul_tip', 
+               'swinging_strike_blocked', 'swinging_pitchout',
+               'foul_pitchout']
+take_types = ['ball', 'called_strike', 'blocked_ball', 'hit_by_pitch', 
+              'pitchout']
+bunt_types = ['missed_bunt', 'foul_bunt', 'foul_tip_bunt']
+
+
+
+###############################################################################
+############################### Heatmap Solver ################################
+###############################################################################
+
+# strike zone dimensions
+zone_width = 30
+zone_height = 35
+
+# zone boundaries
+x0, y0 = 0, 0
+x1, y1 = 5, 6
+x15, y15 = 9, 10
+x2, y2 = 12, 14
+x25, y25 = 15, 18
+x3, y3 = 18, 22
+x35, y35 = 21, 26
+x4, y4 = 25, 30
+x5, y5 = 30, 35
+
+# index (0-12) into the 13 MLBAM zone values for each grid cell: where the
+# initial conditions are set, and which cells are reset after every iteration
+def zone_labels():
+    
+    init = np.full([zone_width, zone_height], -1)
+    reset = np.full([zone_width, zone_height], -1)
+    
+    # Set the initial conditions by zone
+    init[x1:x2, y3:y4] = 0
+    init[x2:x3, y3:y4] = 1
+    init[x3:x4, y3:y4] = 2
+    init[x1:x2, y2:y3] = 3
+    init[x2:x3, y2:y3] = 4
+    init[x3:x4, y2:y3] = 5
+    init[x1:x2, y1:y2] = 6
+    init[x2:x3, y1:y2] = 7
+    init[x3:x4, y1:y2] = 8
+    init[x0:x1, y25:y5] = 9
+    init[x1:x25, y4:y5] = 9
+    init[x25:x5, y4:y5] = 10
+    init[x4:x5, y25:y5] = 10
+    init[x0:x1, y0:y25] = 11
+    init[x1:x25, y0:y1] = 11
+    init[x25:x5, y0:y1] = 12
+    init[x4:x5, y0:y25] = 12
+    
+    # reset boundary conditions
+    reset[x0,y4:y5] = 9
+    reset[x0:x1,y5-1] = 9
+    
+    reset[x4:x5,y5-1] = 10
+    reset[x5-1,y4:y5] = 10
+    
+    reset[x0:x1,y0] = 11
+    reset[x0,y0:y1] = 11
+    
+    reset[x5-1,y0:y1] = 12
+    reset[x4:x5,y0] = 12
+    
+    reset[x15,y35] = 0
+    reset[x25,y35] = 1
+    reset[x35,y35] = 2
+    reset[x15,y25] = 3
+    reset[x25,y25] = 4
+    reset[x35,y25] = 5
+    reset[x15,y15] = 6
+    reset[x25,y15] = 7
+    reset[x35,y15] = 8
+    
+    return init, reset
+
+init_labels, reset_labels = zone_labels()
+
+# heatmaps after 0, 1, ..., n_iter iterations of the np.roll method, for any
+# stack of zone values (shape [..., 13] -> [..., zone_width, zone_height])
+def diffusion_frames(zone_rv, n_iter = 10):
+    
+    zone_rv = np.asarray(zone_rv, dtype=float)
+    
+    # initial conditions
+    rv_map = np.where(init_labels >= 0, zone_rv[..., init_labels], 0)
+    yield rv_map
+    
+    for n in range(n_iter):
+        rv_map = 0.25*(np.roll(rv_map, zone_height - 1, axis = -1) + np.roll(rv_map, 1 - zone_height, axis = -1) + np.roll(rv_map, zone_width - 1, axis = -2) + np.roll(rv_map, 1 - zone_width, axis = -2))
+        rv_map = np.where(reset_labels >= 0, zone_rv[..., reset_labels], rv_map)
+        yield rv_map
+
+# final smoothed heatmaps
+def make_heatmaps(zone_rv, n_iter = 10):
+    
+    for rv_map in diffusion_frames(zone_rv, n_iter):
+        pass
+    
+    return rv_map
+
+
+
+# get league data for all years
+def get_league_data(pitch_data, n_iter = 10, ball_rv = ball_rv, strike_rv = strike_rv):
+    
+    ###########################################################################
+    ############################# Get League Data #############################
+    ###########################################################################
+    
+    print()
+    print('Gathering League Data')
+    print()
+    
+    
+    # initialize data frame and array
+    league_rv = np.empty([4,4,3,13])
+    # indices are:
+        # data type (rv = 0, swing_rate = 1, swing_rv = 2, take_rv = 3)
+        # balls
+        # strikes
+        # MLBAM zone
+    
+    #
+    # evaluate pitches in range of MLBAM zones (2.2 ft wide x 3 ft tall)
+    #            
+    
+    # get swing RV based on contact%, whiff%, and xWOBACON
+    for j in tqdm(range(13)):
+    
+        if j < 9: zone = j + 1
+        else: zone = j + 2
+        
+        for s in range(3):
+            for b in range(4):
+            
+                # data for pitches here in this count
+                pitches = pitch_data[(pitch_data.zone == zone) &
+                                     (pitch_data.balls == b) &
+                                     (pitch_data.strikes == s)]
+                n = len(pitches)
+            
+            
+                # pitches swung at
+                swings = pitches[pitches.description.isin(swing_types)]
+            
+                # number of swings
+                n_swings = len(swings)
+            
+                if n != 0:
+                    swing_rate = n_swings/n
+                else:
+                    swing_rate = 0
+            
+                league_rv[1][b][s][j] = swing_rate
+            
+            
+                # contact & foul ball percentage
+                if n_swings != 0:
+                    contact = sum(swings.description == 'hit_into_play')/n_swings
+                    foul = sum(swings.description == 'foul')/n_swings
+                    whiff = 1 - contact - foul
+                else:
+                    contact, foul, whiff = 0, 0, 0
+                        
+                # observed run value on balls in play
+                if contact != 0:
+                    xwobacon = swings[swings.description == 'hit_into_play']['estimated_woba_using_speedangle'].fillna(0).mean()
+                    bip_rv = 0.6679*xwobacon - 0.192
+                else:
+                    bip_rv  = 0
+                
+                # calculated run value for swings, based on RE24
+                if s == 2:
+                    swing_rv = (contact*bip_rv + whiff*strike_rv[b][s])
+                else:
+                    swing_rv = (contact*bip_rv + (whiff + foul)*strike_rv[b][s])
+            
+                league_rv[2][b][s][j] = swing_rv
+            
+    
+    
+    ###########################################################################
+    ############################## Make Heatmaps ##############################
+    ###########################################################################
+    
+    
+    print()
+    print()
+    print('Making Heatmaps')
+    print()
+    
+    # Initialize arrays
+    league_zonemaps = np.empty([4, 4, 3, zone_width, zone_height])
+    league_heatmaps = np.empty([5, 4, 3, zone_width, zone_height])
+    # ^ extra 5th pouch is for cs%
+    
+    # first get called strike % (more granular than swing rv)
+    for X in tqdm(range(-15, 15)):
+        x = X/13.5
+        xx = (X + 1)/13.5
+        for Z in range(35):
+            z = (Z*32/35 + 14)/12
+            zz = ((Z + 1)*32/35 + 14)/12
+        
+            pitches = pitch_data[(pitch_data.plate_x >= x) &
+                                 (pitch_data.plate_x < xx) &
+                                 (pitch_data.plate_z >= z) &
+                                 (pitch_data.plate_z < zz)]
+        
+            # pitches taken
+            takes = pitches[pitches.description.isin(take_types)]
+        
+            # percentage of taken pitches called stikes
+            n_takes = len(takes)
+            if n_takes != 0:
+                cs = sum(takes.description == 'called_strike')/n_takes
+            else:
+                cs = 0
+        
+            league_heatmaps[4][0][0][X + 15][Z] = cs
+    
+            # different values of TRV for each count
+            for s in range(3):
+                for b in range(4):
+                
+                    # and calculate TRV using RE24
+                    take_rv = cs*strike_rv[b,s] + (1 - cs)*ball_rv[b,s]
+                
+                    # append to array
+                    league_heatmaps[3][b][s][X+15][Z] = take_rv
+    
+    
+    # now merge zone data to make swing heatmaps
+    league_zonemaps[1:3] = next(diffusion_frames(league_rv[1:3]))
+    league_heatmaps[1:3] = make_heatmaps(league_rv[1:3], n_iter)
+                   
+    # calculate expected RV by location and count
+    for s in range(3):
+        for b in range(4):
+            swing_rate = league_heatmaps[1][b][s]
+            take_rate = 1 - swing_rate
+            swing_rv = league_heatmaps[2][b][s]
+            take_rv = league_heatmaps[3][b][s]
+        
+            xrv = swing_rate*swing_rv + take_rate*take_rv
+        
+            league_heatmaps[0][b][s] = xrv
+          
+    np.save('league_heatmaps.npy', np.array(league_heatmaps, dtype=float), allow_pickle=True)
+    np.save('league_zonemaps.npy', np.array(league_zonemaps, dtype=float), allow_pickle=True)
+    
+    return league_heatmaps
+    
+# get player data
+def get_player_data(pitch_data, n_iter = 10, strike_rv = strike_rv):
+    
+    
+    ###########################################################################
+    ############################# Get Player Data #############################
+    ###########################################################################
+    
+    
+    
+    print()
+    print("Gathering Player Data")
+    print()
+        
+    
+    # load player data
+    pdat_2021 = pd.read_csv('players_2021.csv')
+    pdat_2022 = pd.read_csv('players_2022.csv')
+    pdat_2023 = pd.read_csv('players_2023.csv')
+    pdat_2024 = pd.read_csv('players_2024.csv')
+
+    pdat = pd.concat([pdat_2021, pdat_2022, pdat_2023, pdat_2024], ignore_index=True)
+
+    pdat = pd.DataFrame({
+                        'ID': pdat['player_id'], 
+                        'Name': pdat['player_name']
+                        })
+
+    pdat = pdat.drop_duplicates()
+
+    player_id = list(pdat['ID'])
+    
+    # intialise list of dictionaries
+    player_rv = np.empty([len(player_id), 4, 3, 13])
+    
+    # Get batter stats for each zone to be converted to RV
+    for i in tqdm(range(len(player_id))):         
+        # get player rv for each zone
+        for j in range(13):
+    
+            if j < 9: zone = j + 1
+            else: zone = j + 2
+        
+            # data for pitches in this zone to this player
+            pitches = pitch_data[(pitch_data.batter == player_id[i]) & 
+                                   (pitch_data.zone == zone)]
+                    
+        
+            # pitches swung at
+            swings = pitches[pitches.description.isin(swing_types)]
+        
+            # number of swings
+            n_swings = len(swings)
+        
+            # contact & foul ball percentage
+            if n_swings != 0:
+                contact = sum(swings.description == 'hit_into_play')/n_swings
+                foul = sum(swings.description == 'foul')/n_swings
+                whiff = 1 - contact - foul
+            else:
+                contact, foul, whiff = 0, 0, 0
+            
+            # observed run value on balls in play
+            if contact != 0:
+                xwobacon = swings[swings.description == 'hit_into_play']['estimated_woba_using_speedangle'].fillna(0).mean()
+                bip_rv = 0.6679*xwobacon - 0.192
+            else:
+                bip_rv  = 0
+
+
+            # calculated run value for swings, based on RE24
+            for s in range(3):
+                for b in range(4):
+                
+                    # swings
+                    if s == 2:
+                        swing_rv = contact*bip_rv + whiff*strike_rv[b][s]
+                    else:
+                        swing_rv = contact*bip_rv + (whiff + foul)*strike_rv[b][s]
+                
+                    player_rv[i][b][s][j] = swing_rv
+    
+    
+    
+    ###########################################################################
+    ############################## Make Heatmaps ##############################
+    ###########################################################################
+    
+    
+    
+    print()
+    print("Making Heatmaps")
+    print()
+    
+    # smooth every player and count at once; only the final iteration is
+    # stored, the zone values are kept so the frames can be regenerated
+    player_heatmaps = make_heatmaps(player_rv, n_iter)
+    
+    np.save('player_heatmaps.npy', np.array(player_heatmaps, dtype=float), allow_pickle=True)
+    np.save('player_zone_rv.npy', np.array(player_rv, dtype=float), allow_pickle=True)
+    
+    return player_heatmaps
+    
+# evaluate swing/take decisions
+def swing_take(year, year_pitch_data, league_heatmaps, player_heatmaps, bias = 0):
+    
+    
+    ###########################################################################
+    ######################## Swing Decision Evaluation ########################
+    ###########################################################################
+    
+    
+    
+    print()
+    print('Evaluating Swing Decisons for', year)
+    print()
+    
+    # select proper year
+    pitch_data = year_pitch_data[int(year) - 2021]
+    pdat = pd.read_csv('players_' + year + '.csv')
+    player_name = pdat.player_name
+    player_id = pdat.player_id
+
+
+
+    # initialize lists
+    c_rows = [None] * len(player_id)
+    p_rows = [None] * len(player_id)
+    decisions = []
+
+    # loop over all players
+    for i in tqdm(range(len(player_id))): 
+            
+        # initialize values
+        classic_xrv = 0
+    
+        c_good_swings = 0
+        c_good_swing_runs = 0
+        c_bad_swings = 0
+        c_bad_swing_runs = 0
+    
+        c_good_takes = 0
+        c_good_take_runs = 0
+        c_bad_takes = 0
+        c_bad_take_runs = 0
+    
+    
+        player_xrv = 0
+    
+        p_good_swings = 0
+        p_good_swing_runs = 0
+        p_bad_swings = 0
+        p_bad_swing_runs = 0
+    
+        p_good_takes = 0
+        p_good_take_runs = 0
+        p_bad_takes = 0
+        p_bad_take_runs = 0
+    
+    
+        ns, nt = 0, 0
+    
+    
+        xlist = []
+        zlist = []
+        for X in range(-15, 15):
+            xlist.append(X/13.5 + 1/27)
+        for Z in range(35):
+            zlist.append((Z*32/35 + 14)/12 + 1/27)
+    
+        # data for pitches to this player
+        pitches = pitch_data[pitch_data.batter == player_id[i]]
+    
+        for index, row in pitches.iterrows():
+        
+            # determine location
+            x = row.plate_x
+            z = row.plate_z
+        
+            if pd.isna(x):
+                continue
+        
+            if row.description in bunt_types:
+                continue
+        
+            # round appropriately to proper zone
+            x = min(xlist, key=lambda d:abs(d-x))
+            z = min(zlist, key=lambda d:abs(d-z))
+        
+            # get proper index for matrix retrieval
+            ix = xlist.index(x)
+            iz = zlist.index(z)
+        
+            # determine count
+            b = row.balls
+            s = row.strikes
+            if b > 3: b = 3
+            if s > 2: s = 2
+        
+            #
+            # fetch data from league and player heatmaps
+            #
+    
+            # classic actual run value for swings and takes
+            classic_srv = league_heatmaps[2][b][s][ix][iz]
+            trv = league_heatmaps[3][b][s][ix][iz]
+        
+            # player actual run value for swings (trv is the same)
+            player_srv = player_heatmaps[i][b][s][ix][iz]
+        
+            # classic expected run value (using league stats)
+            pitch_classic_xrv = league_heatmaps[0][b][s][ix][iz]
+            classic_xrv = classic_xrv + pitch_classic_xrv
+        
+            # player expected run value (using player stats)
+            league_swing = league_heatmaps[1][b][s][ix][iz]
+            pitch_player_xrv = league_swing*player_srv + (1 - league_swing)*trv
+            player_xrv = player_xrv + pitch_player_xrv
+        
+        
+            #
+            # evaluate swing decision
+            #
+        
+            # if the player swung
+            if row.description in swing_types:
+            
+                ns = ns + 1
+            
+                # classic
+                if classic_srv > trv + bias:
+                    c_good_swings = c_good_swings + 1
+                    c_good_swing_runs = c_good_swing_runs + classic_srv
+                else:
+                    c_bad_swings = c_bad_swings + 1
+                    c_bad_swing_runs = c_bad_swing_runs + classic_srv
+                
+                
+                # player
+                if player_srv > trv + bias:
+                    p_good_swings = p_good_swings + 1
+                    p_good_swing_runs = p_good_swing_runs + player_srv
+                else:
+                    p_bad_swings = p_bad_swings + 1
+                    p_bad_swing_runs = p_bad_swing_runs + player_srv
+            
+                # decision values for this pitch
+                decisions.append({'batter': player_id[i],
+                                  'game_date': row.game_date,
+                                  'at_bat_number': row.at_bat_number,
+                                  'pitch_number': row.pitch_number,
+                                  'balls': b,
+                                  'strikes': s,
+                                  'plate_x': row.plate_x,
+                                  'plate_z': row.plate_z,
+                                  'swing': True,
+                                  'classic': classic_srv - pitch_classic_xrv,
+                                  'player': player_srv - pitch_player_xrv,
+                                  'classic_good': classic_srv > trv + bias,
+                                  'player_good': player_srv > trv + bias})
+        
+        
+            # if the player did not swing
+            if row.description in take_types:
+
+                nt = nt + 1
+            
+                if trv > classic_srv + bias:
+                    c_good_takes = c_good_takes + 1
+                    c_good_take_runs = c_good_take_runs + trv
+                else:
+                    c_bad_takes = c_bad_takes + 1
+                    c_bad_take_runs = c_bad_take_runs + trv
+                
+                
+                if trv > player_srv + bias:
+                    p_good_takes = p_good_takes + 1
+                    p_good_take_runs = p_good_take_runs + trv
+                else:
+                    p_bad_takes = p_bad_takes + 1
+                    p_bad_take_runs = p_bad_take_runs + trv
+            
+                # decision values for this pitch
+                decisions.append({'batter': player_id[i],
+                                  'game_date': row.game_date,
+                                  'at_bat_number': row.at_bat_number,
+                                  'pitch_number': row.pitch_number,
+                                  'balls': b,
+                                  'strikes': s,
+                                  'plate_x': row.plate_x,
+                                  'plate_z': row.plate_z,
+                                  'swing': False,
+                                  'classic': trv - pitch_classic_xrv,
+                                  'player': trv - pitch_player_xrv,
+                                  'classic_good': trv > classic_srv + bias,
+                                  'player_good': trv > player_srv + bias})
+                
+                
+                
+        csrv = c_good_swing_runs + c_bad_swing_runs
+        ctrv = c_good_take_runs + c_bad_take_runs
+        n_p = round(ns + nt)
+    
+        # hittable pitches taken
+        c_hpt = c_bad_takes/nt*100  
+        # weird selectiveness metric
+        c_sel = c_good_takes/(c_good_takes + c_good_swings)*100
+    
+        c_rows[i] = {
+                    'NAME': player_name[i],
+                    'ID': player_id[i],
+                    'N_SWINGS': ns,
+                    'N_TAKES': nt,
+                    'N_P': n_p,
+                    'G%S': round(c_good_swings/ns*100, 1),
+                    'GS_RV': round(c_good_swing_runs, 1),
+                    'B%S': round(c_bad_swings/ns*100, 1),
+                    'BS_RV': round(c_bad_swing_runs, 1),
+                    'SRV': round(csrv, 1),
+                    'G%T': round(c_good_takes/nt*100, 1),
+                    'GT_RV': round(c_good_take_runs, 1),
+                    'B%T': round(c_hpt, 1),
+                    'BT_RV': round(c_bad_take_runs, 1),
+                    'TRV': round(ctrv, 1),
+                    'TOT_RV': round(csrv + ctrv, 1),
+                    'EXP_RV': round(classic_xrv, 1),
+                    'SWTR': round(csrv + ctrv - classic_xrv, 1),
+                    'SWTR_Per650': round((csrv + ctrv - classic_xrv)/n_p*2542, 1),
+                    'EXP_RV+': round(player_xrv, 1),
+                    'SWTR+': round(csrv + ctrv - player_xrv, 1),
+                    'SWTR_Per650+': round((csrv + ctrv - player_xrv)/n_p*2542, 1),
+                    'Correct%': round((c_good_swings + c_good_takes)/n_p*100, 1),
+                    'Selective': round(c_sel, 1),
+                    'Agression': round(c_hpt, 1),
+                    'SEAGER': round(c_sel - c_hpt, 1),
+                    'L_SEAGER': round(c_good_swings/ns*100 - c_hpt, 1)
+                    }
+    
+    
+        psrv = p_good_swing_runs + p_bad_swing_runs
+        ptrv = p_good_take_runs + p_bad_take_runs
+    
+        # hittable pitches taken
+        p_hpt = p_bad_takes/nt*100  
+        # weird selectiveness metric
+        p_sel = p_good_takes/(p_good_takes + p_good_swings)*100
+    
+        p_rows[i] = {
+                    'NAME': player_name[i],
+                    'ID': player_id[i],
+                    'N_SWINGS': ns,
+                    'N_TAKES': nt,
+                    'N_P': n_p,
+                    'G%S': round(p_good_swings/ns*100, 1),
+                    'GS_RV': round(p_good_swing_runs, 1),
+                    'B%S': round(p_bad_swings/ns*100, 1),
+                    'BS_RV': round(p_bad_swing_runs, 1),
+                    'SRV': round(psrv, 1),
+                    'G%T': round(p_good_takes/nt*100, 1),
+                    'GT_RV': round(p_good_take_runs, 1),
+                    'B%T': round(p_hpt, 1),
+                    'BT_RV': round(p_bad_take_runs, 1),
+                    'TRV': round(ptrv, 1),
+                    'TOT_RV': round(psrv + ptrv, 1),
+                    'EXP_RV': round(player_xrv, 1),
+                    'SWTR': round(psrv + ptrv - player_xrv, 1),
+                    'SWTR_Per650': round((psrv + ptrv - player_xrv)/n_p*2542, 1),
+                    'Correct%': round((p_good_swings + p_good_takes)/n_p*100, 1),
+                    'Selective': round(p_sel, 1),
+                    'Agression': round(p_hpt, 1),
+                    'SEAGER': round(p_sel - p_hpt, 1),
+                    'L_SEAGER': round(p_good_swings/ns*100 - p_hpt, 1)
+                    }
+    
+    
+    # make dataframes
+    classic_st = pd.DataFrame(c_rows)
+    player_st = pd.DataFrame(p_rows)
+
+
+    # percentiles
+    def percentile(col, x):
+        return round(stats.percentileofscore(col, x))
+
+    classic_st['SEAGER_Percentile'] = classic_st.apply(lambda x: percentile(classic_st['SEAGER'], x.SEAGER), axis = 1)
+    classic_st['Selective_Percentile'] = classic_st.apply(lambda x: percentile(classic_st['Selective'], x.Selective), axis = 1)
+    classic_st['Agression_Percentile'] = classic_st.apply(lambda x: percentile(classic_st['Agression'], x.Agression), axis = 1)
+    classic_st['SWTR_Percentile'] = classic_st.apply(lambda x: percentile(classic_st['SWTR_Per650'], x.SWTR_Per650), axis = 1)
+
+    player_st['SEAGER_Percentile'] = player_st.apply(lambda x: percentile(player_st['SEAGER'], x.SEAGER), axis = 1)
+    player_st['Selective_Percentile'] = player_st.apply(lambda x: percentile(player_st['Selective'], x.Selective), axis = 1)
+    player_st['Agression_Percentile'] = player_st.apply(lambda x: percentile(player_st['Agression'], x.Agression), axis = 1)
+    player_st['SWTR_Percentile'] = player_st.apply(lambda x: percentile(player_st['SWTR_Per650'], x.SWTR_Per650), axis = 1)
+
+    classic_st['Agression_Percentile'] = 100 - classic_st['Agression_Percentile']
+    player_st['Agression_Percentile'] = 100 - player_st['Agression_Percentile']
+
+
+    # save to csv
+    classic_st.to_csv('classic_st_' + year + '.csv')
+    player_st.to_csv('player_st_' + year + '.csv')
+    
+    # save per-pitch decision values (used for reliability analysis)
+    pd.DataFrame(decisions).to_pickle('decisions_' + year + '.pkl')
+
+    return classic_st, player_st
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Local HTTP query service
+#
+
+# player_analysis only works through input() prompts, one analyst at a time.
+# This script is a long-running server on localhost which loads the
+# leaderboards once and memory-maps the heatmaps, then answers requests from
+# any number of clients (notebooks, curl, scripts) in parallel threads. All
+# shared state is read-only except the per-season decision tables, which are
+# loaded on first use, and the image cache. Images are drawn with one reused
+# figure from batch_render under a lock and kept in the render cache, so a
+# repeated image request is a file read.
+#
+# GET endpoints (JSON unless noted):
+#   /players?q=<name>&k=<n>                       fuzzy name search
+#   /percentiles/<pid>                            what display() prints
+#   /heatmap/league/<count>/<action>              30x35 values
+#   /heatmap/player/<pid>/<count>/<action>        (add ?format=npy for .npy bytes,
+#                                                  ?season=<year> for a season map)
+#   /decisions/<pid>/<year>                       per-pitch decision values
+#   /image/league/<count>/<action>.png            rendered heatmap (PNG)
+#   /image/player/<pid>/<count>/<action>.png      (also takes ?season=<year>)
+#   /totals/<pid>?game=<game_pk>                  live scoring totals
+#   /similar/<pid>?k=<n>                          batters with similar heatmaps
+#
+# POST /score takes one pitch or a list of pitches as JSON (batter, balls,
+# strikes, plate_x, plate_z, description, optionally game_pk) and returns
+# their decision values from live_scoring.LiveScorer, against the current
+# season's player maps where there are any (as live_scoring's replay does).
+
+
+import io
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import numpy as np
+import pandas as pd
+import batch_render
+import seasons
+from batch_render import heatmap_values, render_heatmap
+from heatmap_index import load_index
+from live_scoring import LiveScorer
+from render_cache import RenderCache, heatmap_key
+from seager_data import load_data
+from similarity import build_index
+
+
+###############################################################################
+################################ Shared State #################################
+###############################################################################
+
+
+class ServiceState:
+
+    def __init__(self, path = '.', season = None):
+
+        self.path = path
+        self.season = seasons.active[-1] if season is None else str(season)
+        self.data = load_data(path)
+        self.index = self.data.name_index
+        self.rows = load_index(os.path.join(path, 'player_heatmaps.npy'))
+
+        # memory-mapped heatmaps and one reusable figure
+        batch_render.init_worker(os.path.join(path, 'league_heatmaps.npy'),
+                                 os.path.join(path, 'player_heatmaps.npy'),
+                                 os.path.join(path, 'player_zone_rv.npy'))
+        self.render_lock = threading.Lock()
+        self.cache = RenderCache(os.path.join(path, 'render_cache'))
+
+        # per-pitch decisions by season, each grouped by batter
+        self.decisions = {}
+        self.decisions_lock = threading.Lock()
+
+        # similarity index, built on first use
+        self.similarity = None
+        self.similarity_lock = threading.Lock()
+
+        # live pitch scoring, with its own running totals
+        self.scorer = LiveScorer(os.path.join(path, 'league_heatmaps.npy'),
+                                 os.path.join(path, 'player_heatmaps.npy'), self.season)
+
+    def percentiles(self, pid):
+
+        row = self.index.lookup(pid)
+        classic, player = self.data.percentiles(pid)
+
+        return {'ID': int(pid),
+                'name': self.index.names[row],
+                'classic': classic.to_dict(orient='records'),
+                'player': player.to_dict(orient='records')}
+
+    def heatmap(self, kind, pid, count, action, season = None):
+
+        if count not in batch_render.counts:
+            raise ValueError('Please enter the count in b-s format; e.g. 3-2')
+
+        row = None if kind == 'league' else self.rows.row(pid, season)
+        pvals, clim, label, ticks = heatmap_values(kind, row, count, action)
+
+        return np.asarray(pvals)
+
+    def image(self, kind, pid, count, action, season = None):
+
+        pvals = self.heatmap(kind, pid, count, action, season)
+        key = heatmap_key(kind, None if pid is None else int(pid), count, action, pvals)
+
+        with self.render_lock:
+            filename = self.cache.get(key)
+            if filename is None:
+                row = None if kind == 'league' else self.rows.row(pid, season)
+                name = None if row is None else self.index.names[self.index.lookup(pid)]
+                render_heatmap(('heatmap', kind, row, name, count, action, self.cache.file(key)))
+                filename = self.cache.add(key)
+
+            with open(filename, 'rb') as f:
+                return f.read()
+
+    def season_decisions(self, year):
+
+        with self.decisions_lock:
+            if year not in self.decisions:
+                df = pd.read_pickle(os.path.join(self.path, 'decisions_' + str(year) + '.pkl'))
+                self.decisions[year] = {pid: pitches for pid, pitches in df.groupby('batter')}
+
+        return self.decisions[year]
+
+    def similar(self, pid, k):
+
+        with self.similarity_lock:
+            if self.similarity is None:
+                self.similarity = build_index(self.path)
+
+        self.index.lookup(pid)
+
+        return self.similarity.neighbours(pid, k).to_dict(orient='records')
+
+    def player_decisions(self, pid, year):
+
+        self.index.lookup(pid)
+        pitches = self.season_decisions(year).get(int(pid))
+        if pitches is None:
+            return '[]'
+
+        return pitches.to_json(orient='records', date_format='iso')
+
+
+###############################################################################
+################################### Handler ###################################
+###############################################################################
+
+
+state = None
+
+class Handler(BaseHTTPRequestHandler):
+
+    def send(self, code, body, content_type = 'application/json'):
+
+        if isinstance(body, str):
+            body = body.encode()
+
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, obj, code = 200):
+        self.send(code, json.dumps(obj))
+
+    def do_GET(self):
+
+        url = urlparse(self.path)
+        parts = [p for p in url.path.split('/') if p]
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+        try:
+            self.route(parts, query)
+        except KeyError:
+            self.send_json({'error': 'unknown player or season'}, 404)
+        except FileNotFoundError:
+            self.send_json({'error': 'no data on disk for that request'}, 404)
+        except ValueError as e:
+            self.send_json({'error': str(e)}, 400)
+
+    def route(self, parts, query):
+
+        if parts == ['players']:
+            matches = state.index.search(query.get('q', ''), k=int(query.get('k', 5)))
+            return self.send_json([m._asdict() for m in matches])
+
+        if len(parts) == 2 and parts[0] == 'percentiles':
+            return self.send_json(state.percentiles(parts[1]))
+
+        if len(parts) == 2 and parts[0] == 'totals':
+            game = query.get('game')
+            return self.send_json(state.scorer.totals(parts[1], None if game is None else int(game)))
+
+        if len(parts) == 2 and parts[0] == 'similar':
+            return self.send_json(state.similar(parts[1], int(query.get('k', 10))))
+
+        if len(parts) == 3 and parts[0] == 'decisions':
+            return self.send(200, state.player_decisions(parts[1], int(parts[2])))
+
+        if parts[:1] in [['heatmap'], ['image']] and len(parts) in [4, 5]:
+
+            if parts[1] == 'league' and len(parts) == 4:
+                kind, pid, count, action = 'league', None, parts[2], parts[3]
+            elif parts[1] == 'player' and len(parts) == 5:
+                kind, pid, count, action = 'player', parts[2], parts[3], parts[4]
+            else:
+                raise ValueError('heatmaps are /league/<count>/<action> or /player/<pid>/<count>/<action>')
+
+            if parts[0] == 'image':
+                return self.send(200, state.image(kind, pid, count, action.replace('.png', '').upper(),
+                                                  query.get('season')), 'image/png')
+
+            pvals = state.heatmap(kind, pid, count, action.upper(), query.get('season'))
+            if query.get('format') == 'npy':
+                buf = io.BytesIO()
+                np.save(buf, pvals)
+                return self.send(200, buf.getvalue(), 'application/octet-stream')
+
+            return self.send_json({'count': count, 'action': action.upper(), 'values': pvals.tolist()})
+
+        self.send_json({'error': 'unknown endpoint'}, 404)
+
+    def do_POST(self):
+
+        if urlparse(self.path).path.strip('/') != 'score':
+            return self.send_json({'error': 'unknown endpoint'}, 404)
+
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            if isinstance(body, dict):
+                return self.send_json(state.scorer.score(**body))
+
+            scored = state.scorer.score_batch(pd.DataFrame(body))
+            return self.send(200, scored.to_json(orient='records'))
+        except KeyError:
+            self.send_json({'error': 'unknown player'}, 404)
+        except (TypeError, ValueError, AttributeError) as e:
+            self.send_json({'error': str(e)}, 400)
+
+    # one line per request is plenty
+    def log_message(self, format, *args):
+        print(self.address_string(), format % args)
+
+
+def serve(port = 8050, path = '.', season = None):
+
+    global state
+    state = ServiceState(path, season)
+
+    # localhost only
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    print('Serving SEAGER queries on http://127.0.0.1:' + str(port))
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+
+    serve()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Season-specific league heatmaps
+#
+
+# get_league_data is run once on all_pitch_data, so a 2021 decision is judged
+# against a league baseline that includes 2024 pitches. build() makes one
+# league_heatmaps array per season instead, each from that season's pitches
+# alone or, with window > 1, from a rolling window of that season and the
+# window - 1 before it. Running get_league_data once per season would repeat
+# its 156 zone masks and 1050 grid masks every time. Here one pass over the
+# pitches counts everything by season with np.bincount (the same counts as
+# the conditioned heatmaps, with the season as the only condition). Each
+# window's counts are a sum of its seasons' counts, and every season's swing
+# maps are smoothed together in one call to make_heatmaps, so building all
+# the seasons takes about as long as a single build.
+#
+# The arrays have the same layout and values as get_league_data's (including
+# the called strike grid in [4][0][0]). They are saved as
+# league_heatmaps_<year>.npy and league_zonemaps_<year>.npy, so swing_take can
+# score each season against its own baseline.
+
+
+import numpy as np
+import seasons
+from conditioned import zone_counts, zone_values
+from instrument import step
+from seager_mod import ball_rv, strike_rv, make_heatmaps, diffusion_frames, zone_width, zone_height
+
+
+###############################################################################
+################################ Season Counts ################################
+###############################################################################
+
+
+# raw zone and grid counts for each season in the pitch data, in one pass
+def season_counts(pitch_data):
+
+    year = pitch_data.game_year.astype(int).to_numpy()
+    years = [str(y) for y in np.unique(year)]
+    combo = np.searchsorted(np.unique(year), year)
+
+    return years, zone_counts(pitch_data, combo, len(years))
+
+# seasons making up each season's baseline: itself and the window - 1 before
+# it, as far as they are in the pitch data
+def window_years(years, window = 1):
+
+    years = sorted(str(y) for y in years)
+
+    return {year: [y for y in years if int(year) - window < int(y) <= int(year)] for year in years}
+
+
+###############################################################################
+################################### Builder ###################################
+###############################################################################
+
+
+# league heatmaps and zone maps ([season][kind][balls][strikes][x][z]) from
+# any stack of counts, every season's swing maps smoothed at once
+def league_maps(counts, n_iter = 10, ball_rv = ball_rv, strike_rv = strike_rv):
+
+    zone_rv, cs = zone_values(counts, strike_rv)
+    n = len(cs)
+
+    with step('season league diffusion', rows = zone_rv.size//13):
+        league_zonemaps = np.empty([n, 4, 4, 3, zone_width, zone_height])
+        league_heatmaps = np.empty([n, 5, 4, 3, zone_width, zone_height])
+
+        league_zonemaps[:, 1:3] = next(diffusion_frames(zone_rv))
+        league_heatmaps[:, 1:3] = make_heatmaps(zone_rv, n_iter)
+        league_heatmaps[:, 4, 0, 0] = cs
+        league_heatmaps[:, 3] = (cs[:, None, None]*strike_rv[None, :, :, None, None] +
+                                 (1 - cs[:, None, None])*ball_rv[None, :, :, None, None])
+        league_heatmaps[:, 0] = (league_heatmaps[:, 1]*league_heatmaps[:, 2] +
+                                 (1 - league_heatmaps[:, 1])*league_heatmaps[:, 3])
+
+    return league_heatmaps, league_zonemaps
+
+# league heatmaps and zone maps for every season in years (default: every
+# season in the pitch data), from counts pooled over each season's window
+def build(pitch_data, years = None, window = 1, n_iter = 10, ball_rv = ball_rv, strike_rv = strike_rv):
+
+    with step('season league counts', rows = len(pitch_data)):
+        data_years, counts = season_counts(pitch_data)
+
+    if years is None:
+        years = data_years
+    years = [str(y) for y in years]
+
+    missing = [y for y in years if y not in data_years]
+    if missing:
+        raise KeyError('no pitch data for season ' + ', '.join(missing))
+
+    # [season][season in its window]
+    windows = window_years(data_years, window)
+    weights = np.array([[y in windows[year] for y in data_years] for year in years], dtype=float)
+    counts = {name: np.tensordot(weights, c, axes=1) for name, c in counts.items()}
+
+    league_heatmaps, league_zonemaps = league_maps(counts, n_iter, ball_rv, strike_rv)
+
+    heatmaps = dict(zip(years, league_heatmaps))
+    zonemaps = dict(zip(years, league_zonemaps))
+
+    return heatmaps, zonemaps
+
+
+###############################################################################
+################################### Storage ###################################
+###############################################################################
+
+
+def save(heatmaps, zonemaps = None, path = '.'):
+
+    for year in heatmaps:
+        np.save(seasons.season_file('league_heatmaps', year, '.npy', path),
+                np.array(heatmaps[year], dtype=float), allow_pickle=True)
+        if zonemaps is not None:
+            np.save(seasons.season_file('league_zonemaps', year, '.npy', path),
+                    np.array(zonemaps[year], dtype=float), allow_pickle=True)
+
+def load(year, path = '.', mmap_mode = None):
+    return np.load(seasons.season_file('league_heatmaps', year, '.npy', path), mmap_mode=mmap_mode)
+
+# season league heatmaps, saved as they are built
+def get_season_league_data(pitch_data, years = None, window = 1, n_iter = 10,
+                           ball_rv = ball_rv, strike_rv = strike_rv):
+
+    heatmaps, zonemaps = build(pitch_data, years, window, n_iter, ball_rv, strike_rv)
+    save(heatmaps, zonemaps)
+
+    return heatmaps
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Season registry
+#
+
+# Season date ranges and the 2021-2024 file names used to be written out in
+# get_pitch_data, swing_take, random_pitch, pitch_by_pitch, display and the
+# live scorer. They now come from seasons.json: "dates" holds the regular
+# season start and end for every season we know about, and "active" lists the
+# seasons the pipeline fetches, evaluates and writes leaderboards for. Adding
+# a season means adding its dates (and its players_<year>.csv) and listing it
+# as active. Each season's Statcast data is stored in its own partition file,
+# so seasons are fetched, loaded and evaluated independently of each other.
+
+
+import json
+import os
+import pandas as pd
+
+
+config_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'seasons.json')
+
+# per-season Statcast partitions
+partition_dir = 'statcast'
+
+
+def load_config(filename = config_file):
+
+    with open(filename) as f:
+        config = json.load(f)
+
+    dates = {str(year): tuple(d) for year, d in config['dates'].items()}
+    active = [str(year) for year in config['active']]
+
+    unknown = [year for year in active if year not in dates]
+    if unknown:
+        raise ValueError('no dates in ' + filename + ' for season ' + ', '.join(unknown))
+
+    return dates, active
+
+season_dates, active = load_config()
+
+
+# regular season start and end dates
+def dates(year):
+
+    if str(year) not in season_dates:
+        raise KeyError('Season ' + str(year) + ' is not in the season registry')
+
+    return season_dates[str(year)]
+
+# a season's file for one kind of output, e.g. ('classic_st', 2024, '.csv')
+def season_file(kind, year, ext = '.csv', path = '.'):
+    return os.path.join(path, kind + '_' + str(year) + ext)
+
+def partition_file(year, path = '.'):
+    return os.path.join(path, partition_dir, 'statcast_' + str(year) + '.pkl')
+
+# one season's pitches from a list of seasons (as from get_pitch_data) or a
+# dict keyed by season
+def season_pitches(year_pitch_data, year):
+
+    if isinstance(year_pitch_data, dict):
+        return year_pitch_data[str(year)]
+
+    for pitches in year_pitch_data:
+        if len(pitches) and int(pitches.game_year.iloc[0]) == int(year):
+            return pitches
+
+    raise KeyError('no pitch data for season ' + str(year))
+
+# one season's pitches, downloaded once and kept in its partition
+def fetch_season(year, path = '.'):
+
+    import pybaseball
+    pybaseball.cache.enable()
+
+    filename = partition_file(year, path)
+    if os.path.exists(filename):
+        return pd.read_pickle(filename)
+
+    pitches = pybaseball.statcast(*dates(year))
+
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    pitches.to_pickle(filename)
+
+    return pitches
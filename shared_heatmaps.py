@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Shared-memory heatmaps for every process on one host
+#
+
+# player_analysis, the query service, the live scorer and the batch render
+# workers each open their own copy of the heatmap arrays. Running this script
+# on the analysis box publishes league_heatmaps, player_heatmaps and
+# player_zone_rv once into named shared memory. It writes a small manifest
+# (shared_heatmaps.json, next to the .npy files) with each array's segment
+# name, shape, dtype and the size and modification time of the file it came
+# from, and stays up until interrupted, when it removes the segments and the
+# manifest. load() is what the readers call: while the manifest is current it
+# returns a read-only array on the shared segment, which takes milliseconds
+# and copies nothing. Otherwise (no publisher running, or the .npy file has
+# been rebuilt since it was published) it memory-maps the file as before.
+
+
+import hashlib
+import json
+import os
+import time
+from multiprocessing import resource_tracker, shared_memory
+import numpy as np
+
+
+default_arrays = ('league_heatmaps.npy', 'player_heatmaps.npy', 'player_zone_rv.npy')
+
+manifest_name = 'shared_heatmaps.json'
+
+# segments attached by this process (by name and file stamp), kept open
+# while their arrays are in use
+attached = {}
+
+
+def manifest_file(path = '.'):
+    return os.path.join(path, manifest_name)
+
+# segment name, unique to the data directory so two checkouts do not collide
+def segment_name(filename):
+
+    filename = os.path.abspath(filename)
+    tag = hashlib.sha1(os.path.dirname(filename).encode()).hexdigest()[:8]
+
+    return 'seager_' + tag + '_' + os.path.splitext(os.path.basename(filename))[0]
+
+def file_stamp(filename):
+
+    st = os.stat(filename)
+
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+
+###############################################################################
+################################## Publisher ##################################
+###############################################################################
+
+
+# copy the arrays into shared memory and write the manifest; returns the
+# segments, which stay on the host until unpublish()
+def publish(path = '.', arrays = default_arrays):
+
+    segments, entries = [], {}
+    try:
+        for name in arrays:
+            filename = os.path.join(path, name)
+            stamp = file_stamp(filename)
+            x = np.load(filename, mmap_mode='r')
+
+            # a segment left behind by a publisher that did not shut down
+            try:
+                stale = shared_memory.SharedMemory(segment_name(filename))
+                stale.close()
+                stale.unlink()
+            except FileNotFoundError:
+                pass
+
+            shm = shared_memory.SharedMemory(segment_name(filename), create=True, size=max(x.nbytes, 1))
+            segments.append(shm)
+            np.ndarray(x.shape, x.dtype, buffer=shm.buf)[...] = x
+
+            entries[name] = dict({'segment': shm.name, 'shape': list(x.shape), 'dtype': x.dtype.str}, **stamp)
+    except BaseException:
+        unpublish(segments, path)
+        raise
+
+    # written last, so readers never see a manifest for a partial copy
+    tmp = manifest_file(path) + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({'pid': os.getpid(), 'arrays': entries}, f, indent=1)
+    os.replace(tmp, manifest_file(path))
+
+    return segments
+
+def unpublish(segments, path = '.'):
+
+    if os.path.exists(manifest_file(path)):
+        with open(manifest_file(path)) as f:
+            if json.load(f).get('pid') == os.getpid():
+                os.remove(manifest_file(path))
+
+    for shm in segments:
+        shm.close()
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+
+# publish and hold the segments until interrupted
+def serve(path = '.', arrays = default_arrays):
+
+    segments = publish(path, arrays)
+    total = sum(shm.size for shm in segments)
+    print('Published', len(segments), 'arrays (' + str(round(total/2**20, 1)) + ' MB) from',
+          os.path.abspath(path) + '; Ctrl-C to stop')
+
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        unpublish(segments, path)
+
+
+###############################################################################
+################################### Readers ###################################
+###############################################################################
+
+
+def attach_segment(name, publisher = False):
+
+    shm = shared_memory.SharedMemory(name)
+
+    # attaching must not hand the segment to this process's resource
+    # tracker, which would remove it from the host when the process exits
+    # (the publisher's own registration is dropped by unpublish)
+    if not publisher:
+        resource_tracker.unregister(shm._name, 'shared_memory')
+
+    return shm
+
+# the array in filename: a zero-copy view of the published segment if there
+# is a current one, otherwise the file itself
+def load(filename, mmap_mode = 'r'):
+
+    path, name = os.path.split(filename)
+    entry, publisher = None, False
+    if os.path.exists(manifest_file(path or '.')):
+        try:
+            with open(manifest_file(path or '.')) as f:
+                manifest = json.load(f)
+            entry = manifest['arrays'].get(name)
+            publisher = manifest['pid'] == os.getpid()
+        except (OSError, ValueError, KeyError):
+            entry = None
+
+    if entry is not None and os.path.exists(filename) and \
+       file_stamp(filename) == {'size': entry['size'], 'mtime_ns': entry['mtime_ns']}:
+        try:
+            key = (entry['segment'], entry['mtime_ns'])
+            shm = attached.get(key)
+            if shm is None:
+                shm = attached[key] = attach_segment(entry['segment'], publisher)
+            x = np.ndarray(tuple(entry['shape']), np.dtype(entry['dtype']), buffer=shm.buf)
+            x.flags.writeable = False
+            return x
+        except FileNotFoundError:
+            pass
+
+    return np.load(filename, mmap_mode=mmap_mode)
+
+
+if __name__ == '__main__':
+
+    serve()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Shrunk player zone values
+#
+
+# get_player_data turns each batter's raw contact, foul and xwOBAcon rates in
+# each zone into a swing run value. A batter with three swings in zone 14 gets
+# a very noisy value there, and one with no swings gets a value of zero, which
+# is part of why the player metric needs 1000+ pitches to settle down. Here
+# every (batter, zone) rate is shrunk toward the league rate for that zone and
+# count instead:
+#
+#     rate = (player successes + k*league rate)/(player trials + k)
+#
+# so a batter's own data takes over as their sample grows. k_swings is the
+# prior weight (in swings) on contact and foul rates, and k_contact the prior
+# weight (in balls in play) on xwOBAcon. Both default to 0, as in the
+# pipeline, which gives exactly the values of get_player_data. All batters
+# are done at once from grouped counts, and the pipeline smooths the result
+# like any other zone values.
+# With season_maps, each batter also gets a row per season built from that
+# season's pitches alone (shrunk toward the league over all seasons), listed
+# in the heatmap index next to their all-season row.
+
+
+import numpy as np
+import pandas as pd
+from instrument import step
+from heatmap_index import index_file
+from seager_mod import strike_rv, swing_types, make_heatmaps, player_index
+
+
+###############################################################################
+################################ Zone Counts ##################################
+###############################################################################
+
+
+# swings, contact, fouls and xwOBAcon by heatmap row and zone, and by count
+# and zone for the whole league, in one pass over the pitches
+def zone_counts(pitch_data, index):
+
+    zone = pitch_data.zone.to_numpy()
+    balls = pitch_data.balls.to_numpy()
+    strikes = pitch_data.strikes.to_numpy()
+    description = pitch_data.description
+
+    swing = description.isin(swing_types).to_numpy()
+    contact = swing & (description == 'hit_into_play').to_numpy()
+    foul = swing & (description == 'foul').to_numpy()
+    xwobacon = np.where(contact, pitch_data.estimated_woba_using_speedangle.fillna(0).to_numpy(), 0)
+
+    # MLBAM zones 1-9, 11-14 -> 0-12
+    in_zone = np.isin(zone, list(range(1, 10)) + list(range(11, 15)))
+    j = np.where(in_zone, np.where(zone < 10, zone - 1, zone - 2), 0).astype(int)
+
+    # counts are kept per distinct (batter, season) and then copied to every
+    # heatmap row with that key, so repeated IDs all get the same values
+    row_keys = list(zip(index.ids.tolist(), index.seasons))
+    key_number = {}
+    for key in row_keys:
+        key_number.setdefault(key, len(key_number))
+    key_of_row = np.array([key_number[key] for key in row_keys], dtype=int)
+    n_keys = len(key_number)
+
+    # each pitch counts toward its batter's all-season key and, if listed,
+    # their key for its own season; unlisted batters are left out
+    batter = pitch_data.batter.to_numpy()
+    season = pitch_data.game_year.astype(str).to_numpy() if 'game_year' in pitch_data else np.full(len(batter), '')
+    key_cells, key_pitches = [np.zeros(0, int)], [np.zeros(0, int)]
+    for s in sorted(set(index.seasons)):
+        key = pd.Series({pid: k for (pid, ks), k in key_number.items() if ks == s}, dtype=float)
+        k = pd.Series(batter).map(key).to_numpy()
+        listed = in_zone & ~np.isnan(k) & ((season == s) if s else True)
+        key_cells.append((np.nan_to_num(k).astype(int)*13 + j)[listed])
+        key_pitches.append(np.flatnonzero(listed))
+    key_cell = np.concatenate(key_cells).astype(int)
+    key_pitch = np.concatenate(key_pitches).astype(int)
+
+    counted = in_zone & np.isin(balls, range(4)) & np.isin(strikes, range(3))
+    league_cell = ((np.where(counted, balls, 0)*3 + np.where(counted, strikes, 0))*13 + j).astype(int)[counted]
+
+    player, league = {}, {}
+    for name, x in [('swings', swing), ('contact', contact), ('foul', foul), ('xwobacon', xwobacon)]:
+        player[name] = np.bincount(key_cell, x[key_pitch]*1.0, minlength=n_keys*13
+                                   ).reshape(n_keys, 13)[key_of_row]
+        league[name] = np.bincount(league_cell, x[counted]*1.0, minlength=156).reshape(4, 3, 13)
+
+    return player, league
+
+
+###############################################################################
+################################# Shrinkage ###################################
+###############################################################################
+
+
+# (successes + k*prior)/(trials + k), or 0 where there is nothing at all
+def shrink(successes, trials, prior, k):
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(trials + k > 0, (successes + k*prior)/(trials + k), 0)
+
+# league rate by count and zone, 0 where undefined (as in get_league_data)
+def rate(successes, trials):
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(trials != 0, successes/trials, 0)
+
+# shrunk swing run value for every batter, count and zone: [player][b][s][zone]
+def shrunk_zone_rv(player, league, k_swings = 0, k_contact = 0, strike_rv = strike_rv):
+
+    # [player][1][1][zone] against league [b][s][zone]
+    p = {name: x[:, None, None, :] for name, x in player.items()}
+
+    contact = shrink(p['contact'], p['swings'], rate(league['contact'], league['swings']), k_swings)
+    foul = shrink(p['foul'], p['swings'], rate(league['foul'], league['swings']), k_swings)
+    xwobacon = shrink(p['xwobacon'], p['contact'], rate(league['xwobacon'], league['contact']), k_contact)
+
+    # no swings and no prior: nothing to go on (as in get_player_data)
+    whiff = np.where(p['swings'] + k_swings > 0, 1 - contact - foul, 0)
+    bip_rv = np.where(contact != 0, 0.6679*xwobacon - 0.192, 0)
+
+    # fouls with two strikes do not change the count
+    two_strikes = (np.arange(3) == 2)[:, None]
+    srv = strike_rv[..., None]
+
+    return contact*bip_rv + np.where(two_strikes, whiff*srv, (whiff + foul)*srv)
+
+def player_zone_rv(pitch_data, k_swings = 0, k_contact = 0, strike_rv = strike_rv, years = None,
+                   season_maps = False):
+
+    index = player_index(years, season_maps)
+
+    with step('player zone counts', rows = len(pitch_data)):
+        player, league = zone_counts(pitch_data, index)
+
+    with step('player shrinkage', rows = len(index)):
+        player_rv = shrunk_zone_rv(player, league, k_swings, k_contact, strike_rv)
+
+    np.save('player_zone_rv.npy', np.array(player_rv, dtype=float), allow_pickle=True)
+    index.save(index_file('player_zone_rv.npy'))
+
+    return player_rv, index
+
+# final player heatmaps from (shrunk) zone values, as in get_player_data
+def player_heatmaps(player_rv, index, n_iter = 10):
+
+    with step('player diffusion', rows = player_rv.size//13):
+        heatmaps = make_heatmaps(player_rv, n_iter)
+
+    np.save('player_heatmaps.npy', np.array(heatmaps, dtype=float), allow_pickle=True)
+    index.save(index_file('player_heatmaps.npy'))
+
+    return heatmaps
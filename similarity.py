@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Similar hitters by swing value profile
+#
+
+# Finding hitters whose swing value looks like a given batter's used to mean
+# flipping through plot_player_heatmap images. SimilarityIndex flattens each
+# batter's twelve count maps from player_heatmaps into one row, centres the
+# rows on the league average and keeps the first n_components principal
+# components as a compact embedding. Distances in that space approximate
+# distances between the full heatmaps, so a top-k query is a few hundred
+# short dot products and clustering the whole league is a k-means run on
+# the embeddings. Rebuilding after the heatmaps change is one
+# eigendecomposition of the players x players Gram matrix.
+
+
+import os
+import numpy as np
+import pandas as pd
+from scipy.cluster.vq import kmeans2
+import shared_heatmaps
+from heatmap_index import load_index
+from seager_data import load_data
+
+
+class SimilarityIndex:
+
+    def __init__(self, ids, names, embedding, components, mean, explained):
+
+        # all-season heatmap row order, as in the heatmap index
+        self.ids = np.asarray(ids)
+        self.names = list(names)
+        self.rows = {int(pid): i for i, pid in enumerate(self.ids)}
+
+        # [player][component], [component][feature], [feature], [component]
+        self.embedding = embedding
+        self.components = components
+        self.mean = mean
+        self.explained = explained
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, player_heatmaps, ids, names, n_components = 20):
+
+        X = np.asarray(player_heatmaps, dtype=float).reshape(len(ids), -1)
+        mean = X.mean(axis=0)
+        X = X - mean
+
+        # principal components from the players x players Gram matrix, which
+        # is much smaller than the 12600 x 12600 covariance
+        w, U = np.linalg.eigh(X @ X.T)
+        w, U = np.clip(w[::-1], 0, None), U[:, ::-1]
+        n_components = min(n_components, int((w > 1e-12*w[0]).sum()))
+        S = np.sqrt(w[:n_components])
+        explained = w[:n_components]/w.sum()
+
+        return cls(ids, names, U[:, :n_components]*S, (X.T @ U[:, :n_components]/S).T, mean, explained)
+
+    # embedding of any [..., 4, 3, 30, 35] heatmaps
+    def embed(self, heatmaps):
+
+        X = np.asarray(heatmaps, dtype=float).reshape(-1, self.mean.size)
+
+        return (X - self.mean) @ self.components.T
+
+    def row(self, pid):
+
+        if int(pid) not in self.rows:
+            raise KeyError('Player ID ' + str(pid) + ' is not in the similarity index')
+
+        return self.rows[int(pid)]
+
+    # the k batters closest to pid, nearest first
+    def neighbours(self, pid, k = 10):
+
+        i = self.row(pid)
+        distance = np.sqrt(((self.embedding - self.embedding[i])**2).sum(axis=1))
+        distance[i] = np.inf
+
+        k = min(k, len(self) - 1)
+        nearest = np.argpartition(distance, k)[:k]
+        nearest = nearest[np.argsort(distance[nearest], kind='stable')]
+
+        return pd.DataFrame({'ID': self.ids[nearest],
+                             'NAME': [self.names[j] for j in nearest],
+                             'DISTANCE': distance[nearest].round(4)})
+
+    # k-means clusters of the whole league
+    def clusters(self, n_clusters = 8, seed = 0):
+
+        centroids, labels = kmeans2(self.embedding, n_clusters, seed=seed, minit='++')
+
+        return pd.DataFrame({'ID': self.ids,
+                             'NAME': self.names,
+                             'CLUSTER': labels})
+
+    def save(self, filename = 'similarity_index.npz'):
+
+        np.savez(filename, ids=self.ids, names=np.array(self.names, dtype=str), embedding=self.embedding,
+                 components=self.components, mean=self.mean, explained=self.explained)
+
+    @classmethod
+    def load(cls, filename = 'similarity_index.npz'):
+
+        f = np.load(filename)
+
+        return cls(f['ids'], f['names'], f['embedding'], f['components'], f['mean'], f['explained'])
+
+
+# index over the current player_heatmaps.npy
+def build_index(path = '.', player_file = 'player_heatmaps.npy', n_components = 20):
+
+    name_index = load_data(path).name_index
+    rows = load_index(os.path.join(path, player_file))
+    player_heatmaps = shared_heatmaps.load(os.path.join(path, player_file))
+
+    # all-season maps only; season maps are not separate batters
+    pooled = rows.pooled()
+    ids = rows.ids[pooled]
+    names = [name_index.names[name_index.lookup(pid)] for pid in ids]
+
+    return SimilarityIndex.build(player_heatmaps[pooled], ids, names, n_components)
+
+
+if __name__ == '__main__':
+
+    index = build_index()
+    index.save()
+
+    print()
+    print(len(index), 'batters,', len(index.explained), 'components,',
+          round(index.explained.sum()*100, 1), '% of variance')
+    print()
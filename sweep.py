@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Parameter sweep for the SEAGER evaluation
+#
+
+# Trying a different bias, smoothing length or RE24 table used to mean
+# editing the defaults and rerunning the whole pipeline for each value. sweep()
+# takes a grid of parameter values and evaluates every combination against
+# the same pitches. The pitch data, each pitch's grid cell and count, and the
+# grouped zone counts (by season for the league, by batter for the players)
+# are prepared once. Everything after that is cheap to redo: the league and
+# player maps are rebuilt from the counts, smoothed, and then every pitch is
+# scored with array lookups. Combinations that differ only in bias share
+# their maps. Groups of combinations run in forked worker processes that
+# inherit the prepared data. RE24 tables go in the grid like any other value,
+# either by name or as (ball_rv, strike_rv) arrays.
+#
+# Each combination is scored the way swing_take scores it (equivalence.py
+# checks score() against the reference leaderboards), and the result is
+# the leaderboard's year-over-year stability: r between a batter's value in
+# one season and the next, as in data_viz.yoy, for the classic and player
+# versions of each metric.
+#
+# The grid size is not a sweep parameter: the 30 x 35 grid is built into the
+# solver's zone layout and the pitch-to-cell mapping.
+
+
+import itertools
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import seasons
+import season_league
+import shrinkage
+from instrument import step
+from live_scoring import grid_x, grid_z
+from seager_mod import (ball_rv, strike_rv, swing_types, take_types, bunt_types, make_heatmaps,
+                        player_index)
+
+
+# RE24 tables a sweep can choose from by name, as (ball_rv, strike_rv); a
+# grid can also give its own, as pairs or as a dict of named pairs
+re24_tables = {'RE24': (ball_rv, strike_rv)}
+
+# a single combination: the pipeline defaults
+default_grid = {'bias': [0],
+                'n_iter': [10],
+                're24': ['RE24'],
+                'k_swings': [0],
+                'k_contact': [0],
+                'season_baselines': [False]}
+
+# leaderboard columns whose stability is reported
+metrics = ['SEAGER', 'Selective', 'Agression', 'L_SEAGER', 'SWTR_Per650', 'Correct%']
+
+
+###############################################################################
+################################ Prepared Data ################################
+###############################################################################
+
+
+# everything that does not depend on the swept parameters
+def prepare(pitch_data = None, years = None):
+
+    if years is None:
+        years = seasons.active
+    years = [str(year) for year in years]
+
+    if pitch_data is None:
+        from seager_mod import get_pitch_data
+        pitch_data = get_pitch_data(years)
+    all_pitch_data, year_pitch_data = pitch_data
+
+    index = player_index(years)
+
+    with step('sweep zone counts', rows = len(all_pitch_data)):
+        count_years, league_counts = season_league.season_counts(all_pitch_data)
+        player_counts = shrinkage.zone_counts(all_pitch_data, index)
+
+    # every scored pitch: listed batters, with a location and not a bunt
+    with step('sweep pitch cells', rows = len(all_pitch_data)):
+        cells = []
+        for year in years:
+            pitches = seasons.season_pitches(year_pitch_data, year)
+            listed = pd.read_csv(seasons.season_file('players', year)).player_id.drop_duplicates()
+            pitches = pitches[pitches.batter.isin(listed) & pitches.plate_x.notna() &
+                              ~pitches.description.isin(bunt_types)]
+
+            # a missing height goes to the bottom row, as in swing_take's search
+            z = pitches.plate_z.to_numpy(dtype=float)
+            rows = {p: index.row(p) for p in listed}
+            cells.append(pd.DataFrame({'season': count_years.index(year),
+                                       'year': int(year),
+                                       'batter': pitches.batter.to_numpy(),
+                                       'row': pitches.batter.map(rows).to_numpy(),
+                                       'b': np.minimum(pitches.balls.to_numpy(dtype=int), 3),
+                                       's': np.minimum(pitches.strikes.to_numpy(dtype=int), 2),
+                                       'ix': grid_x(pitches.plate_x.to_numpy(dtype=float)),
+                                       'iz': np.where(np.isnan(z), 0, grid_z(np.nan_to_num(z))),
+                                       'swing': pitches.description.isin(swing_types).to_numpy(),
+                                       'take': pitches.description.isin(take_types).to_numpy()}))
+        cells = pd.concat(cells, ignore_index=True)
+
+    return {'years': years, 'count_years': count_years, 'league_counts': league_counts,
+            'player_counts': player_counts, 'cells': cells}
+
+
+###############################################################################
+################################### Scoring ###################################
+###############################################################################
+
+
+# league maps by scored season ([season][kind][b][s][x][z]) and player maps
+def sweep_maps(prepared, n_iter, re24, k_swings, k_contact, season_baselines, tables = re24_tables):
+
+    b_rv, s_rv = tables[re24]
+    counts = prepared['league_counts']
+
+    # one baseline per season, or the pooled baseline for all of them
+    if not season_baselines:
+        counts = {name: c.sum(axis=0, keepdims=True) for name, c in counts.items()}
+    league_heatmaps, _ = season_league.league_maps(counts, n_iter, b_rv, s_rv)
+    if not season_baselines:
+        league_heatmaps = np.repeat(league_heatmaps, len(prepared['count_years']), axis=0)
+
+    player, league = prepared['player_counts']
+    player_rv = shrinkage.shrunk_zone_rv(player, league, k_swings, k_contact, s_rv)
+    player_heatmaps = make_heatmaps(player_rv, n_iter)
+
+    return league_heatmaps, player_heatmaps
+
+# leaderboard metrics by batter and season for one bias, as in swing_take
+def score(prepared, league_heatmaps, player_heatmaps, bias = 0):
+
+    c = prepared['cells']
+    cell = (c.b.to_numpy(), c.s.to_numpy(), c.ix.to_numpy(), c.iz.to_numpy())
+    season = c.season.to_numpy()
+
+    classic_srv = league_heatmaps[(season, 2) + cell]
+    trv = league_heatmaps[(season, 3) + cell]
+    classic_xrv = league_heatmaps[(season, 0) + cell]
+    league_swing = league_heatmaps[(season, 1) + cell]
+    player_srv = player_heatmaps[(c.row.to_numpy(),) + cell]
+    player_xrv = league_swing*player_srv + (1 - league_swing)*trv
+
+    swing = c['swing'].to_numpy()
+    take = c['take'].to_numpy()
+
+    boards = []
+    for method, srv, xrv in [('classic', classic_srv, classic_xrv), ('player', player_srv, player_xrv)]:
+
+        good_swing = swing & (srv > trv + bias)
+        good_take = take & (trv > srv + bias)
+
+        d = pd.DataFrame({'ID': c.batter, 'Year': c.year,
+                          'ns': swing, 'nt': take,
+                          'good_swings': good_swing, 'good_takes': good_take,
+                          'bad_takes': take & ~good_take,
+                          'swing_runs': np.where(swing, srv, 0), 'take_runs': np.where(take, trv, 0),
+                          'xrv': xrv})
+        g = d.groupby(['ID', 'Year']).sum()
+
+        n_p = g.ns + g.nt
+        with np.errstate(divide='ignore', invalid='ignore'):
+            hpt = g.bad_takes/g.nt*100
+            sel = g.good_takes/(g.good_takes + g.good_swings)*100
+            board = pd.DataFrame({'N_P': n_p,
+                                  'SEAGER': (sel - hpt).round(1),
+                                  'Selective': sel.round(1),
+                                  'Agression': hpt.round(1),
+                                  'L_SEAGER': (g.good_swings/g.ns*100 - hpt).round(1),
+                                  'SWTR_Per650': ((g.swing_runs + g.take_runs - g.xrv)/n_p*2542).round(1),
+                                  'Correct%': ((g.good_swings + g.good_takes)/n_p*100).round(1)})
+        boards.append(board.add_prefix(method.upper() + '_'))
+
+    return pd.concat(boards, axis=1).rename(columns={'CLASSIC_N_P': 'N_P'}).drop(columns='PLAYER_N_P')
+
+# year-over-year r of each metric, pairing each batter-season with the next
+def stability(board, min_pitches = 0):
+
+    board = board[board.N_P >= min_pitches].reset_index()
+    nxt = board.assign(Year=board.Year - 1)
+    pairs = pd.merge(board, nxt, on=['ID', 'Year'], suffixes=('_1', '_2'))
+
+    out = {'N_PAIRS': len(pairs)}
+    for method in ['CLASSIC', 'PLAYER']:
+        for metric in metrics:
+            col = method + '_' + metric
+            x, y = pairs[col + '_1'], pairs[col + '_2']
+            ok = np.isfinite(x) & np.isfinite(y)
+            out[col + '_R'] = round(float(np.corrcoef(x[ok], y[ok])[0, 1]), 4) if ok.sum() > 2 else np.nan
+
+    return out
+
+
+###############################################################################
+################################# Sweep Runner ################################
+###############################################################################
+
+
+# prepared data, inherited by forked workers
+prepared_data = None
+
+# the grid's RE24 tables by name: names from re24_tables, and (ball_rv,
+# strike_rv) pairs, which are named RE24_1, RE24_2, ... in the results
+def grid_tables(re24):
+
+    if isinstance(re24, dict):
+        re24 = list(re24.items())
+
+    tables, names = {}, []
+    for table in re24:
+        if isinstance(table, str):
+            if table not in re24_tables:
+                raise KeyError('no RE24 table named ' + table)
+            name, table = table, re24_tables[table]
+        elif len(table) == 2 and isinstance(table[0], str):
+            name, table = table
+        else:
+            name = 'RE24_' + str(len([n for n in names if n.startswith('RE24_')]) + 1)
+
+        b_rv, s_rv = (np.asarray(x, dtype=float) for x in table)
+        if b_rv.shape != (4, 3) or s_rv.shape != (4, 3):
+            raise ValueError('RE24 table ' + name + ' must be (ball_rv, strike_rv), each [balls][strikes]')
+
+        tables[name] = (b_rv, s_rv)
+        names.append(name)
+
+    return tables, names
+
+# every bias for one set of maps
+def run_group(group, min_pitches = 0, tables = re24_tables):
+
+    maps_params = {k: v for k, v in group[0].items() if k != 'bias'}
+
+    start = time.perf_counter()
+    league_heatmaps, player_heatmaps = sweep_maps(prepared_data, tables=tables, **maps_params)
+    maps_seconds = time.perf_counter() - start
+
+    rows = []
+    for params in group:
+        start = time.perf_counter()
+        board = score(prepared_data, league_heatmaps, player_heatmaps, params['bias'])
+        row = {k.upper(): v for k, v in params.items()}
+        row.update(stability(board, min_pitches))
+        row['MAPS_SECONDS'] = round(maps_seconds/len(group), 3)
+        row['SCORE_SECONDS'] = round(time.perf_counter() - start, 3)
+        rows.append(row)
+
+    return rows
+
+# evaluate every combination of the grid's values; pitch_data may be given as
+# (all_pitch_data, year_pitch_data), or prepared data reused from an earlier
+# sweep
+def sweep(grid = default_grid, pitch_data = None, years = None, n_workers = None, min_pitches = 0,
+          prepared = None, results_file = 'sweep_results.csv'):
+
+    global prepared_data
+
+    grid = dict(default_grid, **grid)
+    tables, grid['re24'] = grid_tables(grid['re24'])
+
+    prepared_data = prepare(pitch_data, years) if prepared is None else prepared
+
+    # combinations sharing everything but the bias share their maps
+    names = list(grid)
+    combos = [dict(zip(names, values)) for values in itertools.product(*grid.values())]
+    groups = {}
+    for params in combos:
+        groups.setdefault(tuple((k, v) for k, v in params.items() if k != 'bias'), []).append(params)
+    groups = list(groups.values())
+
+    if n_workers is None:
+        n_workers = os.cpu_count()
+
+    try:
+        if n_workers > 1 and len(groups) > 1 and 'fork' in multiprocessing.get_all_start_methods():
+            with ProcessPoolExecutor(min(n_workers, len(groups)),
+                                     mp_context=multiprocessing.get_context('fork')) as executor:
+                results = list(executor.map(run_group, groups, [min_pitches]*len(groups),
+                                            [tables]*len(groups)))
+        else:
+            results = [run_group(group, min_pitches, tables) for group in groups]
+    finally:
+        prepared_data = None
+
+    results = pd.DataFrame([row for rows in results for row in rows])
+    if results_file is not None:
+        results.to_csv(results_file, index=False)
+
+    return results
+
+
+if __name__ == '__main__':
+
+    results = sweep({'bias': [0, 0.005, 0.01, 0.02], 'n_iter': [5, 10, 20]})
+    print(results.to_string(index=False))
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Synthetic Statcast pitch data
+#
+
+# Benchmarking seager_mod should not require a Statcast download, so this
+# script generates pitch-level data with the columns the pipeline reads. Plate
+# appearances are simulated pitch by pitch (all plate appearances at once,
+# one pitch number at a time), so counts, pitch numbers and at-bat numbers
+# follow from the balls and strikes actually thrown. Locations are drawn
+# around the middle of the zone and tighten when the pitcher is behind;
+# swing, contact and foul rates depend on location, count and a per-batter
+# tendency; takes become called strikes mostly inside the zone; balls in play
+# get an xwOBAcon from a per-batter skewed distribution. Everything comes
+# from one seeded generator, so the same arguments always give the same data.
+
+
+import numpy as np
+import pandas as pd
+
+
+season_starts = {2021: '2021-04-01', 2022: '2022-04-07', 2023: '2023-03-30', 2024: '2024-03-28'}
+
+first_names = ['Aaron', 'Bo', 'Carlos', 'Dansby', 'Eloy', 'Francisco', 'Gleyber', 'Hunter',
+               'Isaac', 'Jose', 'Kyle', 'Luis', 'Manny', 'Nolan', 'Ozzie', 'Pete', 'Rafael',
+               'Salvador', 'Trea', 'Vladimir', 'Willy', 'Xander', 'Yordan', 'Zack']
+
+syllables = ['al', 'ba', 'cor', 'del', 'es', 'fer', 'gar', 'her', 'is', 'jo', 'ken', 'lo',
+             'mar', 'nie', 'or', 'pe', 'quin', 'ro', 'san', 'tor', 'ur', 'var', 'wel', 'zo']
+
+pitch_types = ['FF', 'SI', 'FC', 'SL', 'ST', 'CU', 'CH', 'FS']
+pitch_mix = [0.32, 0.16, 0.07, 0.16, 0.06, 0.08, 0.11, 0.04]
+
+
+# MLBAM zone (1-9 in the strike zone, 11-14 outside) for each location
+def mlbam_zone(plate_x, plate_z, sz_bot = 1.5, sz_top = 3.5, half_width = 17/24):
+
+    col = np.clip(((plate_x + half_width)/(2*half_width/3)).astype(int), 0, 2)
+    row = np.clip(((sz_top - plate_z)/((sz_top - sz_bot)/3)).astype(int), 0, 2)
+    in_zone = (abs(plate_x) <= half_width) & (plate_z >= sz_bot) & (plate_z <= sz_top)
+
+    # catcher's view: 11 up and in to a lefty, 14 down and away
+    high = plate_z >= (sz_bot + sz_top)/2
+    left = plate_x < 0
+    outside = np.where(high, np.where(left, 11, 12), np.where(left, 13, 14))
+
+    return np.where(in_zone, 3*row + col + 1, outside)
+
+def player_names(n, rng):
+
+    first = rng.choice(first_names, n)
+    last = [''.join(rng.choice(syllables, k)).title() for k in rng.integers(2, 4, n)]
+
+    return [l + ', ' + f for f, l in zip(first, last)]
+
+
+###############################################################################
+############################## Pitch Simulation ###############################
+###############################################################################
+
+
+def sigmoid(x):
+    return 1/(1 + np.exp(-x))
+
+# every pitch of n_pa plate appearances, in order
+def simulate_pas(n_pa, swing_skill, contact_skill, rng, max_pitches = 20):
+
+    balls = np.zeros(n_pa, dtype=int)
+    strikes = np.zeros(n_pa, dtype=int)
+    active = np.arange(n_pa)
+
+    pitches = []
+    for pitch_number in range(1, max_pitches + 1):
+
+        n = len(active)
+        if n == 0:
+            break
+
+        b = balls[active]
+        s = strikes[active]
+
+        # pitchers behind in the count come closer to the middle
+        spread = 0.85 - 0.06*(b - s).clip(0, None)
+        plate_x = rng.normal(0, spread)
+        plate_z = rng.normal(2.45 - 0.1*(s == 2), spread*0.95)
+
+        zone = mlbam_zone(plate_x, plate_z)
+        in_zone = zone < 10
+        distance = np.hypot(plate_x/0.83, (plate_z - 2.5)/1.0)
+
+        # swing decision
+        swing_logit = (2.2 - 2.2*distance + 1.1*(s == 2) - 1.5*((b == 3) & (s == 0))
+                       + 0.3*(b > s) + swing_skill[active])
+        swing = rng.random(n) < sigmoid(swing_logit)
+
+        # swing result
+        contact_logit = 2.6 - 1.4*distance + contact_skill[active]
+        contact = rng.random(n) < sigmoid(contact_logit)
+        in_play = contact & (rng.random(n) < 0.4)
+        bunt = swing & (rng.random(n) < 0.004)
+
+        # called strike probability blurs around the zone edge
+        edge = np.maximum(abs(plate_x) - 0.83, np.maximum(1.55 - plate_z, plate_z - 3.45))
+        called_strike = rng.random(n) < sigmoid(-edge*14)
+        hbp = ~swing & (abs(plate_x) > 1.7) & (rng.random(n) < 0.1)
+
+        description = np.where(~swing, np.where(hbp, 'hit_by_pitch',
+                                                np.where(called_strike, 'called_strike',
+                                                         np.where(plate_z < 0.6, 'blocked_ball', 'ball'))),
+                               np.where(in_play, 'hit_into_play',
+                                        np.where(contact, np.where(rng.random(n) < 0.04, 'foul_tip', 'foul'),
+                                                 np.where(plate_z < 1.0, 'swinging_strike_blocked',
+                                                          'swinging_strike'))))
+        description = np.where(bunt, np.where(contact, 'foul_bunt', 'missed_bunt'), description)
+
+        pitches.append(pd.DataFrame({'pa': active,
+                                     'pitch_number': pitch_number,
+                                     'balls': b,
+                                     'strikes': s,
+                                     'plate_x': plate_x.round(2),
+                                     'plate_z': plate_z.round(2),
+                                     'zone': zone,
+                                     'description': description}))
+
+        # count update
+        is_ball = np.isin(description, ['ball', 'blocked_ball'])
+        is_strike = np.isin(description, ['called_strike', 'swinging_strike', 'swinging_strike_blocked',
+                                          'foul_tip', 'missed_bunt', 'foul_bunt'])
+        is_foul = description == 'foul'
+        balls[active] = b + is_ball
+        strikes[active] = np.where(is_strike, s + 1, np.where(is_foul, np.minimum(s + 1, 2), s))
+
+        # plate appearance over: ball four, strike three, ball in play, hit by pitch
+        done = ((balls[active] == 4) | (strikes[active] == 3) |
+                (description == 'hit_into_play') | (description == 'hit_by_pitch'))
+        active = active[~done]
+
+    return pd.concat(pitches, ignore_index=True)
+
+
+###############################################################################
+################################## Generator ##################################
+###############################################################################
+
+
+# n_pitches pitches to n_batters batters over the given seasons; returns
+# (all_pitch_data, year_pitch_data) in the same form as get_pitch_data
+def generate(n_pitches = 100000, n_batters = 500, years = (2021, 2022, 2023, 2024), seed = 0):
+
+    rng = np.random.default_rng(seed)
+
+    # batters: ids, playing time and skills
+    batter_id = 600000 + np.arange(n_batters)*37
+    playing_time = rng.gamma(2, 1, n_batters)
+    swing_skill = rng.normal(0, 0.35, n_batters)
+    contact_skill = rng.normal(0, 0.45, n_batters)
+    power = np.clip(rng.normal(0.37, 0.045, n_batters), 0.25, 0.5)
+
+    # about 3.9 pitches per plate appearance; simulate a few extra and trim
+    n_pa = int(n_pitches/3.9*1.08) + 10
+    batter = rng.choice(n_batters, n_pa, p=playing_time/playing_time.sum())
+
+    pitches = simulate_pas(n_pa, swing_skill[batter], contact_skill[batter], rng)
+    pitches = pitches.sort_values(['pa', 'pitch_number'], kind='stable', ignore_index=True)
+    pitches = pitches[pitches.pa < pitches.pa[min(n_pitches, len(pitches)) - 1]]
+    n = len(pitches)
+
+    # plate appearances to seasons, games (~76 plate appearances each) and
+    # dates, in order through each 180 day season
+    pa = pitches.pa.to_numpy()
+    season = pa*len(years)//n_pa
+    year = np.array(years)[season]
+    game = pa//76
+    at_bat_number = pa - game*76 + 1
+
+    start = pd.to_datetime(pd.Series(year).map(season_starts)).to_numpy()
+    day = (pa*len(years) - season*n_pa)*180//n_pa
+    game_date = start + day.astype('timedelta64[D]')
+
+    # xwOBAcon on balls in play, skewed like real contact quality
+    in_play = (pitches.description == 'hit_into_play').to_numpy()
+    mean = power[batter[pa]]
+    xwobacon = rng.gamma(1.6, mean/1.6)
+    xwobacon = np.where(in_play & (rng.random(n) > 0.02), np.minimum(xwobacon, 2.0).round(3), np.nan)
+
+    # handedness and pitch type, drawn last so the columns above do not change
+    stand = np.where(rng.random(n_batters) < 0.4, 'L', 'R')
+    p_throws = np.where(rng.random(400) < 0.28, 'L', 'R')
+    pitch_type = rng.choice(pitch_types, n, p=pitch_mix)
+
+    pitch_data = pd.DataFrame({
+                              'game_date': game_date,
+                              'game_year': year,
+                              'game_pk': 700000 + game,
+                              'batter': batter_id[batter[pa]],
+                              'pitcher': 400000 + (pa//27)%400,
+                              'stand': stand[batter[pa]],
+                              'p_throws': p_throws[(pa//27)%400],
+                              'pitch_type': pitch_type,
+                              'at_bat_number': at_bat_number,
+                              'pitch_number': pitches.pitch_number.to_numpy(),
+                              'balls': pitches.balls.to_numpy(),
+                              'strikes': pitches.strikes.to_numpy(),
+                              'zone': pitches.zone.to_numpy(),
+                              'plate_x': pitches.plate_x.to_numpy(),
+                              'plate_z': pitches.plate_z.to_numpy(),
+                              'description': pitches.description.to_numpy(),
+                              'estimated_woba_using_speedangle': xwobacon
+                              })
+
+    year_pitch_data = [pitch_data[pitch_data.game_year == y].reset_index(drop=True) for y in years]
+
+    return pitch_data, year_pitch_data
+
+# players_<year>.csv files for the synthetic batters, in the savant format
+def write_players(year_pitch_data, years = (2021, 2022, 2023, 2024), path = '.',
+                  min_pitches = 100, seed = 0):
+
+    rng = np.random.default_rng(seed)
+
+    all_batters = np.unique(np.concatenate([p.batter.to_numpy() for p in year_pitch_data]))
+    names = dict(zip(all_batters, player_names(len(all_batters), rng)))
+
+    for year, pitches in zip(years, year_pitch_data):
+
+        swings = pitches.description.isin(['hit_into_play', 'foul', 'swinging_strike', 'foul_tip',
+                                           'swinging_strike_blocked'])
+        stats = pd.DataFrame({'batter': pitches.batter,
+                              'swing': swings,
+                              'whiff': pitches.description.isin(['swinging_strike', 'swinging_strike_blocked']),
+                              'xwoba': pitches.estimated_woba_using_speedangle})
+        stats = stats.groupby('batter').agg(pitches=('swing', 'size'), swings=('swing', 'sum'),
+                                            whiffs=('whiff', 'sum'), xwoba=('xwoba', 'mean'))
+        # every listed batter needs swings and takes for the leaderboard rates
+        stats = stats[(stats.pitches >= min_pitches) & (stats.swings >= 5) & (stats.pitches - stats.swings >= 5)]
+        stats = stats.sort_values('pitches', ascending=False)
+
+        n = len(stats)
+        xwoba = stats.xwoba.fillna(0.3).to_numpy()*0.85
+        players = pd.DataFrame({
+                               'pitches': stats.pitches.to_numpy(),
+                               'player_id': stats.index.to_numpy(),
+                               'player_name': [names[b] for b in stats.index],
+                               'total_pitches': stats.pitches.to_numpy(),
+                               'pitch_percent': 100,
+                               'ba': (0.245 + (xwoba - 0.32)*0.6 + rng.normal(0, 0.02, n)).round(3),
+                               'iso': (0.16 + (xwoba - 0.32)*1.2 + rng.normal(0, 0.03, n)).round(3),
+                               'woba': (xwoba + rng.normal(0, 0.02, n)).round(3),
+                               'xwoba': xwoba.round(3),
+                               'swings': stats.swings.to_numpy(),
+                               'takes': (stats.pitches - stats.swings).to_numpy(),
+                               'whiffs': stats.whiffs.to_numpy()
+                               })
+
+        players.to_csv(path + '/players_' + str(year) + '.csv', index=False)